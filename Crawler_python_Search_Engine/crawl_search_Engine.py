@@ -1,22 +1,36 @@
 import requests
-from bs4 import BeautifulSoup
 import urllib.parse
-from urllib.robotparser import RobotFileParser
 import time
 import os
+import sys
 import json
-from collections import deque
-import re
 import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from politeness import HostScheduler, replay_frontier
+from seen_store import MemorySeenStore, SEEN_STORES, open_seen_store, restore_seen_store
+from checkpoint import CheckpointLog
+from robots_cache import RobotsCache
+from link_extractor import extract_page
+from dedup import NearDuplicateIndex, canonicalize_url, simhash
+from page_store import PageStore
 
 
 class Crawler:
-    def __init__(self, start_url, max_pages=4000, delay=1, output_dir='crawled_pages'):
-        # تنظیمات اولیه خزشگر
+    def __init__(self, start_url, max_pages=4000, delay=1, output_dir='crawled_pages', seen_store=None,
+                 checkpoint_every=100, resume=False):
+        # تنظیمات اولیه خزشگر؛ هر URL به شکل استاندارد خود نگه داشته می‌شود
+        # تا نشانی‌هایی مانند https://huggingface.co و https://huggingface.co/ یک صفحه حساب شوند
+        start_url = canonicalize_url(start_url)
         self.start_url = start_url
         self.max_pages = max_pages
         self.delay = delay
         self.output_dir = output_dir
+        self.checkpoint_every = checkpoint_every  # ذخیره وضعیت خزش هر چند صفحه یک بار
+        self.checkpoint_path = os.path.join(output_dir, 'checkpoint.json')
+        # هر نقطه بازیابی فقط تغییرات پس از نقطه قبلی را به انتهای فایل گزارش اضافه می‌کند
+        self.checkpoint = CheckpointLog(self.checkpoint_path)
 
         # استخراج دامنه از URL شروع
         parsed_url = urllib.parse.urlparse(start_url)
@@ -24,10 +38,18 @@ class Crawler:
         self.scheme = parsed_url.scheme
 
         # ساختارهای داده مورد نیاز
-        self.queue = deque([start_url])  # صف URLs برای بررسی
-        self.visited_urls = set()  # مجموعه URLs بازدید شده
-        self.url_to_id = {}  # نگاشت URL به شناسه عددی
+        # مجموعه URLهای دیده شده (حافظه، فیلتر بلوم یا SQLite از seen_store)
+        self.visited_urls = seen_store if seen_store is not None else MemorySeenStore()
+        # صف URLs برای بررسی؛ هر URL فقط وقتی تحویل داده می‌شود که تأخیر میزبان آن سپری شده باشد
+        # و هر URL هنگام ورود به صف در visited_urls ثبت می‌شود، پس دو بار تحویل داده نمی‌شود
+        self.queue = HostScheduler(delay, delay,
+                                   crawl_delay=lambda host: self.robots.crawl_delay(f"{self.scheme}://{host}/"),
+                                   seen=self.visited_urls)
+        # نگاشت شناسه به URL در انباره صفحات نگه داشته می‌شود و page_count مرز صفحات ذخیره شده است
         self.page_count = 0  # شمارنده صفحات دانلود شده
+        # اثر انگشت SimHash صفحات ذخیره شده؛ صفحات تقریباً تکراری ذخیره نمی‌شوند
+        self.near_duplicates = NearDuplicateIndex()
+        self.duplicates = 0  # شمارنده صفحات تکراری کنار گذاشته شده
 
         # تنظیم لاگر
         logging.basicConfig(
@@ -41,19 +63,21 @@ class Crawler:
         self.logger = logging.getLogger(__name__)
 
         # ایجاد دایرکتوری خروجی اگر وجود ندارد
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            os.makedirs(os.path.join(output_dir, 'html'))
-
-        # تنظیم robots.txt parser
-        self.robots_parser = RobotFileParser()
-        robots_url = f"{self.scheme}://{self.domain}/robots.txt"
-        self.robots_parser.set_url(robots_url)
-        try:
-            self.robots_parser.read()
-            self.logger.info(f"robots.txt خوانده شد از {robots_url}")
-        except Exception as e:
-            self.logger.warning(f"خطا در خواندن robots.txt: {e}")
+        os.makedirs(output_dir, exist_ok=True)
+
+        # صفحات HTML به جای یک فایل برای هر صفحه در چند فایل بخش (segment) فشرده نگه داشته می‌شوند؛
+        # هر صفحه با شناسه یا URL خود مستقیماً قابل خواندن است
+        self.store = PageStore(os.path.join(output_dir, 'pages'))
+
+        # کش robots.txt برای هر میزبان؛ هر فایل یک بار دریافت و پس از پایان TTL دوباره خوانده می‌شود
+        self.robots = RobotsCache(http_user_agent='PythonWebCrawler/1.0')
+
+        # URL شروع به صف اضافه می‌شود (Crawl-delay میزبان همان لحظه از کش robots خوانده می‌شود)
+        # یا در حالت ادامه، صف از آخرین نقطه بازیابی برگردانده می‌شود
+        if not (resume and self.resume_from_checkpoint()):
+            # خزش جدید: صفحات خزش قبلی در همین پوشه پاک می‌شوند تا همراه صفحات جدید نمایه نشوند
+            self.store.clear()
+            self.queue.add(start_url)
 
     def is_valid_url(self, url):
         """بررسی اعتبار URL برای خزش"""
@@ -73,7 +97,7 @@ class Crawler:
                 return False
 
             # بررسی مجوز robots.txt
-            if not self.robots_parser.can_fetch("*", url):
+            if not self.robots.can_fetch(url):
                 self.logger.info(f"URL توسط robots.txt مسدود شده است: {url}")
                 return False
 
@@ -110,40 +134,33 @@ class Crawler:
             return None
 
     def parse_page(self, html_content, base_url):
-        """تجزیه صفحه HTML برای استخراج لینک‌ها (Parser)"""
+        """تجزیه صفحه HTML برای استخراج لینک‌ها و اثر انگشت SimHash متن صفحه (Parser)"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
             links = []
 
-            # استخراج تمام لینک‌ها
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-
-                # تبدیل URL نسبی به URL مطلق
-                absolute_url = urllib.parse.urljoin(base_url, href)
-
-                # حذف انکرها (#) از URL
-                absolute_url = re.sub(r'#.*$', '', absolute_url)
+            # استخراج تمام لینک‌ها و متن در یک گذر بدون ساختن درخت کامل HTML؛
+            # URLهای نسبی همان‌جا به URL مطلق تبدیل می‌شوند
+            page = extract_page(html_content, base_url=base_url)
+            for absolute_url in page['links']:
+                # شکل استاندارد URL (بدون انکر #، میزبان با حروف کوچک، مسیر خالی به صورت /)
+                absolute_url = canonicalize_url(absolute_url)
 
                 if self.is_valid_url(absolute_url) and absolute_url not in self.visited_urls:
                     links.append(absolute_url)
 
-            return links
+            return links, simhash(f"{page['title'] or ''} {page['content']}")
         except Exception as e:
             self.logger.warning(f"خطا در تجزیه HTML برای {base_url}: {e}")
-            return []
+            return [], None
 
     def save_page(self, url, html_content):
         """ذخیره صفحه HTML دانلود شده"""
         try:
             # ایجاد شناسه منحصر به فرد برای URL
             page_id = self.page_count
-            self.url_to_id[url] = page_id
 
-            # ذخیره محتوای HTML
-            html_path = os.path.join(self.output_dir, 'html', f"{page_id}.html")
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            # ذخیره محتوای HTML به صورت فشرده در انباره صفحات همراه با URL آن
+            self.store.put(page_id, url, html_content)
 
             self.logger.info(f"صفحه {page_id} ذخیره شد: {url}")
             return True
@@ -152,12 +169,12 @@ class Crawler:
             return False
 
     def save_metadata(self):
-        """ذخیره فراداده‌ها شامل نگاشت URL به شناسه"""
+        """ذخیره فراداده‌ها شامل نگاشت شناسه به URL (از انباره صفحات، فقط در پایان خزش)"""
         try:
             metadata = {
                 'total_pages': self.page_count,
                 'domain': self.domain,
-                'url_mapping': {str(v): k for k, v in self.url_to_id.items()}
+                'url_mapping': {str(page_id): url for page_id, url in self.store.page_urls()}
             }
 
             metadata_path = os.path.join(self.output_dir, 'metadata.json')
@@ -168,6 +185,64 @@ class Crawler:
         except Exception as e:
             self.logger.warning(f"خطا در ذخیره فراداده‌ها: {e}")
 
+    def save_checkpoint(self):
+        """ذخیره اتمیک وضعیت خزش (صف، URLهای دیده شده، اثر انگشت صفحات و شمارنده‌ها)
+
+        فقط تغییرات پس از نقطه بازیابی قبلی نوشته می‌شود، مگر وقتی که گزارش نقطه بازیابی فشرده می‌شود.
+        """
+        try:
+            # صفحات ذخیره شده پیش از نقطه بازیابی روی دیسک نوشته می‌شوند
+            self.store.flush()
+            self.checkpoint.save({
+                'start_url': self.start_url,
+                'page_count': self.page_count,
+                'duplicates': self.duplicates,
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            }, self.checkpoint_changes, self.checkpoint_state)
+        except Exception as e:
+            self.logger.warning(f"خطا در ذخیره نقطه بازیابی: {e}")
+
+    def checkpoint_state(self):
+        """کل صف، URLهای دیده شده و اثر انگشت صفحات برای نقطه بازیابی کامل"""
+        return {
+            'frontier': self.queue.snapshot(),
+            'seen': self.visited_urls.snapshot(),
+            'near_duplicates': self.near_duplicates.snapshot()
+        }
+
+    def checkpoint_changes(self):
+        """تغییرات checkpoint_state از نقطه بازیابی قبلی"""
+        return {
+            'frontier': self.queue.changes(),
+            'seen': self.visited_urls.changes(),
+            'near_duplicates': self.near_duplicates.changes()
+        }
+
+    def resume_from_checkpoint(self):
+        """بازیابی وضعیت از آخرین نقطه بازیابی؛ اگر وجود نداشته باشد False برمی‌گرداند"""
+        checkpoint = self.checkpoint.load()
+        if checkpoint is None:
+            self.logger.warning(f"نقطه بازیابی در {self.checkpoint_path} پیدا نشد، خزش از ابتدا شروع می‌شود")
+            return False
+        base, changes = checkpoint
+        state = changes[-1] if changes else base
+
+        self.visited_urls.close()
+        self.visited_urls = restore_seen_store(base['seen'], [change['seen'] for change in changes])
+        self.queue.seen = self.visited_urls
+        for url in replay_frontier(base['frontier'], [change['frontier'] for change in changes]):
+            self.queue.requeue(url)
+        self.page_count = state['page_count']
+        # صفحاتی که پس از آخرین نقطه بازیابی ذخیره شده بودند دوباره خزش و با همان شناسه‌ها ذخیره می‌شوند
+        self.store.discard_from(self.page_count)
+        self.near_duplicates = NearDuplicateIndex.restore(base['near_duplicates'],
+                                                          [change['near_duplicates'] for change in changes])
+        self.duplicates = state['duplicates']
+
+        self.logger.info(f"ادامه خزش از نقطه بازیابی {state['timestamp']}: "
+                         f"{self.page_count} صفحه - {len(self.queue)} URL در صف")
+        return True
+
     def start(self):
         """شروع فرآیند خزش"""
         self.logger.info(f"خزش شروع شد از {self.start_url}")
@@ -175,12 +250,32 @@ class Crawler:
 
         start_time = time.time()
 
-        while self.queue and self.page_count < self.max_pages:
-            # برداشتن URL از صف
-            current_url = self.queue.popleft()
+        try:
+            self.crawl_loop(start_time)
+        except KeyboardInterrupt:
+            self.logger.warning("خزش توسط کاربر متوقف شد")
+
+        # ذخیره فراداده‌ها و نقطه بازیابی در پایان
+        self.save_checkpoint()
+        self.save_metadata()
 
-            # بررسی اینکه آیا قبلاً بازدید شده است
-            if current_url in self.visited_urls:
+        elapsed = time.time() - start_time
+        self.logger.info(f"خزش به پایان رسید. {self.page_count} صفحه در {elapsed:.2f} ثانیه دانلود شد.")
+        self.logger.info(f"تعداد کل URLهای دیده شده: {len(self.visited_urls)}")
+        self.logger.info(f"تعداد صفحات تقریباً تکراری کنار گذاشته شده: {self.duplicates}")
+        stats = self.store.stats()
+        self.logger.info(f"انباره صفحات: {stats['raw_bytes'] / 1e6:.1f} MB HTML در "
+                         f"{stats['stored_bytes'] / 1e6:.1f} MB روی دیسک")
+        self.store.close()
+        self.visited_urls.close()
+
+    def crawl_loop(self, start_time):
+        """حلقه اصلی خزش تا رسیدن به max_pages یا خالی شدن صف"""
+        while self.queue and self.page_count < self.max_pages:
+            # برداشتن URL از صف؛ اگر میزبان هنوز آماده نیست تا زمان مجاز صبر می‌کنیم
+            current_url, wait_time = self.queue.pop()
+            if current_url is None:
+                time.sleep(wait_time)
                 continue
 
             self.logger.info(f"در حال بررسی {self.page_count + 1}/{self.max_pages}: {current_url}")
@@ -189,8 +284,20 @@ class Crawler:
             html_content = self.fetch_page(current_url)
 
             if not html_content:
-                # اضافه کردن به لیست بازدید شده در صورت شکست
-                self.visited_urls.add(current_url)
+                continue
+
+            # تجزیه صفحه برای یافتن لینک‌های جدید و اثر انگشت متن آن
+            new_links, fingerprint = self.parse_page(html_content, current_url)
+
+            # اضافه کردن لینک‌های جدید به صف؛ صف خودش URLهای تکراری را کنار می‌گذارد
+            # (لینک‌های صفحات تکراری هم دنبال می‌شوند)
+            for link in new_links:
+                self.queue.add(link)
+
+            # صفحه‌ای که متن آن تقریباً با صفحه‌ای ذخیره شده یکسان است ذخیره نمی‌شود
+            if self.near_duplicates.is_duplicate(fingerprint):
+                self.duplicates += 1
+                self.logger.info(f"صفحه تقریباً تکراری ذخیره نشد: {current_url}")
                 continue
 
             # ذخیره صفحه
@@ -200,43 +307,42 @@ class Crawler:
                 # افزایش شمارنده صفحات
                 self.page_count += 1
 
-                # تجزیه صفحه برای یافتن لینک‌های جدید
-                new_links = self.parse_page(html_content, current_url)
-
-                # اضافه کردن لینک‌های جدید به صف
-                for link in new_links:
-                    if link not in self.visited_urls and link not in self.queue:
-                        self.queue.append(link)
-
-            # اضافه کردن به لیست بازدید شده
-            self.visited_urls.add(current_url)
-
-            # تأخیر برای رعایت ادب
-            # time.sleep(self.delay)
+                # ذخیره دوره‌ای نقطه بازیابی
+                if self.page_count % self.checkpoint_every == 0:
+                    self.save_checkpoint()
 
             # گزارش وضعیت دوره‌ای
             if self.page_count % 100 == 0:
                 elapsed = time.time() - start_time
                 self.logger.info(f"وضعیت: {self.page_count} صفحه در {elapsed:.2f} ثانیه - {len(self.queue)} URL در صف")
 
-        # ذخیره فراداده‌ها در پایان
-        self.save_metadata()
-
-        elapsed = time.time() - start_time
-        self.logger.info(f"خزش به پایان رسید. {self.page_count} صفحه در {elapsed:.2f} ثانیه دانلود شد.")
-        self.logger.info(f"تعداد کل URLهای بازدید شده: {len(self.visited_urls)}")
-
 
 # مثال استفاده
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='خزشگر موتور جستجو')
     # دامنه مورد نظر خود را اینجا قرار دهید
-    start_url = "https://huggingface.co"
+    parser.add_argument('start_url', nargs='?', default="https://huggingface.co")
+    parser.add_argument('--max-pages', type=int, default=10)  # حداکثر 4000 صفحه
+    parser.add_argument('--delay', type=float, default=1)  # تأخیر 1 ثانیه بین درخواست‌ها
+    parser.add_argument('--output-dir', default='crawled_pages')  # دایرکتوری خروجی
+    parser.add_argument('--checkpoint-every', type=int, default=100)  # ذخیره نقطه بازیابی هر 100 صفحه
+    parser.add_argument('--resume', action='store_true')  # ادامه از آخرین نقطه بازیابی
+    # محل نگهداری URLهای دیده‌شده: مجموعه در حافظه، فیلتر Bloom یا فایل SQLite
+    parser.add_argument('--seen-store', choices=SEEN_STORES, default='memory')
+    parser.add_argument('--seen-path', default='seen_urls.sqlite')  # فایل SQLite برای --seen-store sqlite
+    parser.add_argument('--bloom-error-rate', type=float, default=0.001)  # نرخ مثبت کاذب فیلتر Bloom
+    args = parser.parse_args()
 
     crawler = Crawler(
-        start_url=start_url,
-        max_pages=10,  # حداکثر 4000 صفحه
-        delay=1,  # تأخیر 1 ثانیه بین درخواست‌ها
-        output_dir='crawled_pages'  # دایرکتوری خروجی
+        start_url=args.start_url,
+        max_pages=args.max_pages,
+        delay=args.delay,
+        output_dir=args.output_dir,
+        # فایل SQLite فقط وقتی نقطه بازیابی برای ادامه وجود دارد URLهای قبلی را نگه می‌دارد
+        seen_store=open_seen_store(args.seen_store, path=args.seen_path, error_rate=args.bloom_error_rate,
+                                   resume=args.resume and os.path.exists(os.path.join(args.output_dir, 'checkpoint.json'))),
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume
     )
 
     crawler.start()
@@ -1,18 +1,35 @@
 # فایل app.py - برای رابط کاربری تحت وب (مرحله آنلاین)
 # این فایل در فاز آنلاین اجرا می‌شود و رابط کاربری تحت وب را فراهم می‌کند
 
-from flask import Flask, render_template, request, jsonify
-from elasticsearch import Elasticsearch
+from flask import Flask, Response, render_template, request, jsonify
+from elasticsearch import Elasticsearch, NotFoundError
+import os
+import logging
 import time
 import json
 import re
+import base64
+import binascii
+import hashlib
+import hmac
+
+from search_cache import SearchCache, IndexGenerationWatcher
+from embedded_search import EmbeddedSearchEngine, list_generations
+from metrics import Registry, Counter, Histogram, CallbackMetric, timed
 
 app = Flask(__name__)
 
 # تنظیمات اتصال به Elasticsearch
 es = Elasticsearch(['http://localhost:9200'])
+# web_search یک alias است؛ نمایه‌ساز پس از ساخت هر نسل جدید آن را به صورت اتمیک جابه‌جا می‌کند
 index_name = 'web_search'
 
+# موتور جستجو: elasticsearch یا embedded (نمایه معکوس داخلی ساخته شده با indexer.py --backend embedded)
+search_backend = os.environ.get('SEARCH_BACKEND', 'elasticsearch')
+embedded = None
+if search_backend == 'embedded':
+    embedded = EmbeddedSearchEngine(os.environ.get('EMBEDDED_INDEX_DIR', 'embedded_index'))
+
 # بارگذاری اطلاعات نمایه‌سازی
 try:
     with open("indexing_stats.json", "r", encoding="utf-8") as f:
@@ -25,6 +42,51 @@ except Exception as e:
         "index_size_mb": 0
     }
 
+# صفحه‌بندی مبتنی بر search_after و point-in-time
+results_per_page = 20
+max_results_per_page = 50
+pit_keep_alive = '5m'  # مدت اعتبار point-in-time بین دو درخواست «نتایج بیشتر»
+# کلید امضای cursorها؛ همه فرایندهای سرور باید یک مقدار داشته باشند، وگرنه cursor یک فرایند در دیگری رد می‌شود.
+# بدون SEARCH_CURSOR_SECRET یک کلید تصادفی ساخته می‌شود و cursorها پس از راه‌اندازی دوباره نامعتبر می‌شوند.
+cursor_secret = os.environ.get('SEARCH_CURSOR_SECRET', '').encode('utf-8') or os.urandom(32)
+generation_pattern = re.compile(rf'{index_name}_v\d+')
+
+# کش نتایج جستجو؛ با تغییر نسل نمایه در indexing_stats.json به صورت خودکار نامعتبر می‌شود
+cache = SearchCache(
+    max_entries=2048,
+    ttl=60,
+    redis_url=os.environ.get('SEARCH_CACHE_REDIS_URL'),  # مثلاً redis://localhost:6379/0 برای کش مشترک
+    redis_timeout=float(os.environ.get('SEARCH_CACHE_REDIS_TIMEOUT', 0.1))  # حداکثر انتظار برای هر فرمان Redis
+)
+stats_watcher = IndexGenerationWatcher("indexing_stats.json")
+
+# سنجه‌های مسیر جستجو که در /metrics منتشر می‌شوند
+registry = Registry()
+search_stage_seconds = registry.register(Histogram(
+    'search_stage_seconds', 'Time spent in each stage of /search (es_took is the time reported by Elasticsearch)'))
+search_request_seconds = registry.register(Histogram(
+    'search_request_seconds', 'Total /search latency by outcome'))
+search_requests_total = registry.register(Counter(
+    'search_requests_total', 'Number of /search requests by outcome'))
+slow_queries_total = registry.register(Counter(
+    'search_slow_queries_total', 'Number of /search requests slower than the slow-query threshold'))
+registry.register(CallbackMetric(
+    'search_cache_hits_total', 'Result cache hits', 'counter', lambda: cache.stats()['hits']))
+registry.register(CallbackMetric(
+    'search_cache_misses_total', 'Result cache misses', 'counter', lambda: cache.stats()['misses']))
+registry.register(CallbackMetric(
+    'search_cache_entries', 'Entries in the local result cache', 'gauge', lambda: cache.stats()['entries']))
+registry.register(CallbackMetric(
+    'search_cache_errors_total', 'Redis cache commands that failed or timed out', 'counter',
+    lambda: cache.stats()['errors']))
+
+# گزارش پرس‌وجوهای کند؛ هر درخواست کندتر از آستانه با DSL و زمان مراحل در فایل ثبت می‌شود
+slow_query_threshold_ms = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))
+slow_query_log = logging.getLogger('slow_queries')
+slow_query_log.setLevel(logging.INFO)
+slow_query_log.propagate = False
+slow_query_log.addHandler(logging.FileHandler('slow_queries.log', encoding='utf-8'))
+
 
 def normalize_query(query):
     """نرمال‌سازی عبارت جستجو"""
@@ -76,24 +138,82 @@ def build_elasticsearch_query(query_string):
 
 @app.route('/')
 def home():
-    return render_template('index.html', stats=indexing_stats)
+    _, stats = stats_watcher.current()
+    return render_template('index.html', stats=stats or indexing_stats)
 
 
-@app.route('/search')
-def search():
-    query = request.args.get('q', '')
-    start_time = time.time()
+def query_digest(normalized_query):
+    """شناسه کوتاه پرس‌وجو برای اطمینان از استفاده cursor با همان پرس‌وجو"""
+    return hashlib.sha1(normalized_query.encode('utf-8')).hexdigest()[:12]
 
-    if not query.strip():
-        return jsonify({
-            'results': [],
-            'total': 0,
-            'time': 0
-        })
 
-    # نرمال‌سازی پرس‌وجو
-    normalized_query = normalize_query(query)
+def b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def cursor_signature(payload):
+    return hmac.new(cursor_secret, payload.encode('ascii'), hashlib.sha256).digest()[:16]
+
+
+def encode_cursor(state):
+    """تبدیل وضعیت صفحه‌بندی به یک توکن امن برای URL که با HMAC امضا شده است"""
+    payload = b64encode(json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return f"{payload}.{b64encode(cursor_signature(payload))}"
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
 
+
+def valid_after(after):
+    """search_after باید با sort درخواست بخواند: [امتیاز، url]"""
+    return isinstance(after, list) and len(after) == 2 and is_number(after[0]) and isinstance(after[1], str)
+
+
+def decode_cursor(token, normalized_query):
+    """بازگرداندن وضعیت صفحه‌بندی از توکن؛ توکن جعلی یا نامعتبر ValueError ایجاد می‌کند"""
+    payload, _, signature = token.partition('.')
+    try:
+        if not hmac.compare_digest(b64decode(signature), cursor_signature(payload)):
+            raise ValueError("invalid cursor signature")
+        state = json.loads(b64decode(payload))
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"malformed cursor: {e}")
+    if not isinstance(state, dict) or state.get('q') != query_digest(normalized_query):
+        raise ValueError("cursor does not belong to this query")
+    # فقط نسل‌های همین نمایه؛ نسلی که دیگر وجود ندارد در open_pit به alias برمی‌گردد
+    if not isinstance(state.get('index'), str) or not generation_pattern.fullmatch(state['index']):
+        raise ValueError("malformed cursor")
+    if not isinstance(state.get('total'), int):
+        raise ValueError("malformed cursor")
+    if embedded is not None:
+        # در نمایه داخلی after فاصله از ابتدای نتایج است و نسل باید یکی از نسل‌های موجود باشد
+        after = state.get('after')
+        if not (isinstance(after, list) and len(after) == 1 and isinstance(after[0], int)
+                and not isinstance(after[0], bool) and after[0] >= 0):
+            raise ValueError("malformed cursor")
+        if state['index'] not in list_generations(embedded.root):
+            raise ValueError("cursor refers to an unknown index generation")
+    elif not valid_after(state.get('after')):
+        raise ValueError("malformed cursor")
+    if state.get('pit') is not None and not isinstance(state['pit'], str):
+        raise ValueError("malformed cursor")
+    return state
+
+
+def parse_page_size(value):
+    """اندازه صفحه درخواستی، محدود به بازه مجاز"""
+    if value is None:
+        return results_per_page
+    return max(1, min(max_results_per_page, value))
+
+
+def build_search_body(normalized_query, size=results_per_page, cursor=None):
+    """ساخت بدنه کامل درخواست جستجو، شامل highlight و فیلدهای خروجی"""
     # ساخت پرس‌وجوی Elasticsearch
     es_query = build_elasticsearch_query(normalized_query)
 
@@ -102,6 +222,8 @@ def search():
         "highlight": {
             "fields": {
                 "content": {
+                    # با index_options: offsets، highlighter نوع unified از postings استفاده می‌کند
+                    "type": "unified",
                     "fragment_size": 150,
                     "number_of_fragments": 1,
                     "pre_tags": ["<b>"],
@@ -114,16 +236,24 @@ def search():
                 }
             }
         },
-        "_source": ["url", "title"],
-        "size": 20
+        "_source": ["url", "title", "summary"],
+        "size": size,
+        # url یکتا است و ترتیب نتایج هم‌امتیاز را پایدار می‌کند
+        "sort": [{"_score": "desc"}, {"url": "asc"}],
+        "track_scores": True
     })
 
-    # اجرای جستجو
-    response = es.search(index=index_name, body=es_query)
+    if cursor is not None:
+        # صفحه‌های بعدی از ادامه آخرین نتیجه شروع می‌شوند، پس هزینه صفحه 50 با صفحه 1 برابر است
+        es_query["search_after"] = cursor['after']
+        es_query["track_total_hits"] = False
+        if cursor.get('pit'):
+            es_query["pit"] = {"id": cursor['pit'], "keep_alive": pit_keep_alive}
+    return es_query
 
-    end_time = time.time()
-    search_time = end_time - start_time
 
+def format_search_response(response, normalized_query, size=results_per_page, cursor=None):
+    """تبدیل پاسخ Elasticsearch به قالب JSON مورد استفاده در templates/index.html"""
     results = []
     for hit in response['hits']['hits']:
         # استخراج عنوان از نتیجه - با بررسی highlight اگر موجود باشد
@@ -138,9 +268,11 @@ def search():
 
         url = hit['_source']['url']
 
-        # ساخت خلاصه
+        # ساخت خلاصه؛ اگر محتوا highlight نداشت از خلاصه ذخیره شده در نمایه استفاده می‌کنیم
         if 'highlight' in hit and 'content' in hit['highlight']:
             summary = hit['highlight']['content'][0]
+        elif hit['_source'].get('summary'):
+            summary = hit['_source']['summary']
         else:
             summary = "بدون خلاصه"
 
@@ -151,11 +283,205 @@ def search():
             'score': hit['_score']
         })
 
-    return jsonify({
+    hits = response['hits']['hits']
+    if 'total' in response['hits']:
+        total = response['hits']['total']['value']
+    else:
+        # در صفحه‌های بعدی شمارش کل انجام نمی‌شود و مقدار صفحه اول استفاده می‌شود
+        total = cursor['total']
+
+    next_cursor = None
+    if len(hits) == size:
+        next_cursor = encode_cursor({
+            'q': query_digest(normalized_query),
+            'index': hits[-1]['_index'],
+            'pit': response.get('pit_id'),
+            'after': hits[-1]['sort'],
+            'total': total
+        })
+
+    return {
         'results': results,
-        'total': response['hits']['total']['value'],
-        'time': search_time
-    })
+        'total': total,
+        'next_cursor': next_cursor
+    }
+
+
+def open_pit(index):
+    """باز کردن point-in-time روی نسلی که صفحه اول از آن آمده است (یا alias اگر آن نسل حذف شده باشد)"""
+    try:
+        return es.open_point_in_time(index=index, keep_alive=pit_keep_alive)['id']
+    except NotFoundError:
+        return es.open_point_in_time(index=index_name, keep_alive=pit_keep_alive)['id']
+
+
+def record_es_timing(stages, response):
+    """جدا کردن زمان گزارش شده توسط Elasticsearch (took) از زمان شبکه و کلاینت"""
+    stages['es_took'] = response['took'] / 1000
+    stages['network'] = max(0.0, stages['es'] - stages['es_took'])
+
+
+def format_embedded_response(response, normalized_query, size, offset, generation, cursor=None):
+    """تبدیل نتایج نمایه داخلی به همان قالب JSON پاسخ Elasticsearch"""
+    results = []
+    for hit in response['hits']:
+        results.append({
+            'title': hit['title'] if hit['title'] and hit['title'].strip() else "بدون عنوان",
+            'url': hit['url'],
+            'summary': hit['summary'] or "بدون خلاصه",
+            'score': hit['score']
+        })
+
+    total = response['total'] if cursor is None else cursor['total']
+    next_cursor = None
+    # پس از track_total_hits تطابق، total فقط یک کران پایین است و ممکن است نتایج بیشتری وجود داشته باشد
+    more = response.get('total_relation') == 'gte' or offset + size < response['total']
+    if len(results) == size and more:
+        # در نمایه داخلی cursor همان فاصله از ابتدای نتایج در همان نسل است
+        next_cursor = encode_cursor({
+            'q': query_digest(normalized_query),
+            'index': generation,
+            'after': [offset + size],
+            'total': total
+        })
+
+    return {
+        'results': results,
+        'total': total,
+        'next_cursor': next_cursor
+    }
+
+
+def run_embedded_search(normalized_query, size=results_per_page, cursor=None, trace=None):
+    """اجرای پرس‌وجو روی نمایه معکوس داخلی؛ صفحه‌های بعدی از همان نسل صفحه اول خوانده می‌شوند"""
+    trace = trace if trace is not None else {}
+    stages = trace.setdefault('stages', {})
+    offset = cursor['after'][0] if cursor is not None else 0
+
+    with timed(stages, 'embedded'):
+        index = embedded.index(cursor['index'] if cursor is not None else None)
+        if index is None:
+            response, generation = {'total': 0, 'hits': []}, None
+        else:
+            response, generation = index.search(normalized_query, size=size, offset=offset), index.generation
+    trace['dsl'] = {'backend': 'embedded', 'query': normalized_query, 'offset': offset, 'size': size,
+                    'generation': generation}
+
+    with timed(stages, 'shape'):
+        return format_embedded_response(response, normalized_query, size, offset, generation, cursor)
+
+
+def run_search(normalized_query, size=results_per_page, cursor=None, trace=None):
+    """اجرای پرس‌وجو روی Elasticsearch و ساخت نتایج خروجی"""
+    if embedded is not None:
+        return run_embedded_search(normalized_query, size, cursor, trace)
+    trace = trace if trace is not None else {}
+    stages = trace.setdefault('stages', {})
+
+    # صفحه اول بدون PIT اجرا می‌شود؛ PIT فقط برای پرس‌وجوهایی باز می‌شود که واقعاً ورق می‌خورند
+    if cursor is not None and not cursor.get('pit'):
+        with timed(stages, 'pit'):
+            cursor = dict(cursor, pit=open_pit(cursor['index']))
+
+    with timed(stages, 'build'):
+        body = build_search_body(normalized_query, size, cursor)
+
+    with timed(stages, 'es'):
+        if cursor is None:
+            response = es.search(index=index_name, body=body)
+        else:
+            try:
+                response = es.search(body=body)
+            except NotFoundError:
+                # PIT منقضی شده است؛ یک PIT تازه باز و از همان نقطه ادامه می‌دهیم
+                cursor = dict(cursor, pit=open_pit(cursor['index']))
+                body = build_search_body(normalized_query, size, cursor)
+                response = es.search(body=body)
+    trace['dsl'] = body
+    record_es_timing(stages, response)
+
+    with timed(stages, 'shape'):
+        return format_search_response(response, normalized_query, size, cursor)
+
+
+def record_search(query, trace, outcome):
+    """ثبت زمان مراحل در سنجه‌ها و نوشتن پرس‌وجوهای کند در گزارش"""
+    stages = trace['stages']
+    for stage, seconds in stages.items():
+        if stage != 'total':
+            search_stage_seconds.observe(seconds, stage=stage)
+    search_request_seconds.observe(stages['total'], outcome=outcome)
+    search_requests_total.inc(outcome=outcome)
+
+    if stages['total'] * 1000 >= slow_query_threshold_ms:
+        slow_queries_total.inc()
+        slow_query_log.info(json.dumps({
+            'timestamp': time.time(),
+            'query': query,
+            'outcome': outcome,
+            'dsl': trace.get('dsl'),
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in stages.items()}
+        }, ensure_ascii=False))
+
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '')
+    start_time = time.time()
+
+    if not query.strip():
+        return jsonify({
+            'results': [],
+            'total': 0,
+            'time': 0,
+            'next_cursor': None
+        })
+
+    trace = {'stages': {}}
+    stages = trace['stages']
+
+    # نرمال‌سازی پرس‌وجو
+    with timed(stages, 'normalize'):
+        normalized_query = normalize_query(query)
+    size = parse_page_size(request.args.get('size', type=int))
+
+    cursor_token = request.args.get('cursor')
+    if cursor_token:
+        try:
+            cursor = decode_cursor(cursor_token, normalized_query)
+        except ValueError as e:
+            return jsonify({'results': [], 'total': 0, 'time': 0, 'next_cursor': None, 'error': str(e)}), 400
+        # صفحه‌های بعدی کش نمی‌شوند؛ هر cursor فقط یک بار استفاده می‌شود
+        outcome = 'cursor'
+        response = run_search(normalized_query, size, cursor, trace)
+    else:
+        # بررسی کش؛ شناسه نسل نمایه بخشی از اعتبار مدخل‌ها است
+        generation, _ = stats_watcher.current()
+        cache_key = cache.make_key(normalized_query, size=size)
+        with timed(stages, 'cache'):
+            response = cache.get(cache_key, generation)
+        outcome = 'cache_hit'
+        if response is None:
+            outcome = 'cache_miss'
+            response = run_search(normalized_query, size, trace=trace)
+            cache.set(cache_key, generation, response)
+
+    end_time = time.time()
+    search_time = end_time - start_time
+    stages['total'] = search_time
+    record_search(query, trace, outcome)
+
+    return jsonify(dict(response, time=search_time))
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(cache.stats())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,195 @@
+# فایل app_async.py - نسخه ASGI و ناهمگام رابط وب
+# همان قرارداد JSON مسیر /search در app.py را حفظ می‌کند تا templates/index.html بدون تغییر کار کند.
+# اجرا: hypercorn app_async:app --bind 0.0.0.0:8000
+
+import asyncio
+import time
+
+from elasticsearch import AsyncElasticsearch, ConnectionTimeout, NotFoundError
+from quart import Quart, Response, render_template, request, jsonify
+
+from app import (
+    index_name,
+    indexing_stats,
+    pit_keep_alive,
+    cache,
+    stats_watcher,
+    normalize_query,
+    decode_cursor,
+    parse_page_size,
+    build_search_body,
+    format_search_response,
+    record_es_timing,
+    record_search,
+    registry,
+    embedded,
+    run_embedded_search,
+)
+from metrics import timed
+
+app = Quart(__name__)
+
+# تنظیمات اتصال ناهمگام به Elasticsearch
+es_connections_per_node = 32  # اندازه استخر اتصال‌های keep-alive به هر گره
+es_request_timeout = 5  # حداکثر زمان انتظار برای پاسخ Elasticsearch (ثانیه)
+max_concurrent_searches = 64  # حداکثر جستجوهای همزمان در حال اجرا روی Elasticsearch
+queue_timeout = 2  # حداکثر زمان انتظار یک درخواست برای گرفتن نوبت (ثانیه)
+
+es = None
+search_slots = None
+
+
+@app.before_serving
+async def startup():
+    global es, search_slots
+    es = AsyncElasticsearch(
+        ['http://localhost:9200'],
+        connections_per_node=es_connections_per_node,
+        request_timeout=es_request_timeout,
+        retry_on_timeout=True,
+        max_retries=1
+    )
+    search_slots = asyncio.Semaphore(max_concurrent_searches)
+
+
+@app.after_serving
+async def shutdown():
+    await es.close()
+
+
+@app.route('/')
+async def home():
+    _, stats = stats_watcher.current()
+    return await render_template('index.html', stats=stats or indexing_stats)
+
+
+def error_response(message, status, start_time):
+    return jsonify({
+        'results': [],
+        'total': 0,
+        'time': time.time() - start_time,
+        'next_cursor': None,
+        'error': message
+    }), status
+
+
+async def open_pit(index):
+    """باز کردن point-in-time روی نسل صفحه اول (یا alias اگر آن نسل حذف شده باشد)"""
+    try:
+        return (await es.open_point_in_time(index=index, keep_alive=pit_keep_alive))['id']
+    except NotFoundError:
+        return (await es.open_point_in_time(index=index_name, keep_alive=pit_keep_alive))['id']
+
+
+async def run_search(normalized_query, size, cursor, trace):
+    """نسخه ناهمگام app.run_search"""
+    if embedded is not None:
+        # جستجو در نمایه داخلی پردازنده‌محور است و در یک نخ جدا اجرا می‌شود تا حلقه رویداد مسدود نشود
+        return await asyncio.get_running_loop().run_in_executor(
+            None, run_embedded_search, normalized_query, size, cursor, trace)
+    stages = trace['stages']
+    if cursor is not None and not cursor.get('pit'):
+        with timed(stages, 'pit'):
+            cursor = dict(cursor, pit=await open_pit(cursor['index']))
+
+    with timed(stages, 'build'):
+        body = build_search_body(normalized_query, size, cursor)
+
+    with timed(stages, 'es'):
+        if cursor is None:
+            response = await es.search(index=index_name, body=body)
+        else:
+            try:
+                response = await es.search(body=body)
+            except NotFoundError:
+                # PIT منقضی شده است
+                cursor = dict(cursor, pit=await open_pit(cursor['index']))
+                body = build_search_body(normalized_query, size, cursor)
+                response = await es.search(body=body)
+    trace['dsl'] = body
+    record_es_timing(stages, response)
+
+    with timed(stages, 'shape'):
+        return format_search_response(response, normalized_query, size, cursor)
+
+
+@app.route('/search')
+async def search():
+    query = request.args.get('q', '')
+    start_time = time.time()
+
+    if not query.strip():
+        return jsonify({
+            'results': [],
+            'total': 0,
+            'time': 0,
+            'next_cursor': None
+        })
+
+    trace = {'stages': {}}
+    stages = trace['stages']
+    outcome = 'cursor'
+    # زمان و نتیجه هر درخواست، حتی درخواست‌های رد شده یا ناموفق، در سنجه‌ها ثبت می‌شود
+    try:
+        # نرمال‌سازی پرس‌وجو
+        with timed(stages, 'normalize'):
+            normalized_query = normalize_query(query)
+        size = parse_page_size(request.args.get('size', type=int))
+
+        cursor = None
+        response = None
+        cursor_token = request.args.get('cursor')
+        if cursor_token:
+            try:
+                cursor = decode_cursor(cursor_token, normalized_query)
+            except ValueError as e:
+                outcome = 'bad_cursor'
+                return error_response(str(e), 400, start_time)
+        else:
+            generation, _ = stats_watcher.current()
+            cache_key = cache.make_key(normalized_query, size=size)
+            with timed(stages, 'cache'):
+                response = cache.get(cache_key, generation)
+            outcome = 'cache_hit' if response is not None else 'cache_miss'
+
+        if response is None:
+            # محدود کردن جستجوهای همزمان؛ درخواست‌های اضافه به جای انباشته شدن رد می‌شوند
+            try:
+                with timed(stages, 'queue'):
+                    await asyncio.wait_for(search_slots.acquire(), timeout=queue_timeout)
+            except asyncio.TimeoutError:
+                outcome = 'rejected'
+                return error_response('too many concurrent searches', 503, start_time)
+            try:
+                response = await run_search(normalized_query, size, cursor, trace)
+            except ConnectionTimeout:
+                outcome = 'timeout'
+                return error_response('search timed out', 504, start_time)
+            finally:
+                search_slots.release()
+
+            if cursor is None:
+                cache.set(cache_key, generation, response)
+
+        search_time = time.time() - start_time
+        return jsonify(dict(response, time=search_time))
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        stages['total'] = time.time() - start_time
+        record_search(query, trace, outcome)
+
+@app.route('/metrics')
+async def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/cache/stats')
+async def cache_stats():
+    return jsonify(cache.stats())
+
+
+if __name__ == '__main__':
+    print("Async web search engine is running at http://localhost:8000")
+    app.run(port=8000)
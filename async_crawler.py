@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import aiohttp
+
+from dedup import canonicalize_url
+from newCrawlerForIndexing import CrawlProgress, WebCrawler, extract_for_crawl
+from recrawl_cache import RecrawlCache
+
+logger = logging.getLogger("WebCrawler")
+
+
+class AsyncWebCrawler(WebCrawler):
+    """WebCrawler engine built on asyncio and a pooled aiohttp client.
+
+    Instead of fetching fixed batches and waiting for the slowest URL, it keeps
+    up to max_workers requests in flight and starts a new one as soon as any
+    request finishes. Fetched pages go through the same bounded parse queue
+    and process pool as WebCrawler, and to the same output file.
+    """
+
+    def __init__(self, *args, connections_per_host=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections_per_host = connections_per_host or self.max_workers
+
+    async def fetch_url_async(self, session, url):
+        """Fetch a URL with the shared keep-alive session; the scheduler has already applied politeness.
+
+        Returns the same results as WebCrawler.fetch_url.
+        """
+        entry = self.recrawl.get(url) if self.recrawl is not None else None
+        headers = {'User-Agent': self.get_random_user_agent()}
+        headers.update(RecrawlCache.request_headers(entry))
+
+        try:
+            started = time.monotonic()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and entry is not None:
+                    return self.not_modified(url, entry, time.monotonic() - started)
+                if response.status == 200:
+                    body = await response.read()
+                    html_content = await response.text(errors='replace')
+                    return self.fetched(url, entry, html_content, len(body), response.headers,
+                                        time.monotonic() - started)
+                logger.warning(f"Failed to fetch {url}: Status code {response.status}")
+                return None
+        except Exception as e:
+            logger.error(f"Error fetching {url}: {str(e)}")
+            return None
+
+    async def prefetch_robots(self, session, links):
+        """Fetch with the session any robots.txt that following links needs.
+
+        crawlable_links and url_queue.add look up robots.txt through
+        RobotsCache, which would otherwise download a missing one with a
+        blocking request inside the event loop.
+        """
+        urls = []
+        for link in links:
+            link = canonicalize_url(link)
+            host = urlparse(link).netloc
+            if host in self.domains:
+                # can_fetch asks the link's own origin, crawl_delay the host's seed scheme
+                urls += [link, f"{self.domains[host]}://{host}/"]
+        await self.robots.prefetch(session, urls)
+
+    async def accept_page_async(self, session, url, page, validators):
+        if page is not None:
+            await self.prefetch_robots(session, page["links"])
+        self.accept_page(url, page, validators)
+
+    async def accept_unchanged_async(self, session, result):
+        await self.prefetch_robots(session, result["links"])
+        self.accept_unchanged(result)
+
+    async def crawl_async(self, progress, parse_pool):
+        connector = aiohttp.TCPConnector(limit=self.max_workers, limit_per_host=self.connections_per_host,
+                                         ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=30)
+        loop = asyncio.get_running_loop()
+        fetching = {}     # task -> url
+        fetched = deque()  # (url, html, validators) waiting for a parser
+        parsing = {}      # executor future -> (url, validators)
+        parse_slots = 2 * self.parse_workers
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            try:
+                while (self.url_queue or self.in_flight) and self.page_count < self.max_pages:
+                    # Fetch stage: refill from ready hosts while the parse queue has room
+                    wait_timeout = None
+                    while (len(fetching) < self.max_workers
+                           and len(fetching) + len(fetched) < self.parse_queue_size
+                           and self.page_count + len(self.in_flight) < self.max_pages):
+                        url, wait_time = self.url_queue.pop()
+                        if url is None:
+                            wait_timeout = wait_time
+                            break
+                        self.in_flight.add(url)
+                        fetching[asyncio.ensure_future(self.fetch_url_async(session, url))] = url
+
+                    progress.report(len(fetching), len(fetched), len(parsing))
+                    if not fetching and not parsing:
+                        if wait_timeout is None:
+                            break
+                        # Every queued host is still cooling down
+                        await asyncio.sleep(min(wait_timeout, self.report_interval))
+                        continue
+
+                    done, _ = await asyncio.wait(list(fetching) + list(parsing),
+                                                 timeout=min(wait_timeout or self.report_interval,
+                                                             self.report_interval),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task in fetching:
+                            url = fetching.pop(task)
+                            progress.fetched += 1
+                            result = task.result()
+                            if result is None or result.get('unchanged'):
+                                # failed, or unchanged since the last crawl: nothing to parse
+                                self.in_flight.discard(url)
+                                if result is not None:
+                                    await self.accept_unchanged_async(session, result)
+                            else:
+                                fetched.append((url, result['html'], result['validators']))
+                            continue
+
+                        url, validators = parsing.pop(task)
+                        self.in_flight.discard(url)
+                        progress.parsed += 1
+                        try:
+                            page = task.result()
+                        except Exception as e:
+                            logger.error(f"Error parsing {url}: {str(e)}")
+                            page = None
+                        await self.accept_page_async(session, url, page, validators)
+
+                    # Parse stage: parse processes run off the event loop
+                    while fetched and (parse_pool is None or len(parsing) < parse_slots):
+                        url, html_content, validators = fetched.popleft()
+                        if parse_pool is None:
+                            self.in_flight.discard(url)
+                            progress.parsed += 1
+                            await self.accept_page_async(session, url, self.extract(url, html_content), validators)
+                        else:
+                            future = loop.run_in_executor(parse_pool, extract_for_crawl, html_content, url)
+                            parsing[future] = (url, validators)
+            finally:
+                for task in list(fetching) + list(parsing):
+                    task.cancel()
+
+    def crawl(self):
+        """Start the crawling process"""
+        logger.info(f"Starting asyncio crawl from {self.start_url}, targeting {self.max_pages} pages "
+                    f"({self.max_workers} connections, {self.parse_workers} parse processes)")
+
+        progress = CrawlProgress(self, self.report_interval)
+        parse_pool = self.open_parse_pool()
+
+        try:
+            asyncio.run(self.crawl_async(progress, parse_pool))
+
+            # Final save
+            self.save_checkpoint()
+            progress.report(0, 0, 0, force=True)
+            logger.info(f"Crawling completed. Saved {self.page_count} pages to {self.output_file} segments "
+                        f"({progress.summary()}), dropped {self.duplicates} near-duplicate pages")
+            if self.recrawl is not None:
+                logger.info(self.recrawl.summary())
+
+        except KeyboardInterrupt:
+            logger.warning("Crawling interrupted by user")
+            self.save_checkpoint()
+        except Exception as e:
+            logger.error(f"Error during crawling: {str(e)}")
+            self.save_checkpoint()
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown(cancel_futures=True)
+            self.writer.close()
@@ -0,0 +1,65 @@
+"""Compare per-document indexing with bulk indexing against the ES stand-in.
+
+Usage: python benchmarks/bench_bulk_indexing.py --docs 4000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from es_stub import start_stub  # noqa: E402
+
+
+def synthetic_documents(count):
+    for i in range(count):
+        yield {
+            'url': f"https://fa.wikipedia.org/wiki/page_{i}",
+            'content': f"<html><head><title>صفحه {i}</title></head>"
+                       f"<body><p>{'متن نمونه برای نمایه‌سازی ' * 40}{i}</p></body></html>"
+        }
+
+
+def per_document_baseline(indexer, documents):
+    """The pre-bulk code path: one es.index() round trip per document."""
+    start = time.time()
+    count = 0
+    for doc in documents:
+        url, title, content = indexer.prepare_document(doc)
+        indexer.es.index(index=indexer.index_name, document={'url': url, 'title': title, 'content': content})
+        count += 1
+    indexer.es.indices.refresh(index=indexer.index_name)
+    return count, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=4000)
+    parser.add_argument('--port', type=int, default=9200, help='Port for the stand-in (indexer.py targets 9200)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Extraction processes')
+    parser.add_argument('--latency', type=float, default=0.002, help='Simulated round trip in seconds')
+    args = parser.parse_args()
+
+    _, cluster, server = start_stub(port=args.port, latency=args.latency)
+    import indexer  # its client targets localhost:9200
+    # index_documents writes its dead-letter and fingerprint files to the working directory
+    os.chdir(tempfile.mkdtemp())
+    dead_letter = 'dead_letter.jsonl'
+
+    count, elapsed = per_document_baseline(indexer, synthetic_documents(args.docs))
+    print(f"{'per-document':<48} {count / elapsed:10.1f} docs/sec  ({cluster.requests} requests)")
+
+    for chunk_size, threads, workers in [(100, 1, 0), (500, 1, 0), (500, 4, 0), (500, 4, args.workers)]:
+        cluster.requests = 0
+        report = indexer.index_documents(synthetic_documents(args.docs), chunk_size=chunk_size,
+                                         thread_count=threads, dead_letter_path=dead_letter, workers=workers)
+        label = f"bulk chunk={chunk_size} threads={threads} extract_workers={workers}"
+        print(f"{label:<48} {report['docs_per_second']:10.1f} docs/sec  ({cluster.requests} requests)")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
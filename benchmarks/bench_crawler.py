@@ -0,0 +1,50 @@
+"""Crawler throughput against a local synthetic site.
+
+Usage: python benchmarks/bench_crawler.py --pages 500 --latency 0.05 --parse-workers 0 --parse-workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from site_server import start_site  # noqa: E402
+
+
+def run_engine(crawler_class, start_url, pages, workers, parse_workers, output):
+    crawler = crawler_class(start_url, max_pages=pages, output_file=output,
+                            delay_min=0, delay_max=0, max_workers=workers, parse_workers=parse_workers)
+    start = time.perf_counter()
+    crawler.crawl()
+    elapsed = time.perf_counter() - start
+    return crawler.page_count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500, help='Pages to crawl per engine')
+    parser.add_argument('--workers', type=int, default=10, help='Concurrency for both engines')
+    parser.add_argument('--parse-workers', type=int, action='append',
+                        help='Parse processes (0 = parse in the crawler process); may be repeated to compare')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server-side delay per response (s)')
+    args = parser.parse_args()
+
+    # the crawler writes crawler.log to the working directory
+    os.chdir(tempfile.mkdtemp())
+    from newCrawlerForIndexing import WebCrawler
+    from async_crawler import AsyncWebCrawler
+
+    for parse_workers in args.parse_workers or [os.cpu_count() or 1]:
+        for name, crawler_class in [('threads', WebCrawler), ('asyncio', AsyncWebCrawler)]:
+            base_url, handler, server = start_site(latency=args.latency)
+            count, elapsed = run_engine(crawler_class, f"{base_url}/page/0", args.pages, args.workers,
+                                        parse_workers, f"{name}.jsonl")
+            print(f"{name:<10} parse_workers={parse_workers}  {count} pages in {elapsed:6.2f}s  "
+                  f"{count / elapsed:8.1f} pages/sec  ({handler.requests} requests)")
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
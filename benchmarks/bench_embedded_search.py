@@ -0,0 +1,89 @@
+"""Indexing and query latency of the embedded search backend.
+
+Builds an index over a synthetic corpus with a Zipf-like vocabulary, so a
+few terms are in most documents and most terms are rare, then runs
+two- and three-term AND queries mixing common and rare terms.
+
+Usage: python benchmarks/bench_embedded_search.py --documents 20000 --queries 200
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedded_search  # noqa: E402
+
+
+def make_vocabulary(size):
+    return [f"term{n}" for n in range(size)]
+
+
+def zipf_cumulative_weights(size):
+    return list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+
+
+def make_document(rng, vocabulary, weights, length):
+    title = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=5))
+    content = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=length))
+    return title, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=20000, help='Documents to index')
+    parser.add_argument('--length', type=int, default=300, help='Content terms per document')
+    parser.add_argument('--vocabulary', type=int, default=50000, help='Distinct terms')
+    parser.add_argument('--queries', type=int, default=200, help='Queries to run')
+    parser.add_argument('--size', type=int, default=20, help='Results per query')
+    parser.add_argument('--track-total-hits', type=int, default=embedded_search.TRACK_TOTAL_HITS,
+                        help='Matches counted exactly before block skipping starts, -1 to always count '
+                             f'(default: {embedded_search.TRACK_TOTAL_HITS})')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(args.vocabulary)
+    weights = zipf_cumulative_weights(args.vocabulary)
+    root = tempfile.mkdtemp()
+
+    generation = embedded_search.create_generation(root)
+    writer = embedded_search.EmbeddedIndexWriter(os.path.join(root, generation))
+    start = time.perf_counter()
+    for n in range(args.documents):
+        title, content = make_document(rng, vocabulary, weights, args.length)
+        writer.add(f"http://example.com/{n}", title, content)
+    writer.commit()
+    build = time.perf_counter() - start
+    embedded_search.publish_generation(root, generation)
+
+    index = embedded_search.EmbeddedSearchEngine(root).index()
+    track_total_hits = None if args.track_total_hits < 0 else args.track_total_hits
+    print(f"{args.documents} documents indexed in {build:.2f}s ({args.documents / build:.0f} docs/s), "
+          f"{index.size_bytes() / 1e6:.1f} MB")
+
+    # common terms (rank < 20), middle terms and rare terms, two or three per query
+    pools = {'common': vocabulary[:20], 'middle': vocabulary[20:2000], 'rare': vocabulary[2000:]}
+    shapes = [('common', 'common'), ('common', 'middle'), ('common', 'rare'), ('common', 'common', 'middle')]
+    for shape in shapes:
+        latencies = []
+        matches = 0
+        for _ in range(args.queries):
+            query = ' '.join(rng.choice(pools[kind]) for kind in shape)
+            start = time.perf_counter()
+            response = index.search(query, size=args.size, track_total_hits=track_total_hits)
+            latencies.append(time.perf_counter() - start)
+            matches += response['total']
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{'+'.join(shape):<22} p50 {1000 * statistics.median(latencies):8.2f} ms   "
+              f"p95 {1000 * p95:8.2f} ms   avg matches {matches / args.queries:8.0f}")
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Frontier cost: the old list queue with linear dedupe vs HostScheduler.
+
+Each round enqueues N distinct URLs, then every URL a second time (the
+duplicate links a crawl keeps finding), then pops everything. The list
+version is quadratic, so it runs on a smaller N and is extrapolated.
+
+Usage: python benchmarks/bench_frontier.py --urls 1000000 --list-urls 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from politeness import HostScheduler  # noqa: E402
+
+
+def make_urls(count, hosts):
+    return [f"https://site{i % hosts}.example/page/{i}" for i in range(count)]
+
+
+def run_list(urls):
+    queue = []
+    start = time.perf_counter()
+    for batch in (urls, urls):
+        for url in batch:
+            if url not in queue:
+                queue.append(url)
+    while queue:
+        queue.pop(0)
+    return time.perf_counter() - start
+
+
+def run_scheduler(urls):
+    frontier = HostScheduler(0, 0)
+    start = time.perf_counter()
+    for batch in (urls, urls):
+        for url in batch:
+            frontier.add(url)
+    popped = 0
+    while frontier:
+        url, _ = frontier.pop()
+        if url is not None:
+            popped += 1
+    assert popped == len(urls)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--urls', type=int, default=1000000, help='URLs for HostScheduler')
+    parser.add_argument('--list-urls', type=int, default=20000, help='URLs for the list queue')
+    parser.add_argument('--hosts', type=int, default=1000, help='Distinct hosts the URLs are spread over')
+    args = parser.parse_args()
+
+    list_time = run_list(make_urls(args.list_urls, args.hosts))
+    # quadratic: scale by the square of the size ratio
+    list_estimate = list_time * (args.urls / args.list_urls) ** 2
+    scheduler_time = run_scheduler(make_urls(args.urls, args.hosts))
+
+    print(f"list queue     {args.list_urls:>9} URLs {list_time:8.2f}s  "
+          f"(~{list_estimate / 3600:.1f}h extrapolated to {args.urls})")
+    print(f"HostScheduler  {args.urls:>9} URLs {scheduler_time:8.2f}s  "
+          f"{2 * args.urls / scheduler_time:,.0f} adds/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Compare /search highlighting cost before and after the offsets mapping.
+
+Needs a real Elasticsearch on localhost:9200 (the stand-in does not
+highlight). Two scratch indices are built from the same crawl file:
+one with the old mapping and plain highlighting, one with the current
+indexer.index_settings (content indexed with offsets plus a stored
+summary). The same queries then run against both.
+
+Usage: python benchmarks/bench_highlight.py crawled_data.jsonl --docs 4000
+"""
+import argparse
+import copy
+import itertools
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import indexer  # noqa: E402
+
+QUERIES = ['ایران', 'تاریخ', 'ویکی‌پدیا', 'دانشگاه تهران', 'زبان فارسی', 'جنگ جهانی']
+
+OLD_HIGHLIGHT = {
+    "fields": {
+        "content": {"fragment_size": 150, "number_of_fragments": 1, "pre_tags": ["<b>"], "post_tags": ["</b>"]},
+        "title": {"number_of_fragments": 0, "pre_tags": ["<b>"], "post_tags": ["</b>"]}
+    }
+}
+
+
+def old_mapping():
+    settings = copy.deepcopy(indexer.index_settings)
+    properties = settings['mappings']['properties']
+    properties['content'] = {'type': 'text', 'analyzer': 'persian_analyzer'}
+    properties.pop('summary', None)
+    return settings
+
+
+def build_index(name, settings, documents):
+    es = indexer.es
+    if es.indices.exists(index=name):
+        es.indices.delete(index=name)
+    es.indices.create(index=name, body=settings)
+    with open(os.devnull, 'w') as dead_letter:
+        extracted = indexer.extract_documents(documents, dead_letter, {'extract': 0.0})
+        actions = indexer.build_actions(extracted, name, {})
+        indexer.bulk_index(actions, dead_letter, {'index': 0.0})
+    es.indices.refresh(index=name)
+    es.indices.forcemerge(index=name, max_num_segments=1)
+
+
+def measure(name, body_for, rounds):
+    took = []
+    wall = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            response = indexer.es.search(index=name, body=body_for(query), request_cache=False)
+            wall.append((time.perf_counter() - start) * 1000)
+            took.append(response['took'])
+    return took, wall
+
+
+def report(label, took, wall):
+    ordered = sorted(wall)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    print(f"{label:<10} took mean={statistics.mean(took):7.1f} ms   "
+          f"wall p50={statistics.median(wall):7.1f} ms  p99={p99:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('file_path', help='Crawl output to index (.json/.jsonl, optionally compressed)')
+    parser.add_argument('--docs', type=int, default=4000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    documents = list(itertools.islice(indexer.iter_crawled_data(args.file_path), args.docs))
+    build_index('bench_highlight_before', old_mapping(), documents)
+    build_index('bench_highlight_after', indexer.index_settings, documents)
+
+    def before(query):
+        body = app.build_search_body(app.normalize_query(query))
+        body['highlight'] = OLD_HIGHLIGHT
+        body['_source'] = ['url', 'title']
+        return body
+
+    def after(query):
+        return app.build_search_body(app.normalize_query(query))
+
+    # warm up both indices before measuring
+    measure('bench_highlight_before', before, 1)
+    measure('bench_highlight_after', after, 1)
+
+    report('before', *measure('bench_highlight_before', before, args.rounds))
+    report('after', *measure('bench_highlight_after', after, args.rounds))
+
+    indexer.es.indices.delete(index='bench_highlight_before,bench_highlight_after')
+
+
+if __name__ == '__main__':
+    main()
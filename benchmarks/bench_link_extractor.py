@@ -0,0 +1,81 @@
+"""Pages/sec per core: BeautifulSoup parse_page vs the streaming link_extractor.
+
+Reads every .html file in the given directories (e.g. the html/ folder
+written by crawl_search_Engine.Crawler, or the `page N.html` files
+written by crawler_type2) into memory, then times each extractor on a
+single core over the same pages.
+
+Usage: python benchmarks/bench_link_extractor.py Crawler_python_Search_Engine/crawled_pages/html
+"""
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_extractor import etree, extract_page  # noqa: E402
+
+
+def soup_parse_page(html, url):
+    """What WebCrawler.parse_page used to do: a full tree, then find_all twice"""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string.strip() if soup.title and soup.title.string else "No Title"
+    for tag in soup(["script", "style", "nav", "footer", "header"]):
+        tag.decompose()
+    content_tags = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'article', 'section'])
+    content = " ".join(" ".join(tag.get_text().strip() for tag in content_tags).split())
+    links = [a['href'] for a in soup.find_all('a', href=True)]
+    return title, content, links
+
+
+def load_pages(directories):
+    pages = []
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.html'):
+                with open(os.path.join(directory, name), 'r', encoding='utf-8', errors='replace') as f:
+                    pages.append(f.read())
+    return pages
+
+
+def measure(label, parse, pages, min_seconds):
+    count = 0
+    links = 0
+    start = time.perf_counter()
+    while True:
+        for html in pages:
+            links += len(parse(html))
+            count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    size_mb = sum(len(html) for html in pages) * (count / len(pages)) / 2 ** 20
+    print(f"{label:<22} {count / elapsed:8.1f} pages/sec/core  {size_mb / elapsed:6.1f} MB/s  "
+          f"({links // count} links/page)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directories', nargs='+', help='Directories of stored .html pages')
+    parser.add_argument('--min-seconds', type=float, default=5.0, help='Minimum time per extractor')
+    args = parser.parse_args()
+
+    pages = load_pages(args.directories)
+    if not pages:
+        raise SystemExit("No .html files found")
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KB average")
+
+    url = 'https://example.org/'
+    measure('BeautifulSoup', lambda html: soup_parse_page(html, url)[2], pages, args.min_seconds)
+    if etree is not None:
+        measure('link_extractor (lxml)', lambda html: extract_page(html, url, backend='lxml')['links'],
+                pages, args.min_seconds)
+    measure('link_extractor (stdlib)', lambda html: extract_page(html, url, backend='stdlib')['links'],
+            pages, args.min_seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""One HTML file per page vs the segmented, compressed PageStore.
+
+Writes the same synthetic pages both ways and reports write time, bytes on
+disk, random single-page reads and a full sequential scan.
+
+Usage: python benchmarks/bench_page_store.py --pages 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_store import PageStore  # noqa: E402
+from site_server import render_page  # noqa: E402
+
+
+def disk_usage(directory):
+    # allocated blocks, so small files pay for their partly empty last block
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            total += os.stat(os.path.join(root, name)).st_blocks * 512
+    return total
+
+
+def bench_files(directory, pages, reads):
+    start = time.perf_counter()
+    for n, (url, html) in enumerate(pages):
+        with open(os.path.join(directory, f"{n}.html"), 'w', encoding='utf-8') as f:
+            f.write(html)
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for n in reads:
+        with open(os.path.join(directory, f"{n}.html"), encoding='utf-8') as f:
+            f.read()
+    get = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            f.read()
+    scan = time.perf_counter() - start
+    return write, get, scan, disk_usage(directory)
+
+
+def bench_store(directory, pages, reads, compression):
+    store = PageStore(directory, compression=compression)
+    start = time.perf_counter()
+    for n, (url, html) in enumerate(pages):
+        store.put(n, url, html)
+    store.flush()
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for n in reads:
+        store.get(n)
+    get = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in store.iter_pages():
+        pass
+    scan = time.perf_counter() - start
+    store.close()
+    return write, get, scan, disk_usage(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20000, help='Pages to store')
+    parser.add_argument('--reads', type=int, default=2000, help='Random single-page reads')
+    parser.add_argument('--compression', action='append',
+                        help='PageStore codec (none, zlib, zstd); repeatable, default: the store default')
+    args = parser.parse_args()
+
+    pages = [(f"http://localhost/page/{n}", render_page(n, args.pages, 10)) for n in range(args.pages)]
+    raw = sum(len(html.encode('utf-8')) for _, html in pages)
+    reads = [random.randrange(args.pages) for _ in range(args.reads)]
+    print(f"{args.pages} pages, {raw / 1e6:.1f} MB of HTML")
+    print(f"{'layout':<16}{'write s':>9}{'get ms':>9}{'scan s':>9}{'disk MB':>9}")
+
+    runs = [('files', None)] + [('store', codec) for codec in (args.compression or [None])]
+    for layout, codec in runs:
+        directory = tempfile.mkdtemp()
+        if layout == 'files':
+            write, get, scan, size = bench_files(directory, pages, reads)
+            name = 'file per page'
+        else:
+            write, get, scan, size = bench_store(directory, pages, reads, codec)
+            name = f"store {codec or 'default'}"
+        print(f"{name:<16}{write:>9.2f}{1000 * get / len(reads):>9.3f}{scan:>9.2f}{size / 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Recrawl cost with and without conditional requests.
+
+Crawls the synthetic site once to fill a RecrawlCache, changes a fraction
+of the crawled pages, then recrawls the same pages: first fetching
+everything, then with If-None-Match / If-Modified-Since, then against a
+server that sends no validators, where unchanged pages are only spotted by
+content hash.
+
+Usage: python benchmarks/bench_recrawl.py --pages 500 --changed 0.1
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from site_server import start_site  # noqa: E402
+
+
+def crawl(start_url, pages, workers, output, recrawl_cache=None):
+    from newCrawlerForIndexing import WebCrawler
+    crawler = WebCrawler(start_url, max_pages=pages, output_file=output, delay_min=0, delay_max=0,
+                         max_workers=workers, recrawl_cache=recrawl_cache, report_interval=60)
+    start = time.perf_counter()
+    crawler.crawl()
+    crawler.visited_urls.close()
+    return time.perf_counter() - start
+
+
+def output_bytes(output):
+    from crawl_writer import crawl_segments
+    return sum(os.path.getsize(path) for path in crawl_segments(output))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500, help='Pages per crawl')
+    parser.add_argument('--changed', type=float, default=0.1, help='Fraction of pages changed before the recrawl')
+    parser.add_argument('--workers', type=int, default=10, help='Fetch threads')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server-side delay per response (s)')
+    args = parser.parse_args()
+
+    # the crawler writes crawler.log to the working directory
+    os.chdir(tempfile.mkdtemp())
+    from recrawl_cache import RecrawlCache
+
+    for etags in (True, False):
+        # a site no bigger than the crawl, so both crawls visit the same pages
+        base_url, handler, server = start_site(pages=args.pages, latency=args.latency, etags=etags)
+        start_url = f"{base_url}/page/0"
+        cache = RecrawlCache(f"recrawl-{etags}.sqlite")
+        first = crawl(start_url, args.pages, args.workers, 'first.jsonl', cache)
+        cache.close()
+
+        # change some of the crawled pages; n is the page number in /page/<n>
+        crawled = [int(url.rsplit('/', 1)[1]) for url, in
+                   RecrawlCache(f"recrawl-{etags}.sqlite").conn.execute("SELECT url FROM pages")]
+        for n in random.Random(0).sample(crawled, int(len(crawled) * args.changed)):
+            handler.revisions[n] = 1
+
+        if etags:
+            full = crawl(start_url, args.pages, args.workers, 'full.jsonl')
+            print(f"full recrawl          {full:6.2f}s  output {output_bytes('full.jsonl') / 1024:8.0f} KB")
+
+        cache = RecrawlCache(f"recrawl-{etags}.sqlite")
+        conditional = crawl(start_url, args.pages, args.workers, 'conditional.jsonl', cache)
+        label = 'conditional (ETag)' if etags else 'content hash only'
+        print(f"{label:<21} {conditional:6.2f}s  output {output_bytes('conditional.jsonl') / 1024:8.0f} KB  "
+              f"(first crawl {first:.2f}s)")
+        print(f"  {cache.summary()}")
+        cache.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
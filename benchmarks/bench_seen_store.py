@@ -0,0 +1,63 @@
+"""Memory per 1M URLs for each seen-URL store.
+
+Add throughput is timed on its own, then Python heap use is measured with
+tracemalloc while N URLs are added again. The SQLite store is also reported
+by file size, since it keeps only its page cache in RAM. The Bloom filter's
+false-positive rate is measured on URLs that were never added.
+
+Usage: python benchmarks/bench_seen_store.py --urls 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seen_store import open_seen_store  # noqa: E402
+
+
+def url(i):
+    return f"https://fa.wikipedia.org/wiki/page_{i}?section={i % 97}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--urls', type=int, default=1000000)
+    parser.add_argument('--error-rate', type=float, default=0.001)
+    parser.add_argument('--probes', type=int, default=100000, help='Unseen URLs used to measure false positives')
+    args = parser.parse_args()
+
+    scale = 1000000 / args.urls
+    workdir = tempfile.mkdtemp()
+    for kind in ('memory', 'bloom', 'sqlite'):
+        # timed pass first, since tracemalloc slows every allocation down
+        path = os.path.join(workdir, f'timed-{kind}.sqlite')
+        store = open_seen_store(kind, path=path, error_rate=args.error_rate, capacity=args.urls)
+        start = time.perf_counter()
+        for i in range(args.urls):
+            store.add(url(i))
+        elapsed = time.perf_counter() - start
+        store.close()
+
+        path = os.path.join(workdir, f'{kind}.sqlite')
+        tracemalloc.start()
+        store = open_seen_store(kind, path=path, error_rate=args.error_rate, capacity=args.urls)
+        for i in range(args.urls):
+            store.add(url(i))
+        heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        false_positives = sum(url(args.urls + i) in store for i in range(args.probes))
+        line = (f"{kind:<7} {heap * scale / 2 ** 20:8.1f} MB heap per 1M URLs  "
+                f"{args.urls / elapsed:10,.0f} adds/s  false positives {false_positives / args.probes:.4%}")
+        store.close()
+        if kind == 'sqlite':
+            line += f"  disk {os.path.getsize(path) * scale / 2 ** 20:.1f} MB per 1M URLs"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
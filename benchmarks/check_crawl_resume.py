@@ -0,0 +1,86 @@
+"""Resuming CrawlWriter output from a checkpoint after a crash.
+
+For every compression, writes pages, syncs and records a checkpoint,
+writes a few more pages and then abandons the writer without closing it,
+as a killed crawler would. A new writer resumed from the checkpoint must
+keep exactly the checkpointed pages and carry on after them. Compressed
+segments that were never closed have no end-of-stream marker, so this
+also checks that resuming never reads past the checkpointed lines.
+Exits non-zero on the first failure.
+
+Usage: python benchmarks/check_crawl_resume.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawl_writer import COMPRESSIONS, CrawlWriter, crawl_segments, open_segment  # noqa: E402
+
+
+def read_urls(base_path):
+    urls = []
+    for path in crawl_segments(base_path):
+        with open_segment(path, 'rb') as f:
+            urls.extend(json.loads(line)['url'] for line in f.read().splitlines())
+    return urls
+
+
+def page(n, size):
+    return {'url': f"http://example.com/{n}", 'content': 'x' * size}
+
+
+def check(compression, checkpointed, extra, size, segment_bytes):
+    """Problem with one crash and resume, or None"""
+    base_path = os.path.join(tempfile.mkdtemp(), 'crawled_data.jsonl')
+    writer = CrawlWriter(base_path, compression=compression, max_segment_bytes=segment_bytes, fsync_every=1000)
+    for n in range(checkpointed):
+        writer.write(page(n, size))
+    writer.sync()
+    position = writer.position()
+    for n in range(checkpointed, checkpointed + extra):
+        writer.write(page(n, size))
+    writer.sync()
+    # the crawler dies here: the current segment is never closed
+
+    try:
+        resumed = CrawlWriter(base_path, compression=compression, max_segment_bytes=segment_bytes,
+                              resume_position=position)
+    except Exception as e:
+        return f"resume failed: {type(e).__name__}: {e}"
+    resumed.write(page('resumed', size))
+    resumed.close()
+    expected = [page(n, 0)['url'] for n in range(checkpointed)] + [page('resumed', 0)['url']]
+    urls = read_urls(base_path)
+    if urls != expected:
+        return f"got {len(urls)} pages after resume, expected {len(expected)}"
+    return None
+
+
+def main():
+    try:
+        import zstandard  # noqa: F401
+        compressions = list(COMPRESSIONS)
+    except ImportError:
+        compressions = [name for name in COMPRESSIONS if name != 'zstd']
+        print("zstandard is not installed, skipping zstd")
+
+    cases = 0
+    for compression in compressions:
+        # small and buffer-sized pages, checkpoints at the start, middle and end of a segment
+        for checkpointed, extra, size, segment_bytes in [(5, 0, 50, 1 << 20), (5, 3, 50, 1 << 20),
+                                                         (0, 4, 50, 1 << 20), (40, 0, 9000, 1 << 20),
+                                                         (40, 7, 9000, 1 << 20), (25, 10, 1000, 8000)]:
+            problem = check(compression, checkpointed, extra, size, segment_bytes)
+            cases += 1
+            if problem:
+                print(f"{compression}: {checkpointed} checkpointed + {extra} unsynced pages of {size} bytes, "
+                      f"{segment_bytes}-byte segments: {problem}")
+                raise SystemExit(1)
+    print(f"{cases} crash and resume cases passed ({', '.join(compressions)})")
+
+
+if __name__ == '__main__':
+    main()
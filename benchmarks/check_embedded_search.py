@@ -0,0 +1,153 @@
+"""Block-max search of the embedded backend against an exhaustive scorer.
+
+Builds a multi-segment index over a synthetic corpus with varied document
+lengths, then runs random AND queries with random page sizes, offsets and
+track_total_hits. Every document is scored with the BM25F formula directly
+and the top results must match what EmbeddedIndex.search returns, up to
+the order of tied scores. Exits non-zero on the first mismatch.
+
+Usage: python benchmarks/check_embedded_search.py --documents 3000 --queries 300
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedded_search  # noqa: E402
+from embedded_search import BM25_B, BM25_K1, TITLE_WEIGHT  # noqa: E402
+
+TOLERANCE = 1e-9
+
+
+def make_corpus(rng, count, vocabulary_size, max_length):
+    vocabulary = [f"term{n}" for n in range(vocabulary_size)]
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary_size)))
+    documents = []
+    for n in range(count):
+        title = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(1, 8)))
+        content = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(5, max_length)))
+        documents.append((f"http://example.com/{n}", title, content))
+    return vocabulary, documents
+
+
+class ExhaustiveScorer:
+    """BM25F over every document, straight from the formula"""
+
+    def __init__(self, documents):
+        self.urls = [url for url, _, _ in documents]
+        self.title_terms = [Counter(embedded_search.tokenize(title)) for _, title, _ in documents]
+        self.content_terms = [Counter(embedded_search.tokenize(content)) for _, _, content in documents]
+        count = len(documents)
+        self.average_title = max(sum(sum(t.values()) for t in self.title_terms) / count, 1.0)
+        self.average_content = max(sum(sum(c.values()) for c in self.content_terms) / count, 1.0)
+
+    def search(self, query):
+        """(total, [(score, url)] best first, ties in index order)"""
+        terms = embedded_search.parse_query(query)
+        if not terms:
+            return 0, []
+        matches = [doc for doc in range(len(self.urls))
+                   if all(term in self.title_terms[doc] or term in self.content_terms[doc] for term in terms)]
+        if not matches:
+            return 0, []
+        count = len(self.urls)
+        idfs = {}
+        for term in terms:
+            df = sum(1 for doc in range(count) if term in self.title_terms[doc] or term in self.content_terms[doc])
+            idfs[term] = math.log(1 + (count - df + 0.5) / (df + 0.5))
+        results = []
+        for doc in matches:
+            title_norm = 1 - BM25_B + BM25_B * sum(self.title_terms[doc].values()) / self.average_title
+            content_norm = 1 - BM25_B + BM25_B * sum(self.content_terms[doc].values()) / self.average_content
+            score = 0.0
+            for term in terms:
+                tf = (TITLE_WEIGHT * self.title_terms[doc][term] / title_norm
+                      + self.content_terms[doc][term] / content_norm)
+                score += idfs[term] * tf / (BM25_K1 + tf)
+            results.append((score, doc))
+        results.sort(key=lambda item: (-item[0], item[1]))
+        return len(matches), [(score, self.urls[doc]) for score, doc in results]
+
+
+def check(response, expected_total, expected, size, offset, track_total_hits):
+    """Problems with one response, as a list of strings"""
+    problems = []
+    if response['total_relation'] == 'eq':
+        if response['total'] != expected_total:
+            problems.append(f"total {response['total']} != {expected_total}")
+    elif track_total_hits is None:
+        problems.append("total is a lower bound although track_total_hits is None")
+    elif not min(track_total_hits, expected_total) <= response['total'] <= expected_total:
+        problems.append(f"lower bound {response['total']} outside {track_total_hits}..{expected_total}")
+
+    scores = {url: score for score, url in expected}
+    page = expected[offset:offset + size]
+    hits = response['hits']
+    if len(hits) != len(page):
+        problems.append(f"{len(hits)} hits, expected {len(page)}")
+    if len({hit['url'] for hit in hits}) != len(hits):
+        problems.append("a document is returned twice")
+    for position, (hit, (score, _)) in enumerate(zip(hits, page)):
+        # a tied document may stand in for another, but only at the same score
+        if abs(hit['score'] - score) > TOLERANCE * max(1.0, score):
+            problems.append(f"hit {offset + position}: score {hit['score']!r}, expected {score!r}")
+        elif abs(scores.get(hit['url'], -1.0) - hit['score']) > TOLERANCE * max(1.0, score):
+            problems.append(f"hit {offset + position}: {hit['url']} does not score {hit['score']!r}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=3000, help='Documents to index')
+    parser.add_argument('--segment-documents', type=int, default=700, help='Documents per segment')
+    parser.add_argument('--vocabulary', type=int, default=2000, help='Distinct terms')
+    parser.add_argument('--length', type=int, default=200, help='Most content terms in a document')
+    parser.add_argument('--queries', type=int, default=300, help='Queries to check')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary, documents = make_corpus(rng, args.documents, args.vocabulary, args.length)
+    root = tempfile.mkdtemp()
+    generation = embedded_search.create_generation(root)
+    writer = embedded_search.EmbeddedIndexWriter(os.path.join(root, generation),
+                                                 segment_documents=args.segment_documents)
+    for url, title, content in documents:
+        writer.add(url, title, content)
+    writer.commit()
+    embedded_search.publish_generation(root, generation)
+    index = embedded_search.EmbeddedSearchEngine(root).index()
+    scorer = ExhaustiveScorer(documents)
+    print(f"{args.documents} documents in {len(index.segments)} segments")
+
+    pools = [vocabulary[:10], vocabulary[10:200], vocabulary[200:]]
+    pruned = 0
+    for number in range(args.queries):
+        query = ' '.join(rng.choice(rng.choice(pools[:2] if kind else pools))
+                         for kind in range(rng.randint(1, 3)))
+        size = rng.choice([1, 5, 10, 20])
+        offset = rng.choice([0, 0, 0, 10])
+        track_total_hits = rng.choice([None, 0, 20, 100, embedded_search.TRACK_TOTAL_HITS])
+        response = index.search(query, size=size, offset=offset, track_total_hits=track_total_hits)
+        expected_total, expected = scorer.search(query)
+        pruned += response['total_relation'] == 'gte'
+        problems = check(response, expected_total, expected, size, offset, track_total_hits)
+        if problems:
+            print(f"Query {number} {query!r} size={size} offset={offset} "
+                  f"track_total_hits={track_total_hits}:")
+            for problem in problems:
+                print(f"  {problem}")
+            index.close()
+            raise SystemExit(1)
+    index.close()
+    print(f"{args.queries} queries match the exhaustive scorer ({pruned} stopped counting early)")
+
+
+if __name__ == '__main__':
+    main()
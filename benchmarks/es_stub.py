@@ -0,0 +1,237 @@
+"""A tiny in-memory Elasticsearch stand-in for local benchmarks.
+
+It speaks just enough of the REST API for indexer.py and app.py to run
+against it without a real cluster. Every request pays a fixed simulated
+round-trip latency so the benchmarks measure request counts rather than
+Python overhead alone.
+"""
+import fnmatch
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StubCluster:
+    def __init__(self, latency=0.002, per_doc_cost=0.00002):
+        self.latency = latency
+        self.per_doc_cost = per_doc_cost
+        self.indices = {}
+        self.aliases = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, name):
+        resolved = []
+        for part in name.split(','):
+            if part in self.aliases:
+                resolved.extend(self.aliases[part])
+            else:
+                resolved.extend(i for i in self.indices if fnmatch.fnmatchcase(i, part))
+        return resolved
+
+    def drop_index(self, index):
+        self.indices.pop(index, None)
+        for targets in self.aliases.values():
+            if index in targets:
+                targets.remove(index)
+
+    def index_doc(self, index, doc_id, source):
+        with self.lock:
+            docs = self.indices.setdefault(index, {'settings': {}, 'docs': {}})['docs']
+            doc_id = doc_id or uuid.uuid4().hex
+            created = doc_id not in docs
+            docs[doc_id] = source
+        return doc_id, created
+
+    def search(self, name, body):
+        query_text = json.dumps(body.get('query', {}), ensure_ascii=False)
+        terms = [t for t in re.findall(r'"query": "([^"]*)"', query_text)]
+        words = [w for term in terms for w in term.split()]
+        pit = body.get('pit')
+        if pit:
+            name = pit['id']
+        hits = []
+        for index in self.resolve(name):
+            for doc_id, source in self.indices[index]['docs'].items():
+                text = f"{source.get('title', '')} {source.get('content', '')}"
+                if all(w in text for w in words):
+                    hits.append({'_index': index, '_id': doc_id, '_score': 1.0, '_source': source,
+                                 'sort': [1.0, source.get('url', doc_id)]})
+        # every hit scores 1.0, so ordering reduces to the url tie-breaker
+        hits.sort(key=lambda hit: hit['sort'][1])
+        if body.get('search_after'):
+            hits = [hit for hit in hits if hit['sort'][1] > body['search_after'][1]]
+        size = body.get('size', 10)
+        result = {
+            'took': 1,
+            'timed_out': False,
+            'hits': {'max_score': 1.0, 'hits': hits[:size]}
+        }
+        if body.get('track_total_hits', True) is not False:
+            result['hits']['total'] = {'value': len(hits), 'relation': 'eq'}
+        if pit:
+            result['pit_id'] = pit['id']
+        return result
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    cluster = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, payload=None):
+        data = json.dumps(payload if payload is not None else {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def _route(self):
+        cluster = self.cluster
+        cluster.requests += 1
+        time.sleep(cluster.latency)
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split('/') if p]
+        raw = self._body()
+        method = self.command
+
+        if not parts:
+            return self._send(200, {'version': {'number': '8.13.0'}, 'tagline': 'You Know, for Search'})
+
+        if parts == ['_search']:
+            body = json.loads(raw or b'{}')
+            if not cluster.resolve(body.get('pit', {}).get('id', '')):
+                return self._send(404, {'error': {'type': 'search_context_missing_exception'}, 'status': 404})
+            return self._send(200, cluster.search('', body))
+
+        if parts[-1] == '_bulk':
+            lines = [json.loads(line) for line in raw.decode('utf-8').splitlines() if line.strip()]
+            items = []
+            i = 0
+            while i < len(lines):
+                op, meta = next(iter(lines[i].items()))
+                i += 1
+                if op == 'delete':
+                    with cluster.lock:
+                        docs = cluster.indices.get(meta['_index'], {}).get('docs', {})
+                        found = docs.pop(meta.get('_id'), None) is not None
+                    items.append({op: {'_index': meta['_index'], '_id': meta.get('_id'),
+                                       'status': 200 if found else 404}})
+                    continue
+                source = lines[i]
+                i += 1
+                doc_id, created = cluster.index_doc(meta['_index'], meta.get('_id'), source)
+                items.append({op: {'_index': meta['_index'], '_id': doc_id, 'status': 201 if created else 200}})
+            time.sleep(cluster.per_doc_cost * len(items))
+            return self._send(200, {'took': 1, 'errors': False, 'items': items})
+
+        if parts[0] == '_aliases':
+            actions = json.loads(raw or b'{}').get('actions', [])
+            with cluster.lock:
+                for action in actions:
+                    op, spec = next(iter(action.items()))
+                    if op == 'add':
+                        cluster.aliases.setdefault(spec['alias'], [])
+                        if spec['index'] not in cluster.aliases[spec['alias']]:
+                            cluster.aliases[spec['alias']].append(spec['index'])
+                    elif op == 'remove':
+                        targets = cluster.aliases.get(spec['alias'], [])
+                        if spec['index'] in targets:
+                            targets.remove(spec['index'])
+                    elif op == 'remove_index':
+                        cluster.drop_index(spec['index'])
+            return self._send(200, {'acknowledged': True})
+
+        if parts[0] == '_alias':
+            found = {index: {'aliases': {alias: {}}}
+                     for alias, indices in cluster.aliases.items() for index in indices
+                     if len(parts) < 2 or alias == parts[1]}
+            return self._send(200 if found else 404, found)
+
+        name = parts[0]
+        if len(parts) == 1:
+            if method == 'HEAD':
+                return self._send(200 if cluster.resolve(name) else 404)
+            if method == 'PUT':
+                with cluster.lock:
+                    cluster.indices[name] = {'settings': json.loads(raw or b'{}'), 'docs': {}}
+                return self._send(200, {'acknowledged': True, 'index': name})
+            if method == 'DELETE':
+                with cluster.lock:
+                    for index in cluster.resolve(name):
+                        cluster.drop_index(index)
+                return self._send(200, {'acknowledged': True})
+            if method == 'GET':
+                return self._send(200, {index: {} for index in cluster.resolve(name)})
+
+        action = parts[1]
+        if action == '_doc':
+            doc_id = parts[2] if len(parts) > 2 else None
+            doc_id, created = cluster.index_doc(name, doc_id, json.loads(raw))
+            return self._send(201, {'_index': name, '_id': doc_id, 'result': 'created' if created else 'updated'})
+        if action == '_pit':
+            # the stand-in never expires contexts, so the PIT id is simply the concrete index list
+            return self._send(200 if cluster.resolve(name) else 404, {'id': ','.join(cluster.resolve(name))})
+        if action == '_search':
+            return self._send(200, cluster.search(name, json.loads(raw or b'{}')))
+        if action == '_alias':
+            found = {index: {'aliases': {name_: {}}}
+                     for name_, indices in cluster.aliases.items() for index in indices
+                     if len(parts) < 3 or name_ == parts[2]}
+            return self._send(200 if found else 404, found)
+        if action in ('_settings', '_refresh', '_forcemerge', '_flush'):
+            return self._send(200, {'acknowledged': True, '_shards': {'total': 1, 'successful': 1, 'failed': 0}})
+        if action == '_stats':
+            docs = sum(len(cluster.indices[i]['docs']) for i in cluster.resolve(name))
+            size = sum(len(json.dumps(d)) for i in cluster.resolve(name) for d in cluster.indices[i]['docs'].values())
+            total = {'docs': {'count': docs}, 'store': {'size_in_bytes': size}}
+            return self._send(200, {'_all': {'total': total, 'primaries': total}})
+        if action == '_count':
+            docs = sum(len(cluster.indices[i]['docs']) for i in cluster.resolve(name))
+            return self._send(200, {'count': docs})
+
+        query = parse_qs(parsed.query)
+        return self._send(400, {'error': f'unsupported stub endpoint {method} {parsed.path}', 'query': query})
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _route
+
+
+def start_stub(port=0, latency=0.002, per_doc_cost=0.00002):
+    """Start the stand-in on a background thread and return (url, cluster, server)."""
+    cluster = StubCluster(latency=latency, per_doc_cost=per_doc_cost)
+    handler = type('BoundStubHandler', (StubHandler,), {'cluster': cluster})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_address[1]}", cluster, server
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='In-memory Elasticsearch stand-in')
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--latency', type=float, default=0.002, help='Simulated round trip in seconds')
+    args = parser.parse_args()
+
+    url, _, server = start_stub(args.port, args.latency)
+    print(f"Elasticsearch stand-in listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
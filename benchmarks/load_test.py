@@ -0,0 +1,106 @@
+"""Load-test one or more /search endpoints and report QPS and p50/p99 latency.
+
+Start the servers first, for example:
+    python app.py                                   # Flask, port 5000
+    hypercorn app_async:app --bind 127.0.0.1:8000   # ASGI, port 8000
+then run:
+    python benchmarks/load_test.py http://127.0.0.1:5000 http://127.0.0.1:8000 --concurrency 32
+"""
+import argparse
+import http.client
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, quote
+
+DEFAULT_QUERIES = [
+    'آخرین اخبار',
+    'بهترین فیلم های 2024',
+    'طرز تهیه کیک',
+    'آب و هوا تهران',
+    'ویکی‌پدیا',
+    'تاریخ ایران',
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(base_url, queries, concurrency, duration, cache_bust):
+    parsed = urlparse(base_url)
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def worker():
+        nonlocal errors
+        # one keep-alive connection per simulated client
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        local = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            query = queries[n % len(queries)]
+            if cache_bust:
+                query = f"{query} {n}"
+            start = time.perf_counter()
+            try:
+                conn.request('GET', f"/search?q={quote(query)}")
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+                continue
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'qps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('urls', nargs='+', help='Base URLs of the servers to compare')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients (default: 32)')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per server (default: 15)')
+    parser.add_argument('--cache-bust', action='store_true',
+                        help='Make every query unique so the result cache never hits')
+    args = parser.parse_args()
+
+    print(f"{'server':<32} {'requests':>9} {'errors':>7} {'QPS':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for url in args.urls:
+        result = run(url, DEFAULT_QUERIES, args.concurrency, args.duration, args.cache_bust)
+        print(f"{url:<32} {result['requests']:>9} {result['errors']:>7} {result['qps']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
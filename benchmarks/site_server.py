@@ -0,0 +1,90 @@
+"""Serve a synthetic site graph over HTTP for crawler benchmarks.
+
+Every page /page/<n> has a title, a few paragraphs and `links` links to
+other pages, chosen deterministically from n, so runs are repeatable.
+Each response waits around `latency` seconds (long-tailed: between 0.2x
+and 4x) to imitate a remote server. Pages carry an ETag and answer a
+matching If-None-Match with 304; bumping handler.revisions[n] changes
+page n for the next request.
+"""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def render_page(n, pages, links, revision=0):
+    rng = random.Random(n)
+    targets = [rng.randrange(pages) for _ in range(links)]
+    anchors = "".join(f'<li><a href="/page/{t}">صفحه {t}</a></li>' for t in targets)
+    paragraphs = "".join(f"<p>این متن نمونه پاراگراف {i} از صفحه {n} است. " * 5 + "</p>" for i in range(5))
+    if revision:
+        paragraphs += f"<p>ویرایش {revision}</p>"
+    return (f"<html><head><title>صفحه {n}</title><script>var x = {n};</script></head>"
+            f"<body><nav><a href=\"/page/0\">خانه</a></nav><h1>صفحه {n}</h1>{paragraphs}"
+            f"<ul>{anchors}</ul><footer>پانویس</footer></body></html>")
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    pages = 10000
+    links = 10
+    latency = 0.05
+    crawl_delay = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    requests = 0
+    revisions = {}
+    etags = True
+    last_modified = 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', etag=None):
+        data = body.encode('utf-8')
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', self.last_modified)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        type(self).requests += 1
+        time.sleep(self.latency * random.choice((0.2, 0.5, 1, 1, 1, 4)))
+        if self.path == '/robots.txt':
+            rules = "User-agent: *\nDisallow: /private/\n"
+            if self.crawl_delay is not None:
+                rules += f"Crawl-delay: {self.crawl_delay}\n"
+            return self._send(200, rules, 'text/plain')
+        if self.path == '/' or self.path.startswith('/page/'):
+            try:
+                n = int(self.path.rsplit('/', 1)[1] or 0)
+            except ValueError:
+                return self._send(404, 'not found', 'text/plain')
+            if 0 <= n < self.pages:
+                body = render_page(n, self.pages, self.links, self.revisions.get(n, 0))
+                etag = '"' + hashlib.blake2b(body.encode('utf-8'), digest_size=8).hexdigest() + '"'
+                return self._send(200, body, etag=etag if self.etags else None)
+        return self._send(404, 'not found', 'text/plain')
+
+
+def start_site(port=0, pages=10000, links=10, latency=0.05, crawl_delay=None, etags=True):
+    """Start the synthetic site on a background thread; returns (base_url, handler_class, server)."""
+    handler = type('BoundSiteHandler', (SiteHandler,), {
+        'pages': pages, 'links': links, 'latency': latency, 'crawl_delay': crawl_delay, 'requests': 0,
+        'revisions': {}, 'etags': etags
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", handler, server
@@ -0,0 +1,80 @@
+import json
+import os
+
+
+def save_checkpoint(path, state):
+    """Write a crawl checkpoint atomically; a crash mid-write leaves the previous one intact"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path):
+    """Return the saved crawl state, or None when there is no checkpoint"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class CheckpointLog:
+    """Crawl checkpoints as a full base plus an append-only log of what changed since.
+
+    save() appends one JSON line with the changes since the previous save and
+    fsyncs it, so a checkpoint costs as much as the work done since the last
+    one rather than the whole crawl state. Once the log has grown as large as
+    the base, the next save writes a new base with save_checkpoint and empties
+    the log, which keeps the total written linear in the state size. The first
+    save of a run always writes a base.
+
+    Every base gets a random id that its log lines repeat, so lines left over
+    from an older base (a crash between writing a base and emptying the log)
+    are ignored, and so is a line torn by a crash while it was appended.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.base_id = None
+        self.base_bytes = 0
+        self.log_bytes = 0
+
+    def save(self, state, changes, full_state):
+        """Checkpoint state (small values saved every time) with changes() or, when compacting, full_state()"""
+        if self.base_id is None or self.log_bytes >= self.base_bytes:
+            self.compact({**state, **full_state()})
+            return
+        line = (json.dumps({**state, **changes(), 'base': self.base_id}, ensure_ascii=False) + '\n').encode('utf-8')
+        with open(self.log_path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.log_bytes += len(line)
+
+    def compact(self, state):
+        self.base_id = os.urandom(8).hex()
+        save_checkpoint(self.path, {**state, 'base': self.base_id})
+        with open(self.log_path, 'wb') as f:
+            os.fsync(f.fileno())
+        self.base_bytes = os.path.getsize(self.path)
+        self.log_bytes = 0
+
+    def load(self):
+        """(base, changes saved after it in order) of the last checkpoint, or None when there is none"""
+        base = load_checkpoint(self.path)
+        if base is None:
+            return None
+        changes = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if entry.get('base') == base.get('base'):
+                        changes.append(entry)
+        return base, changes
@@ -0,0 +1,216 @@
+import gzip
+import itertools
+import json
+import os
+import re
+import zlib
+
+# compression name -> file suffix
+COMPRESSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+CRAWL_FILE_PATTERN = re.compile(r'\.jsonl?(\.gz|\.zst)?$')
+
+
+def split_base_path(base_path):
+    """'out/crawled_data.jsonl.gz' -> ('out/crawled_data', '.jsonl')"""
+    root, ext = os.path.splitext(re.sub(r'\.(gz|zst)$', '', base_path))
+    return root, ext or '.jsonl'
+
+
+def segment_path(base_path, index, compression='none'):
+    root, ext = split_base_path(base_path)
+    return f"{root}-{index:05d}{ext}{COMPRESSIONS[compression]}"
+
+
+def existing_segments(base_path):
+    """Sorted (index, path) pairs of the segments already written for base_path"""
+    root, ext = split_base_path(base_path)
+    directory = os.path.dirname(root) or '.'
+    pattern = re.compile(re.escape(os.path.basename(root)) + r'-(\d{5})' + re.escape(ext) + r'(\.gz|\.zst)?$')
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            segments.append((int(match.group(1)), os.path.join(os.path.dirname(root), name)))
+    return sorted(segments)
+
+
+def crawl_segments(path):
+    """Files that make up a crawl output, in order.
+
+    path may be a single crawl file, a directory of crawl files, or the base
+    path a CrawlWriter was given (crawled_data.jsonl -> crawled_data-00000.jsonl, ...).
+    """
+    if os.path.isfile(path):
+        return [path]
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if CRAWL_FILE_PATTERN.search(name))
+    segments = existing_segments(path)
+    if segments:
+        return [segment for _, segment in segments]
+    return [path]
+
+
+def open_segment(path, mode):
+    """Open a segment for binary reading ('rb') or writing ('wb') given its compression suffix"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd crawl output requires the 'zstandard' package")
+        raw = open(path, mode)
+        if mode == 'rb':
+            return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+    return open(path, mode)
+
+
+def read_unclosed_segment(path, chunk_size=1 << 16):
+    """Lines of a segment that may never have been closed.
+
+    A crawler killed mid-segment leaves a compressed stream without its
+    end-of-stream marker, which gzip.open and zstd stream readers refuse to
+    read up to, so this decompresses whatever was synced chunk by chunk.
+    """
+    if path.endswith('.gz'):
+        new_decompressor = lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd crawl output requires the 'zstandard' package")
+        new_decompressor = lambda: zstandard.ZstdDecompressor().decompressobj()
+    else:
+        new_decompressor = None
+
+    with open(path, 'rb') as f:
+        decompressor = new_decompressor() if new_decompressor else None
+        pending = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            while decompressor is not None and chunk:
+                data = decompressor.decompress(chunk)
+                # a new gzip member or zstd frame follows a finished one
+                chunk = decompressor.unused_data if decompressor.eof else b''
+                if chunk:
+                    decompressor = new_decompressor()
+                pending += data
+            if decompressor is None:
+                pending += chunk
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield line + b'\n'
+        # a partial last line was not synced completely and is not a page
+
+
+class CrawlWriter:
+    """Append-only JSONL crawl output.
+
+    Every page is written as one line as soon as it is crawled, so nothing is
+    kept in memory. Uncompressed output is flushed after every page; fsync is
+    done every fsync_every pages or on sync(). A new segment is started once
+    the current one holds max_segment_bytes of JSON.
+    """
+
+    def __init__(self, base_path, compression='none', max_segment_bytes=128 << 20, fsync_every=100,
+                 resume_position=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.base_path = base_path
+        self.compression = compression
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync_every = fsync_every
+
+        self.file = None
+        self.raw = None
+        self.segment = 0
+        self.segment_records = 0
+        self.segment_bytes = 0
+        self.unsynced = 0
+
+        if resume_position is None:
+            # a new crawl replaces the output of the previous one
+            for _, path in existing_segments(base_path):
+                os.remove(path)
+        else:
+            self.segment = self.truncate(resume_position)
+
+    def truncate(self, position):
+        """Drop pages written after a checkpoint; return the segment to continue with"""
+        kept_segment = position['segment']
+        for index, path in existing_segments(self.base_path):
+            if index < kept_segment:
+                continue
+            if index > kept_segment or position['records'] == 0:
+                os.remove(path)
+                continue
+            # keep the compression suffix so the copy is written the same way
+            stem, suffix = re.match(r'(.*?)(\.gz|\.zst)?$', path).groups()
+            temp_path = f"{stem}.tmp{suffix or ''}"
+            with open_segment(temp_path, 'wb') as target:
+                for line in itertools.islice(read_unclosed_segment(path), position['records']):
+                    target.write(line)
+            os.replace(temp_path, path)
+        # continue in a fresh segment rather than appending to a compressed stream
+        return kept_segment + 1 if position['records'] else kept_segment
+
+    def open(self):
+        path = segment_path(self.base_path, self.segment, self.compression)
+        self.file = open_segment(path, 'wb')
+        # the underlying file, for fsync
+        self.raw = self.file.fileobj if self.compression == 'gzip' else None
+
+    def write(self, record):
+        if self.file is None:
+            self.open()
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        self.file.write(data)
+        if self.compression == 'none':
+            self.file.flush()
+        self.segment_records += 1
+        self.segment_bytes += len(data)
+        self.unsynced += 1
+
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+        if self.segment_bytes >= self.max_segment_bytes:
+            self.rotate()
+
+    def fileno(self):
+        if self.raw is not None:
+            return self.raw.fileno()
+        return self.file.fileno()
+
+    def sync(self):
+        """Flush and fsync everything written so far"""
+        if self.file is None:
+            return
+        self.file.flush()
+        if self.raw is not None:
+            self.raw.flush()
+        os.fsync(self.fileno())
+        self.unsynced = 0
+
+    def rotate(self):
+        self.close()
+        self.segment += 1
+        self.segment_records = 0
+        self.segment_bytes = 0
+
+    def position(self):
+        """Where the output ends, for checkpoints; call sync() first"""
+        return {'segment': self.segment, 'records': self.segment_records}
+
+    def close(self):
+        if self.file is None:
+            return
+        self.sync()
+        self.file.close()
+        self.file = None
+        self.raw = None
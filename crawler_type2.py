@@ -1,28 +1,48 @@
 import json
 import logging
 import re
+import itertools
 from collections import deque
 from urllib.request import urlopen
 import requests
-from bs4 import BeautifulSoup
+from link_extractor import extract_page
 from urllib.parse import urlparse
+import os
 import time
-import requests
-from urllib.robotparser import RobotFileParser
+from robots_cache import RobotsCache
+from seen_store import MemorySeenStore, SEEN_STORES, open_seen_store, restore_seen_store
+from checkpoint import CheckpointLog
+from dedup import NearDuplicateIndex, canonicalize_url, simhash
+import argparse
 class Crawler:
-    def __init__(self,max_crawl_pages,start_url):
+    def __init__(self,max_crawl_pages,start_url,seen_store=None,checkpoint_path="checkpoint.json",checkpoint_every=100):
         self.max_crawl_pages=max_crawl_pages
         self.start_url=start_url
-        self.visited_urls=set()
+        # set, Bloom filter or SQLite store from seen_store
+        self.visited_urls=seen_store if seen_store is not None else MemorySeenStore()
         self.current_urls=deque()
         self.help_queue = deque()
         self.error=0
+        # SimHash of every saved page, near-duplicates are not saved again
+        self.near_duplicates=NearDuplicateIndex()
+        self.duplicates=0
         self.url_to_id={}
+        self.checkpoint_path=checkpoint_path
+        self.checkpoint_every=checkpoint_every
+        # a checkpoint only appends what changed since the one before it
+        self.checkpoint=CheckpointLog(checkpoint_path)
+        # queue lengths and pages at the last checkpoint, to find what changed since
+        self.saved_current=None
+        self.saved_help=None
+        self.new_pages={}
+        # robots.txt of each host is downloaded once and cached (1 hour TTL)
+        self.robots=RobotsCache()
 
     def fetching_urls(self,url):
         try:
             # data = urlopen(url,timeout=10).read()
             data=requests.get(url, timeout=10)
+            data.raise_for_status()
             data.encoding="utf-8"
             return data.text
             # Set timeout to 10 seconds
@@ -31,31 +51,20 @@ class Crawler:
             return "Empty"
 
 
-    def parse_url(self,url):
+    def parse_url(self,url,html):
+        # links come from the body fetched once in fetching_urls
         try:
-            robots_url = f"{url}/robots.txt"
-            rp = RobotFileParser()
-            rp.set_url(robots_url)
-            rp.read()
-            if rp.can_fetch("*", url):
-                # fromat_urls = urlopen(url,timeout=10)
-
-                fromat_urls = requests.get(url, timeout=10)  # Set timeout to 10 seconds
-                fromat_urls.raise_for_status()
-                soup = BeautifulSoup(fromat_urls.text, 'html.parser')
-                # print(soup)
-                print(fromat_urls)
-                print("Allowed to crawl...⏸️")
+            # one streaming pass over the page, no BeautifulSoup tree
         # urls = []
-                for link in soup.find_all('a'):
-                    self.current_urls.appendleft(link.get('href'))
-                    self.help_queue.appendleft(link.get('href'))
-            else:
-                print("Blocked by robots.txt⛔\n")
-                return "Empty"
+            page=extract_page(html)
+            for link in page['links']:
+                self.current_urls.appendleft(link)
+                self.help_queue.appendleft(link)
+            # fingerprint of the page text, for the near-duplicate check
+            return simhash(f"{page['title'] or ''} {page['content']}")
         except Exception as e:
             print('the error of parsing⛔\n')
-            return "Empty"
+            return None
 
     def checker(self,url):
         if url in self.visited_urls:
@@ -64,6 +73,7 @@ class Crawler:
     def save_metadata(self,data,index,new_url):
         print(f"the page {index} saved ✅ ...\n")
         self.url_to_id[new_url]=index
+        self.new_pages[new_url]=index
         with open(f"page {index}.html","w",encoding="utf-8") as f:
             f.write(data)
         if index==self.max_crawl_pages:
@@ -82,6 +92,70 @@ class Crawler:
 
 
 
+    def save_checkpoint(self,count,seen_url_numbers):
+        # written atomically, so a crash keeps the previous checkpoint
+        self.checkpoint.save({
+            'count':count,
+            'seen_url_numbers':seen_url_numbers,
+            'error':self.error,
+            'duplicates':self.duplicates
+        },self.checkpoint_changes,self.checkpoint_state)
+        print(f"checkpoint saved at page {count-1} 💾\n")
+
+    def checkpoint_state(self):
+        # everything, when the checkpoint log is compacted
+        self.saved_current=len(self.current_urls)
+        self.saved_help=len(self.help_queue)
+        self.new_pages={}
+        return {
+            'current_urls':list(self.current_urls),
+            'help_queue':list(self.help_queue),
+            'url_to_id':self.url_to_id,
+            'visited':self.visited_urls.snapshot(),
+            'near_duplicates':self.near_duplicates.snapshot()
+        }
+
+    def checkpoint_changes(self):
+        # links are appendleft-ed to both queues and urls are popped from the right of current_urls,
+        # so the new links are the leftmost ones of help_queue and the rest follows from the lengths
+        added=len(self.help_queue)-self.saved_help
+        links=list(itertools.islice(self.help_queue,added))[::-1]
+        popped=self.saved_current+added-len(self.current_urls)
+        pages,self.new_pages=self.new_pages,{}
+        self.saved_current=len(self.current_urls)
+        self.saved_help=len(self.help_queue)
+        return {
+            'links':links,
+            'popped':popped,
+            'url_to_id':pages,
+            'visited':self.visited_urls.changes(),
+            'near_duplicates':self.near_duplicates.changes()
+        }
+
+    def load_checkpoint(self):
+        checkpoint=self.checkpoint.load()
+        if checkpoint is None:
+            print("no checkpoint found, starting from the beginning❗\n")
+            return None
+        base,changes=checkpoint
+        state=changes[-1] if changes else base
+        self.visited_urls.close()
+        self.visited_urls=restore_seen_store(base['visited'],[change['visited'] for change in changes])
+        self.current_urls=deque(base['current_urls'])
+        self.help_queue=deque(base['help_queue'])
+        self.url_to_id=base['url_to_id']
+        for change in changes:
+            self.current_urls.extendleft(change['links'])
+            self.help_queue.extendleft(change['links'])
+            for _ in range(change['popped']):
+                self.current_urls.pop()
+            self.url_to_id.update(change['url_to_id'])
+        self.error=state['error']
+        self.near_duplicates=NearDuplicateIndex.restore(base['near_duplicates'],
+                                                        [change['near_duplicates'] for change in changes])
+        self.duplicates=state['duplicates']
+        return state['count'],state['seen_url_numbers']
+
     def validate_url(self,url):
         new_url=url
         if not url:
@@ -100,17 +174,22 @@ class Crawler:
             r'(?::\d+)?'  # optional port
             r'(?:/?|[/?]\S+)$', re.IGNORECASE)
         if re.match(regex, new_url) is not None:
-            return new_url
+            # one spelling per page, so https://wikipedia.org and https://wikipedia.org/ are one url
+            return canonicalize_url(new_url)
         return "Invalid"
 
 
 
-    def run(self):
-        self.current_urls.appendleft(self.start_url)
-        self.help_queue.appendleft(self.start_url)
-        # print(self.start_url)
-        count=1
-        seen_url_numbers=0
+    def run(self,resume=False):
+        state=self.load_checkpoint() if resume else None
+        if state is None:
+            self.current_urls.appendleft(self.start_url)
+            self.help_queue.appendleft(self.start_url)
+            # print(self.start_url)
+            count=1
+            seen_url_numbers=0
+        else:
+            count,seen_url_numbers=state
         while count<=self.max_crawl_pages:
             new_url=self.current_urls.pop()
             # if new_url.startswith("//"):
@@ -121,33 +200,57 @@ class Crawler:
               continue
             print(new_url)
             seen_url_numbers+=1
-            parsing_return=self.parse_url(new_url)
-            # if parsing_return=="Empty":
-            #     continue
-            data = self.fetching_urls(new_url)
             if self.checker(new_url):
                 # self.current_urls.remove(new_url)
                 self.error+=1
                 continue
             self.visited_urls.add(new_url)
+            if not self.robots.can_fetch(new_url):
+                print("Blocked by robots.txt⛔\n")
+                self.error+=1
+                continue
+            print("Allowed to crawl...⏸️")
+            # each page is downloaded exactly once and the body is used for both links and storage
+            data = self.fetching_urls(new_url)
             if data=="Empty":
                 self.error += 1
                 continue
+            fingerprint=self.parse_url(new_url,data)
+            if self.near_duplicates.is_duplicate(fingerprint):
+                print("near-duplicate of a saved page, not saved♻️\n")
+                self.duplicates+=1
+                continue
 
             self.save_metadata(data,count,new_url)
+            if count%self.checkpoint_every==0:
+                self.save_checkpoint(count+1,seen_url_numbers)
             count+=1
         print(f"the total number of visited urls is {seen_url_numbers}")
         print(f"total_queue_len is {len(self.help_queue)}")
         print(f"the total error is:{self.error}")
+        print(f"the total near-duplicate pages dropped is {self.duplicates}")
+        self.visited_urls.close()
 
 
 
 
 
 if __name__ == '__main__':
-    crawler=Crawler(4000,"https://wikipedia.org/")
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--resume',action='store_true',help='continue from checkpoint.json')
+    parser.add_argument('--seen-store',choices=SEEN_STORES,default='memory',
+                        help='Where visited URLs are kept: exact set, Bloom filter or SQLite file (default: memory)')
+    parser.add_argument('--seen-path',default='seen_urls.sqlite',
+                        help='SQLite file for --seen-store sqlite (default: seen_urls.sqlite)')
+    parser.add_argument('--bloom-error-rate',type=float,default=0.001,
+                        help='False-positive rate for --seen-store bloom (default: 0.001)')
+    args=parser.parse_args()
+    # an on-disk seen store keeps its URLs only when there is a checkpoint to resume from
+    seen_store=open_seen_store(args.seen_store,path=args.seen_path,error_rate=args.bloom_error_rate,
+                               resume=args.resume and os.path.exists("checkpoint.json"))
+    crawler=Crawler(4000,"https://wikipedia.org/",seen_store=seen_store)
     begin=time.time()
-    crawler.run()
+    crawler.run(resume=args.resume)
     end=time.time()
     print("all of pages were saved 🌟")
     print(f"the total time taken is {end-begin} ⏳")
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import re
+from array import array
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', 'ref_src'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+TOKEN_PATTERN = re.compile(r'\w+')
+FINGERPRINT_BITS = 64
+# BIT_TABLES[b] maps a byte to 1 if bit b is set, else 0, for bytes.translate
+BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+
+def canonical_query(query):
+    """Query parameters without tracking ones, sorted; a bare flag such as 'action' stays without '='.
+
+    The pairs keep their original bytes: decoding and re-encoding would turn
+    '?x=1;y=2' into '?x=1%3By%3D2' or '%ZZ' into '%25ZZ', a different URL to the server.
+    """
+    params = []
+    for part in query.split('&'):
+        if not part:
+            continue
+        key = unquote_plus(part.partition('=')[0])
+        if key.startswith('utm_') or key in TRACKING_PARAMS:
+            continue
+        params.append(part)
+    params.sort(key=lambda part: part.partition('=')[::2])
+    return '&'.join(params)
+
+
+def canonicalize_url(url):
+    """One spelling per page: lowercase scheme and host, no default port, no fragment,
+    '/' for an empty path, tracking parameters dropped and the rest sorted.
+
+    'HTTPS://HuggingFace.co:443?utm_source=x#top' -> 'https://huggingface.co/'
+    """
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').rstrip('.')
+        port = parts.port
+    except ValueError:
+        return url
+    if not host:
+        return url
+    # IPv6 literals keep their brackets, or the port would be read as part of the address
+    netloc = f"[{host}]" if ':' in host else host
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or '/', canonical_query(parts.query), ''))
+
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash of a text's distinct word shingles; None if the text has no words.
+
+    Pages whose fingerprints differ in only a few bits share most of their
+    shingles, whatever their length.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if not tokens:
+        return None
+    size = min(shingle_size, len(tokens))
+    shingles = {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    # all 8-byte shingle hashes back to back; byte k of every hash is then digests[k::8]
+    digests = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles)
+
+    fingerprint = 0
+    for byte in range(8):
+        column = digests[byte::8]
+        for bit in range(8):
+            # the bit is set when most shingle hashes have it set
+            if 2 * column.translate(BIT_TABLES[bit]).count(1) > len(shingles):
+                fingerprint |= 1 << (byte * 8 + bit)
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """SimHash fingerprints of the pages kept so far, with LSH bands for lookup.
+
+    A fingerprint is split into `bands` bands of 64 / bands bits. Two
+    fingerprints within max_distance bits (max_distance < bands) agree on at
+    least one whole band, so only pages sharing a band value are compared.
+    Each page costs 8 bytes for its fingerprint plus 4 bytes per band.
+    """
+
+    def __init__(self, max_distance=3, bands=4):
+        if max_distance >= bands:
+            raise ValueError("max_distance must be smaller than the number of bands")
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = FINGERPRINT_BITS // bands
+        self.fingerprints = array('Q')
+        # one bucket per band: band value -> positions in self.fingerprints
+        self.buckets = [{} for _ in range(bands)]
+        # fingerprints up to here are in the last checkpoint; set once snapshot() has been called
+        self.saved = None
+
+    def band_values(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def find(self, fingerprint):
+        """Position of a stored fingerprint within max_distance bits, or None"""
+        checked = set()
+        for bucket, value in zip(self.buckets, self.band_values(fingerprint)):
+            for position in bucket.get(value, ()):
+                if position in checked:
+                    continue
+                checked.add(position)
+                if hamming_distance(self.fingerprints[position], fingerprint) <= self.max_distance:
+                    return position
+        return None
+
+    def add(self, fingerprint):
+        position = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        for bucket, value in zip(self.buckets, self.band_values(fingerprint)):
+            positions = bucket.get(value)
+            if positions is None:
+                bucket[value] = positions = array('I')
+            positions.append(position)
+        return position
+
+    def is_duplicate(self, fingerprint):
+        """True if a near-duplicate is already stored; otherwise store this fingerprint"""
+        if fingerprint is None:
+            return False
+        if self.find(fingerprint) is not None:
+            return True
+        self.add(fingerprint)
+        return False
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def snapshot(self):
+        self.saved = len(self.fingerprints)
+        return {'max_distance': self.max_distance, 'bands': self.bands,
+                'fingerprints': base64.b64encode(self.fingerprints.tobytes()).decode('ascii')}
+
+    def changes(self):
+        """Fingerprints added since the last snapshot() or changes(), for an incremental checkpoint"""
+        added = self.fingerprints[self.saved:]
+        self.saved = len(self.fingerprints)
+        return {'fingerprints': base64.b64encode(added.tobytes()).decode('ascii')}
+
+    @classmethod
+    def restore(cls, snapshot, changes=()):
+        index = cls(snapshot['max_distance'], snapshot['bands'])
+        for saved in [snapshot] + list(changes):
+            fingerprints = array('Q')
+            fingerprints.frombytes(base64.b64decode(saved['fingerprints']))
+            for fingerprint in fingerprints:
+                index.add(fingerprint)
+        return index
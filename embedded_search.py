@@ -0,0 +1,670 @@
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from text_normalizer import normalize_text
+
+# BM25F: title matches count TITLE_WEIGHT times a content match, like "title^3" in the Elasticsearch query
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3.0
+
+SNIPPET_LENGTH = 150  # like the content highlight's fragment_size
+SUMMARY_LENGTH = 200  # like the summary the indexer stores in Elasticsearch
+TOKEN_PATTERN = re.compile(r'\w+')
+AND_PATTERN = re.compile(r'\bAND\b')
+
+# postings are stored in blocks of BLOCK_SIZE, each with skip data and score bounds
+BLOCK_SIZE = 128
+BOUND_SCALE = 1024  # block bounds are stored as integers, rounded up, in 1/BOUND_SCALE units
+POSTINGS_FORMAT = 2
+# matches are counted exactly up to this many, like Elasticsearch's track_total_hits default;
+# beyond it, blocks that cannot reach the top results are skipped and the total is a lower bound
+TRACK_TOTAL_HITS = 10000
+END = float('inf')  # doc of a cursor past its last posting
+
+MANIFEST_NAME = 'manifest.json'
+CURRENT_NAME = 'CURRENT'
+GENERATION_PREFIX = 'web_search_v'
+
+
+def tokenize(text):
+    """Terms of a text: normalize_text, lowercase, split on anything that is not a word character"""
+    return TOKEN_PATTERN.findall(normalize_text(text).lower())
+
+
+def parse_query(query):
+    """Distinct query terms, all of which must match; explicit AND operators are dropped"""
+    return list(dict.fromkeys(tokenize(AND_PATTERN.sub(' ', query))))
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, position):
+    """(value, next position) of the varint at position"""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def decode_varints(data):
+    """Every varint in a bytes-like object"""
+    data = bytes(data)
+    if max(data, default=0) < 0x80:
+        # every value fits in one byte, the usual case for small deltas and term frequencies
+        return list(data)
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+def gallop(values, target, low=0):
+    """First index >= low whose value is >= target, len(values) if none.
+
+    Probes 1, 2, 4, ... positions ahead of low before a binary search, so a
+    short move forward costs a few comparisons however long values is.
+    """
+    size = len(values)
+    step = 1
+    high = low
+    while high < size and values[high] < target:
+        low = high + 1
+        high += step
+        step *= 2
+    return bisect_left(values, target, low, min(high, size))
+
+
+class EmbeddedIndexWriter:
+    """Builds one index generation: a manifest plus segments of up to segment_documents documents.
+
+    A segment is six files, each either read through mmap or cast in place:
+
+    - .terms     the segment's terms, UTF-8, sorted, back to back
+    - .termidx   uint64 triples per term: end of the term in .terms, document frequency, end of its postings
+    - .postings  per term, blocks of BLOCK_SIZE (document delta, title tf, content tf) varints in
+                 document order, preceded by a skip table (see encode_blocks)
+    - .lengths   uint32 pairs per document: title and content length in terms
+    - .docs / .docidx  zlib-compressed [url, title, content, content_hash, simhash] records and their offsets
+    """
+
+    def __init__(self, directory, segment_documents=10000):
+        self.directory = directory
+        self.segment_documents = segment_documents
+        self.segments = []
+        self.documents = 0
+        self.title_length = 0
+        self.content_length = 0
+        os.makedirs(directory, exist_ok=True)
+        self.new_segment()
+
+    def segment_path(self, suffix):
+        return os.path.join(self.directory, f"seg-{len(self.segments):05d}{suffix}")
+
+    def new_segment(self):
+        self.postings = defaultdict(bytearray)
+        self.last_doc = {}
+        self.df = Counter()
+        self.lengths = array('I')
+        self.doc_offsets = array('Q', [0])
+        self.docs_file = open(self.segment_path('.docs'), 'wb')
+
+    def add(self, url, title, content, content_hash=None, simhash=None):
+        title_terms = Counter(tokenize(title))
+        content_terms = Counter(tokenize(content))
+        doc = len(self.doc_offsets) - 1
+        for term in title_terms.keys() | content_terms.keys():
+            out = self.postings[term]
+            encode_varint(doc - self.last_doc.get(term, 0), out)
+            encode_varint(title_terms[term], out)
+            encode_varint(content_terms[term], out)
+            self.last_doc[term] = doc
+            self.df[term] += 1
+
+        title_length = sum(title_terms.values())
+        content_length = sum(content_terms.values())
+        self.lengths.extend((title_length, content_length))
+        self.title_length += title_length
+        self.content_length += content_length
+
+        record = zlib.compress(json.dumps([url, title, content, content_hash, simhash], ensure_ascii=False).encode('utf-8'))
+        self.docs_file.write(record)
+        self.doc_offsets.append(self.doc_offsets[-1] + len(record))
+        self.documents += 1
+        if doc + 1 >= self.segment_documents:
+            self.flush_segment()
+            self.new_segment()
+
+    def flush_segment(self):
+        self.docs_file.close()
+        count = len(self.doc_offsets) - 1
+        if count == 0:
+            os.remove(self.segment_path('.docs'))
+            return
+        average_title, average_content = self.segment_averages()
+        terms = bytearray()
+        term_index = array('Q')
+        postings_end = 0
+        with open(self.segment_path('.postings'), 'wb') as f:
+            for encoded, term in sorted((term.encode('utf-8'), term) for term in self.postings):
+                postings = self.encode_blocks(self.postings[term], average_title, average_content)
+                f.write(postings)
+                terms += encoded
+                postings_end += len(postings)
+                term_index.extend((len(terms), self.df[term], postings_end))
+        with open(self.segment_path('.terms'), 'wb') as f:
+            f.write(terms)
+        for suffix, values in (('.termidx', term_index), ('.lengths', self.lengths), ('.docidx', self.doc_offsets)):
+            with open(self.segment_path(suffix), 'wb') as f:
+                values.tofile(f)
+        self.segments.append({'name': f"seg-{len(self.segments):05d}", 'documents': count,
+                              'base': self.documents - count, 'average_title': average_title,
+                              'average_content': average_content})
+
+    def segment_averages(self):
+        count = max(len(self.lengths) // 2, 1)
+        return max(sum(self.lengths[0::2]) / count, 1.0), max(sum(self.lengths[1::2]) / count, 1.0)
+
+    def encode_blocks(self, postings, average_title, average_content):
+        """A term's postings split into blocks, behind a skip table with one entry per block.
+
+        Layout: varint block count, varint skip table size, the skip table, the blocks.
+        A skip table entry is the block's last document (delta from the previous block's),
+        its size in bytes, and the highest length-normalized title and content tf in the
+        block, taken against this segment's average lengths (see PostingsCursor for how they
+        bound scores under the final averages). Document deltas inside a block continue
+        from the previous block's last document.
+        """
+        values = decode_varints(postings)
+
+        def title_norm(length):
+            return 1 - BM25_B + BM25_B * length / average_title
+
+        def content_norm(length):
+            return 1 - BM25_B + BM25_B * length / average_content
+
+        skip = bytearray()
+        blocks = bytearray()
+        count = 0
+        doc = previous_last = 0
+        for start in range(0, len(values), 3 * BLOCK_SIZE):
+            block = bytearray()
+            max_title = max_content = 0.0
+            base = previous_last
+            for i in range(start, min(start + 3 * BLOCK_SIZE, len(values)), 3):
+                doc += values[i]
+                encode_varint(doc - base, block)
+                encode_varint(values[i + 1], block)
+                encode_varint(values[i + 2], block)
+                base = doc
+                max_title = max(max_title, values[i + 1] / title_norm(self.lengths[2 * doc]))
+                max_content = max(max_content, values[i + 2] / content_norm(self.lengths[2 * doc + 1]))
+            for value in (doc - previous_last, len(block), math.ceil(max_title * BOUND_SCALE),
+                          math.ceil(max_content * BOUND_SCALE)):
+                encode_varint(value, skip)
+            blocks += block
+            previous_last = doc
+            count += 1
+        out = bytearray()
+        encode_varint(count, out)
+        encode_varint(len(skip), out)
+        return out + skip + blocks
+
+    def commit(self):
+        """Write the last segment and the manifest; the generation is complete once the manifest exists"""
+        self.flush_segment()
+        manifest = {
+            'format': POSTINGS_FORMAT,
+            'segments': self.segments,
+            'documents': self.documents,
+            'title_length': self.title_length,
+            'content_length': self.content_length,
+            'created': time.time()
+        }
+        temp_path = os.path.join(self.directory, f"{MANIFEST_NAME}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, os.path.join(self.directory, MANIFEST_NAME))
+        return manifest
+
+
+class Segment:
+    """Read side of one segment; every file is mmapped and nothing is decoded until a query needs it"""
+
+    def __init__(self, directory, name, base, average_title, average_content):
+        self.base = base
+        # average title and content length of this segment's documents, which its block bounds assume
+        self.average_title = average_title
+        self.average_content = average_content
+        self.maps = []
+        self.views = []
+        path = os.path.join(directory, name)
+        self.terms = self.map(f"{path}.terms")
+        self.term_index = self.map(f"{path}.termidx", 'Q')
+        self.postings_data = self.map(f"{path}.postings")
+        self.lengths = self.map(f"{path}.lengths", 'I')
+        self.doc_offsets = self.map(f"{path}.docidx", 'Q')
+        self.docs = self.map(f"{path}.docs")
+        self.term_count = len(self.term_index) // 3
+
+    def map(self, path, format=None):
+        view = memoryview(b'')
+        if os.path.getsize(path):
+            with open(path, 'rb') as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps.append(segment_map)
+            view = memoryview(segment_map)
+        self.views.append(view)
+        if format:
+            view = view.cast(format)
+            self.views.append(view)
+        return view
+
+    def term_at(self, position):
+        start = self.term_index[3 * position - 3] if position else 0
+        return bytes(self.terms[start:self.term_index[3 * position]])
+
+    def find(self, term):
+        """(document frequency, postings start, postings end) of a UTF-8 term, or None"""
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term_at(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.term_count or self.term_at(low) != term:
+            return None
+        start = self.term_index[3 * low - 1] if low else 0
+        return self.term_index[3 * low + 1], start, self.term_index[3 * low + 2]
+
+    def document(self, doc):
+        """[url, title, content, content_hash, simhash] of a document"""
+        record = self.docs[self.doc_offsets[doc]:self.doc_offsets[doc + 1]]
+        document = json.loads(zlib.decompress(record))
+        # generations written before the SimHash was stored
+        return document + [None] * (5 - len(document))
+
+    def __len__(self):
+        return len(self.doc_offsets) - 1 if len(self.doc_offsets) else 0
+
+    def close(self):
+        for view in reversed(self.views):
+            view.release()
+        for segment_map in self.maps:
+            segment_map.close()
+
+
+def highlight(text, terms):
+    """text with words that contain a query term wrapped in <b></b>"""
+    return ' '.join(f"<b>{word}</b>" if any(token in terms for token in TOKEN_PATTERN.findall(word.lower()))
+                    else word for word in text.split(' '))
+
+
+def snippet(content, terms, length=SNIPPET_LENGTH):
+    """About length characters of content around the first query term, matches highlighted; None if none match"""
+    words = content.split(' ')
+    for first, word in enumerate(words):
+        if any(token in terms for token in TOKEN_PATTERN.findall(word.lower())):
+            break
+    else:
+        return None
+    # a little context before the match, then words until the fragment is long enough
+    start = first
+    before = 0
+    while start > 0 and before + len(words[start - 1]) < length // 4:
+        start -= 1
+        before += len(words[start]) + 1
+    end = first
+    size = before
+    while end < len(words) and size < length:
+        size += len(words[end]) + 1
+        end += 1
+    return highlight(' '.join(words[start:end]), terms)
+
+
+def summary(content, length=SUMMARY_LENGTH):
+    """The start of content without cutting the last word, for hits whose content has no match"""
+    if len(content) <= length:
+        return content
+    cut = content[:length]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut + '…'
+
+
+class PostingsCursor:
+    """One term's postings within a segment, read a block at a time.
+
+    Only the skip table is read up front. blocks() and window() gallop
+    through it to the blocks a query needs and decode just those, so blocks
+    that a query jumps over are never decoded.
+
+    bounds[b] is the highest score the term can add to any document in block
+    b. The skip table holds the block's highest tf / (1 - b + b * length / A)
+    for the segment's average length A; with the index-wide average A' the
+    same document's value is at most max(1, A' / A) times that, so scaling by
+    that factor keeps the bound safe whatever the other segments look like.
+    """
+
+    def __init__(self, index, segment, entry, idf):
+        data = segment.postings_data
+        _, position, _ = entry
+        self.data = data
+        block_count, position = read_varint(data, position)
+        skip_size, position = read_varint(data, position)
+        skip = decode_varints(data[position:position + skip_size])
+        position += skip_size
+
+        title_scale = TITLE_WEIGHT * max(1.0, index.average_title / segment.average_title) / BOUND_SCALE
+        content_scale = max(1.0, index.average_content / segment.average_content) / BOUND_SCALE
+        self.last = []  # last document of each block
+        self.starts = []  # byte offset of each block
+        self.bounds = []
+        last = 0
+        for i in range(0, 4 * block_count, 4):
+            last_delta, size, max_title, max_content = skip[i:i + 4]
+            last += last_delta
+            self.last.append(last)
+            self.starts.append(position)
+            position += size
+            tf = max_title * title_scale + max_content * content_scale
+            # a hair above the exact bound, so rounding never makes a bound smaller than a real score
+            self.bounds.append(idf * tf / (BM25_K1 + tf) * (1 + 1e-9))
+        self.end = position
+        self.first = 0  # no document before block self.first will be asked for again
+        self.decoded = (None, None)
+
+    def decode(self, block):
+        """{document: (title tf, content tf)} of one block; the last decoded block is kept"""
+        if self.decoded[0] != block:
+            end = self.starts[block + 1] if block + 1 < len(self.starts) else self.end
+            values = decode_varints(self.data[self.starts[block]:end])
+            doc = self.last[block - 1] if block else 0
+            docs = []
+            for delta in values[0::3]:
+                doc += delta
+                docs.append(doc)
+            self.decoded = (block, dict(zip(docs, zip(values[1::3], values[2::3]))))
+        return self.decoded[1]
+
+    def blocks(self, low, high):
+        """Range of blocks that overlap documents low..high (which never move backwards), None past the end"""
+        first = gallop(self.last, low, self.first)
+        if first == len(self.last):
+            return None
+        self.first = first
+        return range(first, min(gallop(self.last, high, first), len(self.last) - 1) + 1)
+
+    def bound(self, blocks):
+        return max(self.bounds[blocks.start:blocks.stop])
+
+    def window(self, blocks, candidates):
+        """Postings of a range of blocks, as a {document: (title tf, content tf)} dict.
+
+        With fewer candidate documents than blocks, only the blocks holding a
+        candidate are decoded, each found by galloping from the previous one.
+        """
+        if len(blocks) > len(candidates):
+            needed = []
+            block = blocks.start
+            for doc in sorted(candidates):
+                block = gallop(self.last, doc, block)
+                if not needed or needed[-1] != block:
+                    needed.append(block)
+            blocks = needed
+        if len(blocks) == 1:
+            return self.decode(blocks[0])
+        postings = {}
+        for block in blocks:
+            postings.update(self.decode(block))
+        return postings
+
+
+class EmbeddedIndex:
+    """A committed generation: top-k BM25F search over its segments with AND semantics"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.generation = os.path.basename(os.path.normpath(directory))
+        with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format', 1) != POSTINGS_FORMAT:
+            raise ValueError(f"{directory} uses an older postings format; rebuild it with "
+                             f"indexer.py --backend embedded")
+        self.segments = [Segment(directory, segment['name'], segment['base'], segment['average_title'],
+                                 segment['average_content'])
+                         for segment in self.manifest['segments']]
+        self.documents = self.manifest['documents']
+        self.average_title = max(self.manifest['title_length'] / max(self.documents, 1), 1.0)
+        self.average_content = max(self.manifest['content_length'] / max(self.documents, 1), 1.0)
+
+    def __len__(self):
+        return self.documents
+
+    def score(self, segment, matches, windows, idfs):
+        """(BM25F score, document) of each match, from its terms' {document: (title tf, content tf)} windows"""
+        lengths = segment.lengths
+        title_base, title_scale = 1 - BM25_B, BM25_B / self.average_title
+        content_base, content_scale = 1 - BM25_B, BM25_B / self.average_content
+        terms = list(zip(windows, idfs))
+        for doc in matches:
+            title_norm = title_base + title_scale * lengths[2 * doc]
+            content_norm = content_base + content_scale * lengths[2 * doc + 1]
+            score = 0.0
+            for window, idf in terms:
+                title_tf, content_tf = window[doc]
+                tf = TITLE_WEIGHT * title_tf / title_norm + content_tf / content_norm
+                score += idf * tf / (BM25_K1 + tf)
+            yield score, doc
+
+    def search(self, query, size=20, offset=0, track_total_hits=TRACK_TOTAL_HITS):
+        """Documents that contain every query term, best BM25F score first (ties in index order).
+
+        Returns {'total': matches, 'total_relation': 'eq' or 'gte', 'hits': [{'url', 'title',
+        'summary', 'score'}]}; title and summary have the matched words in <b></b>. If only the
+        title matched, summary is the start of the content. Once track_total_hits matches have
+        been counted (None: never), total is a lower bound.
+        """
+        if size < 1 or offset < 0:
+            raise ValueError("size must be positive and offset must not be negative")
+        terms = parse_query(query)
+        if not terms:
+            return {'total': 0, 'total_relation': 'eq', 'hits': []}
+        encoded = [term.encode('utf-8') for term in terms]
+        entries = [[segment.find(term) for term in encoded] for segment in self.segments]
+        dfs = [sum(segment_entries[i][0] for segment_entries in entries if segment_entries[i])
+               for i in range(len(terms))]
+        if not all(dfs):
+            return {'total': 0, 'total_relation': 'eq', 'hits': []}
+        idfs = [math.log(1 + (self.documents - df + 0.5) / (df + 0.5)) for df in dfs]
+
+        state = {'total': 0, 'exact': True, 'heap': [], 'keep': offset + size,
+                 'track_total_hits': track_total_hits}
+        for number, (segment, segment_entries) in enumerate(zip(self.segments, entries)):
+            if all(segment_entries):
+                self.search_segment(number, segment, segment_entries, idfs, state)
+
+        term_set = set(terms)
+        hits = []
+        for score, _, number, doc in sorted(state['heap'], reverse=True)[offset:]:
+            url, title, content, _, _ = self.segments[number].document(doc)
+            hits.append({
+                'url': url,
+                'title': highlight(title, term_set) if title else title,
+                'summary': snippet(content, term_set) or summary(content),
+                'score': score
+            })
+        return {'total': state['total'], 'total_relation': 'eq' if state['exact'] else 'gte', 'hits': hits}
+
+    def search_segment(self, number, segment, entries, idfs, state):
+        """Block-max AND over one segment, adding its best matches to state['heap'].
+
+        Terms are taken rarest first. Each block of the rarest term is a window of
+        documents; every other term skips through its skip table to the blocks that
+        overlap the window, and the window's matches are the intersection of those
+        blocks. If the block bounds of the window add up to no more than the lowest
+        score in a full heap, its matches are counted but not scored, and once
+        track_total_hits matches have been counted such a window is skipped without
+        decoding anything.
+        """
+        order = sorted(range(len(entries)), key=lambda i: entries[i][0])
+        cursors = [PostingsCursor(self, segment, entries[i], idfs[i]) for i in order]
+        idfs = [idfs[i] for i in order]
+        lead, others = cursors[0], cursors[1:]
+        heap = state['heap']
+        keep = state['keep']
+        limit = state['track_total_hits']
+
+        for block, high in enumerate(lead.last):
+            low = lead.last[block - 1] + 1 if block else 0
+            ranges = [cursor.blocks(low, high) for cursor in others]
+            if None in ranges:
+                # a term has no documents left in this segment
+                return
+            full = len(heap) >= keep
+            bound = lead.bounds[block] + sum(cursor.bound(blocks) for cursor, blocks in zip(others, ranges))
+            if full and bound <= heap[0][0] and limit is not None and state['total'] >= limit:
+                state['exact'] = False
+                continue
+
+            windows = [lead.decode(block)]
+            matches = windows[0].keys()
+            for cursor, blocks in zip(others, ranges):
+                window = cursor.window(blocks, matches)
+                matches = window.keys() & matches
+                if not matches:
+                    break
+                windows.append(window)
+            if not matches:
+                continue
+            state['total'] += len(matches)
+            if full and bound <= heap[0][0]:
+                continue
+            base = segment.base
+            for score, doc in self.score(segment, matches, windows, idfs):
+                if len(heap) < keep:
+                    heapq.heappush(heap, (score, -(base + doc), number, doc))
+                elif score >= heap[0][0]:
+                    item = (score, -(base + doc), number, doc)
+                    if item > heap[0]:
+                        heapq.heapreplace(heap, item)
+
+    def iter_documents(self):
+        """(url, title, content, content_hash, simhash) of every document"""
+        for segment in self.segments:
+            for doc in range(len(segment)):
+                yield tuple(segment.document(doc))
+
+    def size_bytes(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+
+def generation_sort_key(generation):
+    return int(generation.rsplit('_v', 1)[1])
+
+
+def list_generations(root):
+    """Committed generations under root, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    return sorted((name for name in os.listdir(root) if name.startswith(GENERATION_PREFIX)
+                   and os.path.isfile(os.path.join(root, name, MANIFEST_NAME))), key=generation_sort_key)
+
+
+def current_generation(root):
+    """The generation searches are served from, or None"""
+    try:
+        with open(os.path.join(root, CURRENT_NAME), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def create_generation(root):
+    """Directory name for a new generation, web_search_v{timestamp} like the Elasticsearch generations"""
+    os.makedirs(root, exist_ok=True)
+    stamp = int(time.time())
+    while os.path.exists(os.path.join(root, f"{GENERATION_PREFIX}{stamp}")):
+        stamp += 1
+    return f"{GENERATION_PREFIX}{stamp}"
+
+
+def point_current(root, generation):
+    """Switch searches to a generation atomically"""
+    temp_path = os.path.join(root, f"{CURRENT_NAME}.tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(generation)
+    os.replace(temp_path, os.path.join(root, CURRENT_NAME))
+
+
+def publish_generation(root, generation, keep=2):
+    """Serve searches from generation and delete all but the keep newest older generations"""
+    point_current(root, generation)
+    old = [g for g in list_generations(root) if g != generation]
+    expired = old[:len(old) - keep] if keep > 0 else old
+    for name in expired:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def rollback_generation(root):
+    """Serve searches from the generation before the current one; returns it, or None if there is none"""
+    current = current_generation(root)
+    older = [g for g in list_generations(root)
+             if current is None or generation_sort_key(g) < generation_sort_key(current)]
+    if not older:
+        return None
+    point_current(root, older[-1])
+    return older[-1]
+
+
+class EmbeddedSearchEngine:
+    """Opened generations of an index root; index() follows CURRENT as the indexer publishes"""
+
+    def __init__(self, root):
+        self.root = root
+        self.opened = {}
+
+    def index(self, generation=None):
+        """The given generation if list_generations() has it, else the current one; None if nothing is indexed"""
+        live = set(list_generations(self.root))
+        if generation not in live:
+            # only names listed under root are joined into a path, never one taken from a request as is
+            generation = current_generation(self.root)
+            if generation is None:
+                return None
+        index = self.opened.get(generation)
+        if index is None:
+            # older generations stay open for cursors of searches that started on them, until pruned
+            self.opened = {name: opened for name, opened in self.opened.items() if name in live}
+            index = self.opened[generation] = EmbeddedIndex(os.path.join(self.root, generation))
+        return index
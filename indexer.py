@@ -1,17 +1,69 @@
 import os
+import io
+import gzip
+import copy
 import json
+import hashlib
+import itertools
 import time
 import re
+import argparse
+import queue
+import multiprocessing
+import shutil
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 from bs4 import BeautifulSoup
-from elasticsearch import Elasticsearch
+from elasticsearch import BadRequestError, Elasticsearch, helpers
+
+from crawl_writer import crawl_segments
+from dedup import NearDuplicateIndex, canonicalize_url, simhash
+from page_store import PageStore, is_page_store
+from text_normalizer import normalize_text
+import embedded_search
 
 # import hazm
 
 # تنظیمات اتصال به Elasticsearch
 es = Elasticsearch(['http://localhost:9200'])
 
-# تنظیمات نمایه
+# موتور جستجو: elasticsearch یا embedded (نمایه معکوس داخلی در embedded_index_dir، بدون سرویس خارجی)
+search_backend = os.environ.get('SEARCH_BACKEND', 'elasticsearch')
+embedded_index_dir = os.environ.get('EMBEDDED_INDEX_DIR', 'embedded_index')
+
+# تنظیمات نمایه؛ web_search یک alias است که به آخرین نسل نمایه (web_search_v{timestamp}) اشاره می‌کند
 index_name = 'web_search'
+keep_generations = 2  # تعداد نسل‌های قدیمی نگه‌داشته شده برای بازگشت (rollback)
+
+# تنظیمات نمایه‌سازی دسته‌ای (bulk)
+bulk_chunk_size = 500  # تعداد اسناد در هر درخواست bulk
+bulk_thread_count = 4  # تعداد درخواست‌های bulk همزمان
+dead_letter_file = 'dead_letter.jsonl'  # فایل اسنادی که نمایه‌سازی آن‌ها شکست خورد
+
+# تنظیمات مرحله استخراج چندفرایندی
+extract_workers = os.cpu_count() or 1  # تعداد فرایندهای استخراج (0 یعنی استخراج در همین فرایند)
+extract_chunk_size = 64  # تعداد اسناد ارسالی به هر فرایند در هر نوبت
+extract_queue_size = 16  # حداکثر دسته‌های استخراج شده در صف انتظار نمایه‌ساز
+
+# تنظیمات خواندن مستقیم پوشه صفحات HTML خزشگرها
+html_read_threads = 8  # تعداد فایل‌های HTML که همزمان خوانده می‌شوند
+html_read_ahead = 64  # حداکثر فایل‌های خوانده شده که منتظر مرحله استخراج می‌مانند
+
+# نام فایل صفحات: {id}.html در crawl_search_Engine و page {id}.html در crawler_type2
+html_file_pattern = re.compile(r'(\d+)\.html?$')
+
+# فایل اثر انگشت محتوای اسناد نمایه‌شده برای نمایه‌سازی افزایشی
+fingerprint_file = 'fingerprints.json'
+
+# آمار آخرین نمایه‌سازی؛ app.py با تغییر index_generation در آن کش نتایج را نامعتبر می‌کند
+stats_file = 'indexing_stats.json'
+
+summary_length = 200  # طول خلاصه پیش‌فرض ذخیره شده برای هر سند
+
+# حداکثر اختلاف بیتی SimHash دو سند تا تقریباً تکراری شمرده شوند
+near_duplicate_distance = 3
+
 index_settings = {
     'settings': {
         'number_of_shards': 1,
@@ -53,40 +105,28 @@ index_settings = {
     'mappings': {
         'properties': {
             'url': {'type': 'keyword'},
+            'content_hash': {'type': 'keyword'},
+            # SimHash متن (هگز 64 بیتی) برای کنار گذاشتن تکراری‌ها در نمایه‌سازی افزایشی بعدی
+            'simhash': {'type': 'keyword', 'index': False},
             'title': {
                 'type': 'text',
                 'analyzer': 'persian_analyzer'
             },
             'content': {
                 'type': 'text',
-                'analyzer': 'persian_analyzer'
+                'analyzer': 'persian_analyzer',
+                # ذخیره offsetها تا highlighter سریع (unified) بدون تحلیل دوباره متن کار کند
+                'index_options': 'offsets'
+            },
+            # خلاصه ابتدای متن، برای نتایجی که highlight محتوا ندارند
+            'summary': {
+                'type': 'text',
+                'index': False
             }
         }
     }
 }
 
-# ایجاد نمایه اگر وجود نداشته باشد
-if not es.indices.exists(index=index_name):
-    es.indices.create(index=index_name, body=index_settings)
-    print(f"Index '{index_name}' created successfully")
-
-
-def normalize_text(text):
-    """نرمال‌سازی متن فارسی"""
-    if not text:
-        return ""
-
-    # تبدیل ی و ک عربی به فارسی
-    text = text.replace('ي', 'ی').replace('ك', 'ک')
-
-    # حذف کاراکترهای اضافی
-    text = re.sub(r'[^\w\s\u0600-\u06FF]', ' ', text)
-
-    # حذف فاصله‌های اضافی
-    text = re.sub(r'\s+', ' ', text).strip()
-
-    return text
-
 
 def extract_text_from_html(html_content):
     """استخراج عنوان و متن از محتوای HTML"""
@@ -118,132 +158,1067 @@ def extract_text_from_html(html_content):
     return title, text
 
 
+def open_crawl_file(file_path):
+    """باز کردن فایل خزش به صورت متنی؛ فایل‌های فشرده gzip و zstd هم پشتیبانی می‌شوند"""
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rt', encoding='utf-8')
+    if file_path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Reading .zst files requires the 'zstandard' package")
+        raw = open(file_path, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return open(file_path, 'r', encoding='utf-8')
+
+
+def iter_json_array(f, read_size=1 << 16):
+    """خواندن تدریجی عناصر یک آرایه JSON بدون بارگذاری کل فایل در حافظه"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(read_size)
+    pos = 0
+    eof = not buffer
+
+    def skip(chars):
+        nonlocal buffer, pos, eof
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            buffer, pos = f.read(read_size), 0
+            eof = not buffer
+
+    skip(' \t\r\n\ufeff')
+    if pos >= len(buffer):
+        return
+    if buffer[pos] != '[':
+        # کل فایل یک شیء JSON است
+        yield json.loads(buffer[pos:] + f.read())
+        return
+    pos += 1
+
+    while True:
+        skip(' \t\r\n,')
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of JSON array")
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # سند کامل در بافر نیست؛ بافر را (حداقل دو برابر) بزرگ‌تر می‌کنیم
+            chunk = f.read(max(read_size, len(buffer) - pos))
+            buffer, pos = buffer[pos:] + chunk, 0
+            eof = not chunk
+            continue
+        if not eof and not isinstance(item, (dict, list, str)) and (
+                end == len(buffer) or buffer[end] not in ' \t\r\n,]'):
+            # عددی که در انتهای بافر یا پیش از نویسه‌ای جز جداکننده تمام شده (مثلاً 12 از 1234 یا 1 از 1.5)
+            # ممکن است در خواندن بعدی ادامه داشته باشد
+            chunk = f.read(read_size)
+            buffer, pos = buffer[pos:] + chunk, 0
+            eof = not chunk
+            continue
+        yield item
+        pos = end
+        if pos > read_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_crawled_data(file_path):
+    """خواندن تدریجی داده‌های خزش شده؛ اسناد یکی‌یکی تولید می‌شوند
+
+    file_path می‌تواند یک فایل، یک پوشه از فایل‌های خزش، یا مسیر پایه خروجی CrawlWriter باشد
+    که در آن صورت قطعه‌های چرخشی (crawled_data-00000.jsonl, ...) به ترتیب خوانده می‌شوند.
+    انباره صفحات خزشگر crawl_search_Engine (پوشه خروجی آن یا زیرپوشه pages) و پوشه‌ای از
+    فایل‌های HTML همراه با metadata.json (خروجی crawler_type2 و نسخه‌های قبلی crawl_search_Engine) هم
+    پشتیبانی می‌شوند.
+    """
+    for store_path in (file_path, os.path.join(file_path, 'pages')):
+        if os.path.isdir(store_path) and is_page_store(store_path):
+            yield from iter_page_store(store_path)
+            return
+    html_directory = find_html_directory(file_path)
+    if html_directory is not None:
+        yield from iter_html_directory(html_directory)
+        return
+    for segment in crawl_segments(file_path):
+        yield from iter_crawl_file(segment)
+
+
+def iter_page_store(store_path):
+    """خواندن تدریجی صفحات از انباره صفحات؛ هر صفحه جداگانه از حالت فشرده خارج می‌شود"""
+    store = PageStore(store_path)
+    count = 0
+    try:
+        for page_id, url, html_content in store.iter_pages():
+            count += 1
+            yield {'url': url, 'content': html_content}
+    finally:
+        store.close()
+    print(f"Read {count} documents from {store_path}")
+
+
+def list_html_files(directory):
+    """فایل‌های HTML یک پوشه به صورت (شناسه صفحه، مسیر)، مرتب بر اساس شناسه"""
+    files = []
+    for name in os.listdir(directory):
+        match = html_file_pattern.search(name)
+        if match:
+            files.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(files)
+
+
+def find_html_directory(path):
+    """پوشه صفحات HTML: خود path یا زیرپوشه html آن؛ اگر فایل HTML نداشته باشند None"""
+    if not os.path.isdir(path):
+        return None
+    for directory in (os.path.join(path, 'html'), path):
+        if os.path.isdir(directory) and list_html_files(directory):
+            return directory
+    return None
+
+
+def load_url_mapping(html_directory):
+    """نگاشت شناسه صفحه به URL از metadata.json کنار فایل‌ها یا در پوشه بالاتر"""
+    for directory in (html_directory, os.path.dirname(os.path.abspath(html_directory))):
+        metadata_path = os.path.join(directory, 'metadata.json')
+        if os.path.isfile(metadata_path):
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                return {int(page_id): url for page_id, url in json.load(f).get('url_mapping', {}).items()}
+    return {}
+
+
+def read_html_file(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def iter_html_directory(html_directory, threads=html_read_threads, read_ahead=html_read_ahead):
+    """خواندن موازی فایل‌های HTML یک پوشه و پیوند هر فایل با URL آن از metadata.json
+
+    اسناد به ترتیب شناسه تولید می‌شوند و حداکثر read_ahead فایل خوانده شده در حافظه می‌ماند.
+    """
+    url_mapping = load_url_mapping(html_directory)
+    count = 0
+    unmapped = 0
+
+    def take(pending):
+        nonlocal count
+        url, path, future = pending.popleft()
+        try:
+            html_content = future.result()
+        except OSError as e:
+            print(f"Error reading file {path}: {e}")
+            return None
+        count += 1
+        return {'url': url, 'content': html_content}
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = deque()
+        for page_id, path in list_html_files(html_directory):
+            url = url_mapping.get(page_id)
+            if url is None:
+                # بدون URL شناسه سند ساخته نمی‌شود
+                unmapped += 1
+                continue
+            pending.append((url, path, pool.submit(read_html_file, path)))
+            if len(pending) >= read_ahead:
+                doc = take(pending)
+                if doc is not None:
+                    yield doc
+        while pending:
+            doc = take(pending)
+            if doc is not None:
+                yield doc
+
+    if unmapped:
+        print(f"Warning: {unmapped} HTML files in {html_directory} have no URL in metadata.json and were skipped")
+    print(f"Read {count} documents from {html_directory}")
+
+
+def iter_crawl_file(file_path):
+    """خواندن تدریجی یک فایل خزش"""
+    # پسوند فشرده‌سازی در تشخیص فرمت نقشی ندارد
+    base_path = re.sub(r'\.(gz|zst)$', '', file_path)
+
+    if not (base_path.endswith('.jsonl') or base_path.endswith('.json')):
+        # فرمت های دیگر
+        print(f"Unsupported file format: {file_path}")
+        return
+
+    count = 0
+    try:
+        with open_crawl_file(file_path) as f:
+            if base_path.endswith('.jsonl'):
+                # هر خط یک سند JSON
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        doc = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed line {line_number} in {file_path}: {e}")
+                        continue
+                    count += 1
+                    yield doc
+            else:
+                # کل فایل یک آرایه JSON
+                for doc in iter_json_array(f):
+                    count += 1
+                    yield doc
+    except (OSError, EOFError, ValueError, RuntimeError) as e:
+        # EOFError: قطعه فشرده‌ای که خزشگر پیش از بستن آن متوقف شده است
+        print(f"Error reading file {file_path}: {e}")
+
+    print(f"Read {count} documents from {file_path}")
+
+
 def read_crawled_data(file_path):
     """خواندن داده‌های خزش شده از فایل"""
-    documents = []
+    return list(iter_crawled_data(file_path))
+
+
+def make_summary(content, length=summary_length):
+    """ساخت خلاصه کوتاه از ابتدای متن، بدون شکستن کلمه آخر"""
+    if len(content) <= length:
+        return content
+    cut = content[:length]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut + '…'
 
+
+def prepare_document(doc):
+    """استخراج (url, title, content) از یک سند خام خزش شده"""
+    # اطمینان از وجود فیلدهای url و content
+    if 'url' not in doc or 'content' not in doc:
+        return None
+
+    url = doc['url']
+    html_content = doc['content']
+
+    title, content = extract_text_from_html(html_content)
+
+    # اطمینان از اینکه عنوان خالی نباشد
+    if not title or title.strip() == '':
+        # اگر عنوان خالی است، بخشی از محتوا را به عنوان عنوان استفاده کنیم
+        if content:
+            # استفاده از 50 کاراکتر اول محتوا به عنوان عنوان
+            title = content[:50] + "..." if len(content) > 50 else content
+        else:
+            # اگر محتوا هم خالی است، از URL به عنوان عنوان استفاده کنیم
+            title = url
+
+    return url, title, content
+
+
+def write_dead_letter(dead_letter, url, stage, error, document=None):
+    """ثبت یک سند ناموفق در فایل dead-letter به جای نادیده گرفتن آن"""
+    record = {
+        'url': url,
+        'stage': stage,
+        'error': error,
+        'timestamp': time.time()
+    }
+    if document is not None:
+        record['document'] = document
+    dead_letter.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def extract_documents(documents, dead_letter, timings, failed_urls=None):
+    """استخراج متن اسناد به صورت ترتیبی؛ خروجی تاپل‌های (url, title, content) است
+
+    URL اسنادی که استخراج آن‌ها شکست خورد به failed_urls اضافه می‌شود.
+    """
+    for doc in documents:
+        start = time.perf_counter()
+        try:
+            extracted = prepare_document(doc)
+        except Exception as e:
+            write_dead_letter(dead_letter, doc.get('url'), 'extract', str(e))
+            if failed_urls is not None:
+                failed_urls.append(doc.get('url'))
+            continue
+        finally:
+            timings['extract'] += time.perf_counter() - start
+        if extracted is not None:
+            yield extracted
+
+
+def extract_chunk(records):
+    """استخراج یک دسته از اسناد در فرایند کارگر"""
+    start = time.perf_counter()
+    extracted = []
+    failures = []
+    for doc in records:
+        try:
+            item = prepare_document(doc)
+        except Exception as e:
+            failures.append((doc.get('url'), str(e)))
+            continue
+        if item is not None:
+            extracted.append(item)
+    return extracted, failures, time.perf_counter() - start
+
+
+def extract_documents_parallel(documents, dead_letter, timings, workers=extract_workers,
+                               chunk_size=extract_chunk_size, failed_urls=None):
+    """استخراج متن اسناد با مجموعه‌ای از فرایندها و تحویل آن‌ها از طریق یک صف محدود"""
+    results = queue.Queue(maxsize=extract_queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        # اگر مصرف‌کننده متوقف شده باشد، منتظر جای خالی در صف نمی‌مانیم
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            # spawn به جای fork: این تابع از یک رشته اجرا می‌شود و fork در برنامه چندرشته‌ای ممکن است قفل‌ها را در فرزند قفل‌شده بگذارد
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                pending = deque()
+                records = ({k: doc[k] for k in ('url', 'content') if k in doc} for doc in documents)
+                for chunk in iter_chunks(records, chunk_size):
+                    pending.append(pool.submit(extract_chunk, chunk))
+                    # محدود کردن دسته‌های در حال پردازش برای کنترل مصرف حافظه
+                    if len(pending) >= workers * 2 and not put(pending.popleft().result()):
+                        return
+                while pending:
+                    if not put(pending.popleft().result()):
+                        return
+            put(None)
+        except Exception as e:
+            put(e)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
     try:
-        # بررسی فرمت فایل ورودی
-        # این قسمت باید با توجه به فرمت داده‌های خزش شده تغییر کند
-
-        if file_path.endswith('.jsonl') or file_path.endswith('.json'):
-            # فرمت JSONL یا JSON
-            with open(file_path, 'r', encoding='utf-8') as f:
-                if file_path.endswith('.jsonl'):
-                    # هر خط یک سند JSON
-                    for line in f:
-                        if line.strip():
-                            doc = json.loads(line)
-                            documents.append(doc)
-                else:
-                    # کل فایل یک آرایه JSON
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        documents = data
-                    else:
-                        documents = [data]
+        while True:
+            start = time.perf_counter()
+            item = results.get()
+            timings['wait_for_extract'] += time.perf_counter() - start
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            extracted, failures, elapsed = item
+            timings['extract'] += elapsed
+            for url, error in failures:
+                write_dead_letter(dead_letter, url, 'extract', error)
+                if failed_urls is not None:
+                    failed_urls.append(url)
+            yield from extracted
+    finally:
+        stop.set()
+        thread.join()
+
+
+def document_id(url):
+    """شناسه سند در Elasticsearch؛ خود URL، یا هش آن اگر از سقف 512 بایت _id بلندتر باشد"""
+    if len(url.encode('utf-8')) <= 512:
+        return url
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def content_fingerprint(html_content):
+    """اثر انگشت محتوای خام صفحه برای تشخیص تغییر"""
+    return hashlib.blake2b(html_content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def load_fingerprints(generation, path=fingerprint_file):
+    """بارگذاری اثر انگشت‌ها و SimHash اسناد نسل داده شده
+
+    اگر فایل محلی متعلق به نسل دیگری باشد از خود نمایه خوانده می‌شود.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('generation') == generation:
+            return manifest['fingerprints'], manifest.get('simhashes', {})
+    except (OSError, ValueError, KeyError):
+        pass
+
+    print(f"Fingerprint file does not match '{generation}', rebuilding it from the index")
+    fingerprints = {}
+    simhashes = {}
+    for hit in helpers.scan(es, index=generation, _source=['url', 'content_hash', 'simhash']):
+        source = hit['_source']
+        if source.get('content_hash'):
+            fingerprints[source['url']] = source['content_hash']
+        if source.get('simhash'):
+            simhashes[source['url']] = int(source['simhash'], 16)
+    return fingerprints, simhashes
+
+
+def save_fingerprints(generation, fingerprints, simhashes, path=fingerprint_file):
+    """ذخیره اتمیک فایل اثر انگشت‌ها"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'generation': generation, 'fingerprints': fingerprints, 'simhashes': simhashes}, f,
+                  ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def indexed_simhashes(fingerprints, previous, previous_simhashes, simhashes):
+    """SimHash هر سندی که پس از این اجرا در نمایه است
+
+    سندی که اثر انگشت آن با نسخه قبلی یکی است (بدون تغییر، یا ناموفق و بازگردانده شده) همان نسخه
+    قبلی است؛ بقیه در همین اجرا نمایه شده‌اند.
+    """
+    result = {}
+    for url, fingerprint in fingerprints.items():
+        value = previous_simhashes.get(url) if previous.get(url) == fingerprint else simhashes.get(url)
+        if value is not None:
+            result[url] = value
+    return result
+
+
+def keep_failed_for_retry(failed_urls, previous, fingerprints):
+    """اثر انگشت اسناد ناموفق به مقدار نسخه نمایه شده برمی‌گردد تا اجرای بعدی دوباره تلاش کند
+
+    سندی که استخراج یا نمایه‌سازی آن شکست خورد با اثر انگشت قبلی (یا بدون اثر انگشت اگر نسخه‌ای
+    نمایه نشده بود) ذخیره می‌شود و دوباره تغییر کرده شمرده می‌شود؛ سندی که حذف آن شکست خورد با
+    اثر انگشت قبلی باقی می‌ماند تا حذف آن دوباره انجام شود.
+    """
+    for url in failed_urls:
+        if url in previous:
+            fingerprints[url] = previous[url]
         else:
-            # فرمت های دیگر
-            print(f"Unsupported file format: {file_path}")
-            return []
+            fingerprints.pop(url, None)
+
+
+def filter_changed(documents, previous, fingerprints, counters, incremental=True):
+    """محاسبه اثر انگشت هر سند و عبور دادن فقط اسناد جدید یا تغییر کرده
+
+    در ساخت کامل (incremental=False) رکورد unchanged خزش مجدد باعث توقف می‌شود، چون محتوای آن
+    صفحه در ورودی نیست و نسل جدید بدون آن منتشر می‌شد.
+    """
+    for doc in documents:
+        if doc.get('unchanged') and 'url' in doc:
+            if not incremental:
+                raise RuntimeError(
+                    f"{doc['url']} was recorded as unchanged by the crawler and has no content, so a full "
+                    f"build would drop it from the index; index this recrawl with --incremental, or crawl "
+                    f"without --recrawl-cache")
+            # صفحه‌ای که خزشگر از خزش قبلی بدون تغییر یافته و محتوایش دوباره ذخیره نشده است؛
+            # اثر انگشت قبلی حفظ می‌شود تا سند نمایه شده پاک نشود
+            if doc['url'] in previous:
+                fingerprints[doc['url']] = previous[doc['url']]
+                counters['skipped'] += 1
+            else:
+                counters['unchanged_missing'] += 1
+            continue
+        if 'url' not in doc or 'content' not in doc:
+            continue
+        fingerprint = content_fingerprint(doc['content'])
+        unchanged = previous.get(doc['url']) == fingerprint
+        fingerprints[doc['url']] = fingerprint
+        if unchanged:
+            counters['skipped'] += 1
+            continue
+        yield doc
+
+
+def canonical_key(url):
+    return hashlib.blake2b(canonicalize_url(url).encode('utf-8'), digest_size=8).digest()
+
+
+def drop_duplicates(extracted_documents, fingerprints, simhashes, counters, kept=(),
+                    max_distance=near_duplicate_distance):
+    """کنار گذاشتن اسناد تکراری پیش از نمایه‌سازی
+
+    سندی که URL استاندارد آن (مثلاً https://huggingface.co و https://huggingface.co/) یا
+    SimHash متن آن با سندی که پیش‌تر دیده شده یکی باشد نمایه نمی‌شود. SimHash اسناد نمایه شده
+    در simhashes ثبت می‌شود تا همراه سند ذخیره شود.
+
+    در حالت افزایشی kept جفت‌های (URL، SimHash یا None) اسناد نسل فعلی است، تا سند جدیدی که
+    تکراری سندی است که پیش‌تر نمایه شده هم کنار گذاشته شود؛ نسخه قبلی خود یک URL تکراری آن
+    شمرده نمی‌شود. سند قبلی‌ای که در این خزش دیگر نیست و حذف می‌شود هم در این اجرا جلوی تکراری‌های
+    خود را می‌گیرد؛ آن تکراری‌ها بدون اثر انگشت می‌مانند و اجرای بعدی نمایه‌شان می‌کند.
+    """
+    canonical_urls = {}  # هش 8 بایتی URL استاندارد -> URL سندی که نگه داشته شده
+    near_duplicates = NearDuplicateIndex(max_distance)
+    owners = []  # جایگاه هر اثر انگشت در near_duplicates -> URL سند آن
+    for url, fingerprint in kept:
+        canonical_urls.setdefault(canonical_key(url), url)
+        if fingerprint is not None:
+            near_duplicates.add(fingerprint)
+            owners.append(url)
+
+    for url, title, content in extracted_documents:
+        canonical = canonical_key(url)
+        fingerprint = simhash(f"{title} {content}")
+        owner = canonical_urls.get(canonical, url)
+        if owner == url:
+            position = near_duplicates.find(fingerprint)
+            owner = owners[position] if position is not None else url
+        if owner != url:
+            counters['duplicates'] += 1
+            # بدون اثر انگشت، نسخه‌ای که پیش‌تر نمایه شده در حالت افزایشی حذف می‌شود
+            fingerprints.pop(url, None)
+            continue
+        canonical_urls[canonical] = url
+        near_duplicates.add(fingerprint)
+        owners.append(url)
+        simhashes[url] = fingerprint
+        yield url, title, content
+
+
+def build_actions(extracted_documents, target_index, fingerprints, simhashes=None):
+    """تبدیل اسناد استخراج شده به عملیات bulk"""
+    if simhashes is None:
+        simhashes = {}
+    for url, title, content in extracted_documents:
+        fingerprint = simhashes.get(url)
+        yield {
+            '_op_type': 'index',
+            '_index': target_index,
+            '_id': document_id(url),
+            '_source': {
+                'url': url,
+                'title': title,
+                'content': content,
+                'summary': make_summary(content),
+                'content_hash': fingerprints.get(url),
+                'simhash': f"{fingerprint:016x}" if fingerprint is not None else None
+            }
+        }
+
+
+def build_delete_actions(previous, fingerprints, target_index):
+    """حذف اسنادی که در خزش جدید دیگر وجود ندارند؛ پس از پایان جریان ورودی ارزیابی می‌شود"""
+    for url in previous.keys() - fingerprints.keys():
+        yield {
+            '_op_type': 'delete',
+            '_index': target_index,
+            '_id': document_id(url),
+            '_source': {'url': url}
+        }
 
+
+def iter_chunks(iterable, size):
+    """تقسیم یک جریان به دسته‌هایی با اندازه ثابت"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def send_bulk_chunk(chunk):
+    """ارسال یک دسته در یک درخواست bulk و برگرداندن نتیجه هر عملیات"""
+    operations = []
+    for action in chunk:
+        header = {'_index': action['_index']}
+        if '_id' in action:
+            header['_id'] = action['_id']
+        operations.append({action['_op_type']: header})
+        if action['_op_type'] != 'delete':
+            operations.append(action['_source'])
+
+    try:
+        response = es.bulk(operations=operations)
     except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
+        # خطای شبکه یا کل درخواست: همه اسناد دسته ناموفق هستند
+        return [(False, action, str(e)) for action in chunk]
+
+    if not response.get('errors'):
+        return [(True, action, None) for action in chunk]
+
+    results = []
+    for action, item in zip(chunk, response['items']):
+        info = next(iter(item.values()))
+        status = info.get('status', 500)
+        if 200 <= status < 300 or (action['_op_type'] == 'delete' and status == 404):
+            results.append((True, action, None))
+        else:
+            results.append((False, action, info.get('error', f"status {status}")))
+    return results
+
+
+def bulk_index(actions, dead_letter, timings, chunk_size=bulk_chunk_size, thread_count=bulk_thread_count):
+    """ارسال عملیات به صورت دسته‌ای با چند درخواست bulk همزمان"""
+    counts = defaultdict(int)
+    failed_urls = []
+    reported = 0
+    pending = set()
+
+    def send(chunk):
+        start = time.perf_counter()
+        results = send_bulk_chunk(chunk)
+        return results, time.perf_counter() - start
+
+    def collect(futures):
+        nonlocal reported
+        for future in futures:
+            results, elapsed = future.result()
+            timings['index'] += elapsed
+            for ok, action, error in results:
+                if ok:
+                    counts[action['_op_type']] += 1
+                    continue
+                source = action.get('_source', {})
+                failed_urls.append(source.get('url', action.get('_id')))
+                write_dead_letter(dead_letter, failed_urls[-1], action['_op_type'],
+                                  error, document=source or None)
+        if counts['index'] - reported >= 1000:
+            reported = counts['index']
+            print(f"Indexed {reported} documents...")
+
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        for chunk in iter_chunks(actions, chunk_size):
+            # محدود کردن تعداد دسته‌های در جریان برای ثابت ماندن مصرف حافظه
+            if len(pending) >= thread_count * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(send, chunk))
+
+        done, _ = wait(pending)
+        collect(done)
+
+    return counts, failed_urls
+
+
+def generation_sort_key(generation):
+    """ترتیب نسل‌ها بر اساس برچسب زمانی در نام آن‌ها"""
+    return int(generation.rsplit('_v', 1)[1])
+
+
+def list_generations():
+    """همه نسل‌های موجود نمایه، از قدیمی به جدید"""
+    generations = es.indices.get(index=f"{index_name}_v*", allow_no_indices=True)
+    return sorted(generations.keys(), key=generation_sort_key)
+
+
+def live_generations():
+    """نسل‌هایی که alias در حال حاضر به آن‌ها اشاره می‌کند"""
+    if not es.indices.exists_alias(name=index_name):
         return []
+    return list(es.indices.get_alias(name=index_name).keys())
 
-    print(f"Read {len(documents)} documents from {file_path}")
-    return documents
 
+def create_generation():
+    """ساخت یک نسل جدید نمایه با replica و refresh غیرفعال برای بارگذاری سریع
 
-def index_documents(documents):
-    """نمایه‌سازی اسناد در Elasticsearch"""
-    start_time = time.time()
-    count = 0
+    اگر نسلی با همین برچسب زمانی وجود داشته باشد (دو ساخت در یک ثانیه) برچسب بعدی گرفته می‌شود.
+    """
+    body = copy.deepcopy(index_settings)
+    body['settings']['number_of_replicas'] = 0
+    body['settings']['refresh_interval'] = '-1'
+    stamp = int(time.time())
+    while True:
+        generation = f"{index_name}_v{stamp}"
+        if not es.indices.exists(index=generation):
+            try:
+                es.indices.create(index=generation, body=body)
+                break
+            except BadRequestError as e:
+                # اجرای دیگری همزمان همین نسل را ساخته است
+                if e.error != 'resource_already_exists_exception':
+                    raise
+        stamp += 1
+    print(f"Index '{generation}' created successfully")
+    return generation
 
-    # حذف نمایه قبلی برای اطمینان از بازسازی کامل
-    if es.indices.exists(index=index_name):
-        es.indices.delete(index=index_name)
-        print(f"Existing index '{index_name}' deleted")
 
-    # ایجاد نمایه جدید
-    es.indices.create(index=index_name, body=index_settings)
-    print(f"Index '{index_name}' created successfully")
+def point_alias(generation):
+    """انتقال اتمیک alias به نسل داده شده"""
+    actions = [{'remove': {'index': old, 'alias': index_name}}
+               for old in live_generations() if old != generation]
+    # نمایه قدیمی که مستقیماً با نام web_search ساخته شده، در همان درخواست حذف می‌شود
+    if es.indices.exists(index=index_name) and not es.indices.exists_alias(name=index_name):
+        actions.append({'remove_index': {'index': index_name}})
+    actions.append({'add': {'index': generation, 'alias': index_name}})
+    es.indices.update_aliases(actions=actions)
+    print(f"Alias '{index_name}' now points to '{generation}'")
 
-    for doc in documents:
-        try:
-            # اطمینان از وجود فیلدهای url و content
-            if 'url' not in doc or 'content' not in doc:
-                continue
 
-            url = doc['url']
-            html_content = doc['content']
+def prune_generations(keep=keep_generations):
+    """حذف نسل‌های قدیمی به جز keep نسل آخر که برای بازگشت نگه‌داشته می‌شوند"""
+    live = set(live_generations())
+    old = [g for g in list_generations() if g not in live]
+    expired = old[:len(old) - keep] if keep > 0 else old
+    for generation in expired:
+        es.indices.delete(index=generation)
+        print(f"Old index '{generation}' deleted")
 
-            title, content = extract_text_from_html(html_content)
 
-            # اطمینان از اینکه عنوان خالی نباشد
-            if not title or title.strip() == '':
-                # اگر عنوان خالی است، بخشی از محتوا را به عنوان عنوان استفاده کنیم
-                if content:
-                    # استفاده از 50 کاراکتر اول محتوا به عنوان عنوان
-                    title = content[:50] + "..." if len(content) > 50 else content
-                else:
-                    # اگر محتوا هم خالی است، از URL به عنوان عنوان استفاده کنیم
-                    title = url
-
-            # ذخیره سند در Elasticsearch
-            es.index(
-                index=index_name,
-                document={
-                    'url': url,
-                    'title': title,
-                    'content': content
-                }
-            )
+def publish_generation(generation, keep=keep_generations):
+    """فعال‌سازی دوباره تنظیمات، ادغام سگمنت‌ها و انتقال alias به نسل جدید"""
+    es.indices.put_settings(index=generation, settings={
+        'index': {
+            'refresh_interval': None,
+            'number_of_replicas': index_settings['settings']['number_of_replicas']
+        }
+    })
+    es.indices.refresh(index=generation)
+    es.indices.forcemerge(index=generation, max_num_segments=1)
+    point_alias(generation)
+    prune_generations(keep)
 
-            count += 1
-            if count % 100 == 0:
-                print(f"Indexed {count} documents...")
 
-        except Exception as e:
-            print(f"Error processing document: {e}")
+def rollback_generation():
+    """بازگرداندن alias به نسل قبلی"""
+    live = live_generations()
+    older = [g for g in list_generations()
+             if not live or generation_sort_key(g) < min(generation_sort_key(l) for l in live)]
+    if not older:
+        print("No older generation to roll back to")
+        return None
+    point_alias(older[-1])
+    return older[-1]
+
+
+def record_rollback(generation, document_count, path=stats_file):
+    """ثبت نسلی که به آن بازگشت شد در فایل آمار تا کش نتایج جستجو نسل قبلی را کنار بگذارد"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        stats = {}
+    stats.update(index_generation=generation, document_count=document_count, rolled_back=True,
+                 timestamp=time.time())
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def index_documents(documents, chunk_size=bulk_chunk_size, thread_count=bulk_thread_count,
+                    dead_letter_path=dead_letter_file, workers=extract_workers,
+                    extract_batch_size=extract_chunk_size, keep=keep_generations, incremental=False, dedupe=True):
+    """نمایه‌سازی اسناد در Elasticsearch
+
+    در حالت عادی یک نسل جدید نمایه ساخته و alias پس از پایان ساخت جابه‌جا می‌شود.
+    در حالت افزایشی فقط اسناد جدید یا تغییر کرده در نسل فعلی بازنویسی و اسناد حذف شده پاک می‌شوند.
+    با dedupe اسناد تکراری و تقریباً تکراری پیش از نمایه‌سازی کنار گذاشته می‌شوند.
+    """
+    start_time = time.time()
+    timings = defaultdict(float)
+    counters = defaultdict(int)
 
-    # رفرش کردن نمایه
-    es.indices.refresh(index=index_name)
+    live = live_generations()
+    if incremental and len(live) != 1:
+        print(f"Incremental update needs exactly one live generation, found {len(live)}; "
+              f"building a full index instead")
+        incremental = False
+    if incremental:
+        generation = live[0]
+        previous, previous_simhashes = load_fingerprints(generation)
+        es.indices.put_settings(index=generation, settings={'index': {'refresh_interval': '-1'}})
+        print(f"Incremental update of '{generation}' ({len(previous)} known documents)")
+    else:
+        # نمایه فعلی تا پایان ساخت نسل جدید همچنان پاسخگوی جستجوها است
+        generation = create_generation()
+        previous, previous_simhashes = {}, {}
+
+    fingerprints = {}
+    simhashes = {}
+    extract_failures = []
+    try:
+        with open(dead_letter_path, 'w', encoding='utf-8') as dead_letter:
+            changed = filter_changed(documents, previous, fingerprints, counters, incremental)
+            if workers > 0:
+                extracted = extract_documents_parallel(changed, dead_letter, timings, workers, extract_batch_size,
+                                                       failed_urls=extract_failures)
+            else:
+                extracted = extract_documents(changed, dead_letter, timings, failed_urls=extract_failures)
+            if dedupe:
+                extracted = drop_duplicates(extracted, fingerprints, simhashes, counters,
+                                            kept=((url, previous_simhashes.get(url)) for url in previous))
+            actions = itertools.chain(build_actions(extracted, generation, fingerprints, simhashes),
+                                      build_delete_actions(previous, fingerprints, generation))
+            counts, failed_urls = bulk_index(actions, dead_letter, timings, chunk_size, thread_count)
+            failed_urls += extract_failures
+    except BaseException:
+        if not incremental:
+            # نسل نیمه‌کاره حذف می‌شود و alias دست نخورده باقی می‌ماند
+            es.indices.delete(index=generation)
+        else:
+            es.indices.put_settings(index=generation, settings={'index': {'refresh_interval': None}})
+        raise
+
+    publish_start = time.perf_counter()
+    if incremental:
+        es.indices.put_settings(index=generation, settings={'index': {'refresh_interval': None}})
+        es.indices.refresh(index=generation)
+    else:
+        publish_generation(generation, keep)
+    timings['publish'] += time.perf_counter() - publish_start
+
+    # اسناد ناموفق (استخراج، نمایه‌سازی یا حذف) در اجرای بعدی دوباره تلاش می‌شوند
+    keep_failed_for_retry(failed_urls, previous, fingerprints)
+    save_fingerprints(generation, fingerprints,
+                      indexed_simhashes(fingerprints, previous, previous_simhashes, simhashes))
 
     end_time = time.time()
     elapsed_time = end_time - start_time
+    count = counts['index']
+    docs_per_second = count / elapsed_time if elapsed_time > 0 else 0.0
 
-    print(f"Indexing completed. {count} documents indexed in {elapsed_time:.2f} seconds.")
+    print(f"Indexing completed. {count} documents indexed in {elapsed_time:.2f} seconds "
+          f"({docs_per_second:.1f} docs/sec).")
+    if incremental:
+        print(f"{counters['skipped']} unchanged documents skipped, {counts['delete']} removed documents deleted")
+    if counters['unchanged_missing']:
+        print(f"{counters['unchanged_missing']} pages were recorded as unchanged by the crawler but are not in "
+              f"'{generation}', so they stay unindexed; recrawl them without --recrawl-cache to index them")
+    if dedupe:
+        print(f"{counters['duplicates']} duplicate or near-duplicate documents dropped")
+    if failed_urls:
+        print(f"{len(failed_urls)} documents failed, see {dead_letter_path}")
+
+    # زمان هر مرحله: extract و index مجموع زمان کارگرها هستند و ممکن است از زمان کل بیشتر شوند
+    timings['total'] = elapsed_time
+    print("Stage timings: " + ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items()))
 
     # محاسبه حجم نمایه
-    stats = es.indices.stats(index=index_name)
+    stats = es.indices.stats(index=generation)
     index_size_bytes = stats['_all']['total']['store']['size_in_bytes']
     index_size_mb = index_size_bytes / (1024 * 1024)
 
     print(f"Index size: {index_size_mb:.2f} MB")
 
-    return count, elapsed_time, index_size_mb
+    return {
+        "document_count": stats['_all']['primaries']['docs']['count'],
+        "indexed_documents": count,
+        "skipped_documents": counters['skipped'],
+        "duplicate_documents": counters['duplicates'],
+        "deleted_documents": counts['delete'],
+        "failed_documents": len(failed_urls),
+        "indexing_time_seconds": elapsed_time,
+        "docs_per_second": docs_per_second,
+        "index_size_mb": index_size_mb,
+        "stage_timings": dict(timings),
+        "index_generation": generation
+    }
+
+
+def index_documents_embedded(documents, dead_letter_path=dead_letter_file, workers=extract_workers,
+                             extract_batch_size=extract_chunk_size, keep=keep_generations, incremental=False,
+                             dedupe=True, root=embedded_index_dir):
+    """نمایه‌سازی اسناد در نمایه معکوس داخلی (embedded_search)
+
+    هر اجرا یک نسل جدید در root می‌سازد و پس از پایان، CURRENT را به صورت اتمیک به آن منتقل می‌کند.
+    در حالت افزایشی فقط اسناد جدید یا تغییر کرده دوباره استخراج می‌شوند و اسناد بدون تغییر
+    از نسل فعلی کپی می‌شوند؛ اسنادی که دیگر در خزش نیستند به نسل جدید منتقل نمی‌شوند.
+    """
+    start_time = time.time()
+    timings = defaultdict(float)
+    counters = defaultdict(int)
+
+    current = embedded_search.current_generation(root)
+    previous_index = None
+    previous = {}
+    previous_simhashes = {}
+    if incremental and current is not None:
+        try:
+            previous_index = embedded_search.EmbeddedIndex(os.path.join(root, current))
+        except ValueError as e:
+            # نسلی با قالب قدیمی postings؛ به جای به‌روزرسانی، نمایه کامل ساخته می‌شود
+            print(f"{e}; building a full index instead")
+    if previous_index is not None:
+        # اثر انگشت و SimHash هر سند همراه خود آن در نسل فعلی ذخیره شده است
+        for url, _, _, content_hash, fingerprint in previous_index.iter_documents():
+            if content_hash:
+                previous[url] = content_hash
+            if fingerprint is not None:
+                previous_simhashes[url] = fingerprint
+        print(f"Incremental update of '{current}' ({len(previous)} known documents)")
+    else:
+        incremental = False
+
+    generation = embedded_search.create_generation(root)
+    writer = embedded_search.EmbeddedIndexWriter(os.path.join(root, generation))
+    print(f"Index '{generation}' created in {root}")
+
+    fingerprints = {}
+    simhashes = {}
+    added = set()
+    failed_urls = []
+    try:
+        with open(dead_letter_path, 'w', encoding='utf-8') as dead_letter:
+            changed = filter_changed(documents, previous, fingerprints, counters, incremental)
+            if workers > 0:
+                extracted = extract_documents_parallel(changed, dead_letter, timings, workers, extract_batch_size,
+                                                       failed_urls=failed_urls)
+            else:
+                extracted = extract_documents(changed, dead_letter, timings, failed_urls=failed_urls)
+            if dedupe:
+                extracted = drop_duplicates(extracted, fingerprints, simhashes, counters,
+                                            kept=((url, previous_simhashes.get(url)) for url in previous))
+            for url, title, content in extracted:
+                index_start = time.perf_counter()
+                writer.add(url, title, content, fingerprints.get(url), simhashes.get(url))
+                added.add(url)
+                timings['index'] += time.perf_counter() - index_start
+
+        # سندی که استخراج آن شکست خورد با نسخه قبلی خود کپی می‌شود و اجرای بعدی دوباره تلاش می‌کند
+        keep_failed_for_retry(failed_urls, previous, fingerprints)
+
+        index_start = time.perf_counter()
+        if previous_index is not None:
+            # اسناد بدون تغییر از نسل فعلی؛ سندی که اثر انگشتی در این خزش ندارد حذف شده است
+            for url, title, content, content_hash, fingerprint in previous_index.iter_documents():
+                if url in added:
+                    continue
+                if fingerprints.get(url) == content_hash:
+                    writer.add(url, title, content, content_hash, fingerprint)
+                else:
+                    counters['deleted'] += 1
+            previous_index.close()
+        writer.commit()
+        timings['index'] += time.perf_counter() - index_start
+    except BaseException:
+        # نسل نیمه‌کاره حذف می‌شود و CURRENT دست نخورده باقی می‌ماند
+        shutil.rmtree(os.path.join(root, generation), ignore_errors=True)
+        raise
+
+    publish_start = time.perf_counter()
+    embedded_search.publish_generation(root, generation, keep)
+    print(f"'{generation}' is now the current generation")
+    timings['publish'] += time.perf_counter() - publish_start
+
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    count = len(added)
+    docs_per_second = count / elapsed_time if elapsed_time > 0 else 0.0
+
+    print(f"Indexing completed. {count} documents indexed in {elapsed_time:.2f} seconds "
+          f"({docs_per_second:.1f} docs/sec).")
+    if incremental:
+        print(f"{counters['skipped']} unchanged documents copied, {counters['deleted']} removed documents dropped")
+    if counters['unchanged_missing']:
+        print(f"{counters['unchanged_missing']} pages were recorded as unchanged by the crawler but are not in "
+              f"'{current}', so they stay unindexed; recrawl them without --recrawl-cache to index them")
+    if dedupe:
+        print(f"{counters['duplicates']} duplicate or near-duplicate documents dropped")
+    if failed_urls:
+        print(f"{len(failed_urls)} documents failed, see {dead_letter_path}")
+
+    timings['total'] = elapsed_time
+    print("Stage timings: " + ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items()))
+
+    index = embedded_search.EmbeddedIndex(os.path.join(root, generation))
+    index_size_mb = index.size_bytes() / (1024 * 1024)
+    document_count = len(index)
+    index.close()
+    print(f"Index size: {index_size_mb:.2f} MB")
+
+    return {
+        "document_count": document_count,
+        "indexed_documents": count,
+        "skipped_documents": counters['skipped'],
+        "duplicate_documents": counters['duplicates'],
+        "deleted_documents": counters['deleted'],
+        "failed_documents": len(failed_urls),
+        "indexing_time_seconds": elapsed_time,
+        "docs_per_second": docs_per_second,
+        "index_size_mb": index_size_mb,
+        "stage_timings": dict(timings),
+        "index_generation": generation,
+        "backend": "embedded"
+    }
 
 
 # اجرای نمایه‌سازی
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Index crawled pages into Elasticsearch or the embedded index')
+    parser.add_argument('file_path', nargs='?',
+                        help='Crawled data file, crawl output directory, page store or directory of HTML pages')
+    parser.add_argument('--chunk-size', type=int, default=bulk_chunk_size,
+                        help=f'Documents per bulk request (default: {bulk_chunk_size})')
+    parser.add_argument('--threads', type=int, default=bulk_thread_count,
+                        help=f'Bulk requests in flight at once (default: {bulk_thread_count})')
+    parser.add_argument('--dead-letter', default=dead_letter_file,
+                        help=f'File for documents that failed to index (default: {dead_letter_file})')
+    parser.add_argument('--keep-generations', type=int, default=keep_generations,
+                        help=f'Old index generations kept for rollback (default: {keep_generations})')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only re-index pages whose content changed and delete pages that disappeared')
+    parser.add_argument('--rollback', action='store_true',
+                        help='Point the alias back to the previous generation and exit')
+    parser.add_argument('--extract-workers', type=int, default=extract_workers,
+                        help=f'HTML extraction processes, 0 to extract inline (default: {extract_workers})')
+    parser.add_argument('--extract-chunk-size', type=int, default=extract_chunk_size,
+                        help=f'Documents sent to an extraction process at a time (default: {extract_chunk_size})')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Index duplicate and near-duplicate pages instead of dropping them; with '
+                             '--incremental only changed pages are compared, with each other')
+    parser.add_argument('--backend', choices=['elasticsearch', 'embedded'], default=search_backend,
+                        help=f'Search backend to index into (default: $SEARCH_BACKEND or {search_backend})')
+    parser.add_argument('--embedded-index-dir', default=embedded_index_dir,
+                        help=f'Index directory of the embedded backend (default: {embedded_index_dir})')
+    args = parser.parse_args()
+
+    if args.rollback:
+        if args.backend == 'embedded':
+            generation = embedded_search.rollback_generation(args.embedded_index_dir)
+            print(f"Current generation is now '{generation}'" if generation
+                  else "No older generation to roll back to")
+            if generation:
+                index = embedded_search.EmbeddedIndex(os.path.join(args.embedded_index_dir, generation))
+                record_rollback(generation, len(index))
+                index.close()
+        else:
+            generation = rollback_generation()
+            if generation:
+                record_rollback(generation, es.count(index=generation)['count'])
+        raise SystemExit(0)
+
     # مسیر فایل خروجی خزش
-    crawl_output_file = input("Enter the path to the crawled data file: ")
+    crawl_output_file = args.file_path or input("Enter the path to the crawled data file: ")
 
-    # خواندن داده‌های خزش شده
-    documents = read_crawled_data(crawl_output_file)
+    # خواندن تدریجی داده‌های خزش شده؛ اولین سند برای اطمینان از خالی نبودن ورودی خوانده می‌شود
+    documents = iter_crawled_data(crawl_output_file)
+    first_document = next(documents, None)
 
-    if documents:
-        # انجام نمایه‌سازی
-        doc_count, indexing_time, index_size = index_documents(documents)
+    if first_document is not None:
+        documents = itertools.chain([first_document], documents)
+
+        # انجام نمایه‌سازی؛ RuntimeError یعنی نسل جدید منتشر نشده و نمایه فعلی دست نخورده است
+        try:
+            if args.backend == 'embedded':
+                report = index_documents_embedded(
+                    documents,
+                    dead_letter_path=args.dead_letter,
+                    workers=args.extract_workers,
+                    extract_batch_size=args.extract_chunk_size,
+                    keep=args.keep_generations,
+                    incremental=args.incremental,
+                    dedupe=not args.keep_duplicates,
+                    root=args.embedded_index_dir
+                )
+            else:
+                report = index_documents(
+                    documents,
+                    chunk_size=args.chunk_size,
+                    thread_count=args.threads,
+                    dead_letter_path=args.dead_letter,
+                    workers=args.extract_workers,
+                    extract_batch_size=args.extract_chunk_size,
+                    keep=args.keep_generations,
+                    incremental=args.incremental,
+                    dedupe=not args.keep_duplicates
+                )
+        except RuntimeError as e:
+            raise SystemExit(f"Indexing aborted: {e}")
 
         # ذخیره اطلاعات نمایه‌سازی برای استفاده بعدی
-        with open("indexing_stats.json", "w", encoding="utf-8") as f:
-            json.dump({
-                "document_count": doc_count,
-                "indexing_time_seconds": indexing_time,
-                "index_size_mb": index_size,
-                "timestamp": time.time()
-            }, f, ensure_ascii=False, indent=2)
-
-        print("Indexing statistics saved to indexing_stats.json")
\ No newline at end of file
+        with open(stats_file, "w", encoding="utf-8") as f:
+            json.dump(dict(report, timestamp=time.time()), f, ensure_ascii=False, indent=2)
+
+        print(f"Indexing statistics saved to {stats_file}")
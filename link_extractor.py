@@ -0,0 +1,131 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Text inside these is never page content
+SKIP_TAGS = {'script', 'style', 'nav', 'footer', 'header'}
+# Text inside these is page content (the tags WebCrawler.parse_page used to collect)
+CONTENT_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'article', 'section'}
+
+
+class PageExtractor:
+    """Parser target that collects title, content text and links from SAX-style events"""
+
+    def __init__(self):
+        self.title_parts = []
+        self.title_done = False
+        self.in_title = False
+        self.content_parts = []
+        self.skip_depth = 0
+        self.content_depth = 0
+        self.links = []
+        self.base_href = None
+
+    def start(self, tag, attrib):
+        tag = tag.lower()
+        if tag == 'a':
+            href = attrib.get('href')
+            if href is not None:
+                self.links.append(href)
+        elif tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in CONTENT_TAGS:
+            self.content_depth += 1
+            # block boundary, so neighbouring blocks don't run together
+            self.content_parts.append(' ')
+        elif tag == 'title' and not self.title_done:
+            self.in_title = True
+        elif tag == 'base' and self.base_href is None:
+            self.base_href = attrib.get('href')
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in CONTENT_TAGS:
+            self.content_depth = max(0, self.content_depth - 1)
+            self.content_parts.append(' ')
+        elif tag == 'title' and self.in_title:
+            self.in_title = False
+            self.title_done = True
+
+    def data(self, text):
+        if self.in_title:
+            self.title_parts.append(text)
+        elif self.content_depth and not self.skip_depth:
+            self.content_parts.append(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self
+
+
+class StdlibAdapter(HTMLParser):
+    """Feeds html.parser events to a PageExtractor when lxml is not installed"""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def parse_with_lxml(html, target):
+    parser = etree.HTMLParser(target=target, recover=True, no_network=True)
+    parser.feed(html)
+    return parser.close()
+
+
+def parse_with_stdlib(html, target):
+    adapter = StdlibAdapter(target)
+    adapter.feed(html)
+    adapter.close()
+    return target
+
+
+def extract_page(html, base_url=None, backend=None):
+    """Title, content text and links of an HTML page in one streaming pass.
+
+    No tree is built: lxml (or html.parser as a fallback) reports tags and
+    text as it reads them. Links are returned as written in the page, or
+    resolved against the page's <base href> and base_url when base_url is
+    given. backend forces 'lxml' or 'stdlib'.
+    """
+    target = PageExtractor()
+    backend = backend or ('lxml' if etree is not None else 'stdlib')
+    if backend == 'lxml' and html.strip():
+        try:
+            parse_with_lxml(html, target)
+        except etree.LxmlError:
+            target = parse_with_stdlib(html, PageExtractor())
+    else:
+        parse_with_stdlib(html, target)
+
+    links = target.links
+    if base_url is not None:
+        base = urljoin(base_url, target.base_href) if target.base_href else base_url
+        links = [urljoin(base, href) for href in links]
+
+    title = " ".join("".join(target.title_parts).split())
+    return {
+        "title": title or None,
+        "content": " ".join("".join(target.content_parts).split()),
+        "links": links
+    }
@@ -1,15 +1,23 @@
 import requests
-from bs4 import BeautifulSoup
-import json
 import time
 import random
 import os
-from urllib.parse import urlparse, urljoin
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 import logging
-from tqdm import tqdm
 import argparse
 
+from politeness import HostScheduler, replay_frontier
+from seen_store import MemorySeenStore, SEEN_STORES, open_seen_store, restore_seen_store
+from checkpoint import CheckpointLog
+from crawl_writer import CrawlWriter, COMPRESSIONS
+from robots_cache import RobotsCache
+from link_extractor import extract_page
+from recrawl_cache import RecrawlCache, content_hash
+from dedup import NearDuplicateIndex, canonicalize_url, simhash
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,26 +30,98 @@ logging.basicConfig(
 logger = logging.getLogger("WebCrawler")
 
 
+def extract_for_crawl(html_content, url):
+    """Parse-stage work, run in a parse process: extract_page plus the page's SimHash"""
+    page = extract_page(html_content, base_url=url)
+    page["simhash"] = simhash(f"{page['title'] or ''} {page['content']}")
+    return page
+
+
+class CrawlProgress:
+    """Logs each stage's queue depth and throughput every interval seconds"""
+
+    def __init__(self, crawler, interval=2.0):
+        self.crawler = crawler
+        self.interval = interval
+        self.fetched = 0
+        self.parsed = 0
+        self.started = self.last_time = time.monotonic()
+        self.last_fetched = self.last_parsed = 0
+        self.last_pages = self.start_pages = crawler.page_count
+
+    def report(self, fetching, parse_queue, parsing, force=False):
+        now = time.monotonic()
+        elapsed = now - self.last_time
+        if elapsed < self.interval and not force:
+            return
+        elapsed = max(elapsed, 1e-6)
+        crawler = self.crawler
+        logger.info(f"pages {crawler.page_count}/{crawler.max_pages} "
+                    f"({(crawler.page_count - self.last_pages) / elapsed:.1f}/s) | "
+                    f"fetch: {fetching}/{crawler.max_workers} active, "
+                    f"{(self.fetched - self.last_fetched) / elapsed:.1f}/s | "
+                    f"parse queue: {parse_queue}/{crawler.parse_queue_size} | "
+                    f"parse: {parsing} active, {(self.parsed - self.last_parsed) / elapsed:.1f}/s | "
+                    f"duplicates: {crawler.duplicates} | frontier: {len(crawler.url_queue)}")
+        self.last_time = now
+        self.last_fetched = self.fetched
+        self.last_parsed = self.parsed
+        self.last_pages = crawler.page_count
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (f"{self.fetched / elapsed:.1f} fetches/s, {self.parsed / elapsed:.1f} parses/s, "
+                f"{(self.crawler.page_count - self.start_pages) / elapsed:.1f} pages/s")
+
+
 class WebCrawler:
-    def __init__(self, start_url, max_pages=4000, output_file="crawled_data.json",
-                 delay_min=1, delay_max=3, max_workers=10):
+    def __init__(self, start_url, max_pages=4000, output_file="crawled_data.jsonl",
+                 delay_min=1, delay_max=3, max_workers=10, seed_urls=None, seen_store=None,
+                 checkpoint_every=100, resume=False, compression='none', segment_bytes=128 << 20,
+                 fsync_every=100, parse_workers=None, parse_queue_size=64, report_interval=2.0,
+                 recrawl_cache=None, dedupe=True, near_duplicate_distance=3):
         self.start_url = start_url
         self.max_pages = max_pages
         self.output_file = output_file
         self.delay_min = delay_min
         self.delay_max = delay_max
+        # Fetching is I/O bound and runs in max_workers threads; parsing is CPU bound and runs in
+        # parse_workers processes (0 parses in the coordinating thread)
         self.max_workers = max_workers
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        # Fetched pages waiting for a parser; fetching pauses while this many are fetched or queued
+        self.parse_queue_size = max(1, parse_queue_size)
+        self.report_interval = report_interval
+        # Output and crawl state are checkpointed every checkpoint_every pages
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_file = f"{output_file}.checkpoint"
+        self.checkpoint = CheckpointLog(self.checkpoint_file)
 
         # Parse domain from start URL
         parsed_url = urlparse(start_url)
         self.domain = parsed_url.netloc
-
-        # Set for visited URLs to avoid duplicates
-        self.visited_urls = set()
-        # Queue of URLs to crawl
-        self.url_queue = [start_url]
-        # List to store crawled data
-        self.crawled_data = []
+        self.scheme = parsed_url.scheme
+        # Links are followed within the start URL's host and the hosts of any extra seeds
+        seeds = [canonicalize_url(seed) for seed in [start_url] + list(seed_urls or [])]
+        self.domains = {urlparse(seed).netloc: urlparse(seed).scheme for seed in seeds}
+
+        # robots.txt rules per host, fetched once and shared by all workers
+        self.robots = RobotsCache()
+        # Every URL ever queued, to avoid duplicates (in memory, Bloom filter or SQLite)
+        self.visited_urls = seen_store if seen_store is not None else MemorySeenStore()
+        # Per-host queues of URLs to crawl, handed out when each host's politeness delay has passed
+        self.url_queue = HostScheduler(delay_min, delay_max, crawl_delay=self.robots_crawl_delay,
+                                       seen=self.visited_urls)
+        # SimHash fingerprints of the saved pages; near-duplicates of them are not saved (None keeps all)
+        self.near_duplicates = NearDuplicateIndex(near_duplicate_distance) if dedupe else None
+        self.duplicates = 0
+        # Validators and outlinks from earlier crawls, for conditional requests (None fetches everything)
+        self.recrawl = recrawl_cache
+        # Pages are streamed to the output as they are crawled; only the count stays in memory
+        self.page_count = 0
+        self.output_position = None
+        # URLs handed out by the scheduler and not yet saved: fetching, queued for parsing or parsing
+        self.in_flight = set()
 
         # User agent rotation to avoid blocks
         self.user_agents = [
@@ -51,21 +131,41 @@ class WebCrawler:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0'
         ]
 
+        # Seeds go in last: queueing a new host looks up its robots.txt Crawl-delay
+        if not (resume and self.resume_from_checkpoint()):
+            for seed in seeds:
+                self.url_queue.add(seed)
+
+        # Append-only JSONL segments; on resume, pages written after the checkpoint are dropped
+        self.writer = CrawlWriter(output_file, compression=compression, max_segment_bytes=segment_bytes,
+                                  fsync_every=fsync_every, resume_position=self.output_position)
+
     def get_random_user_agent(self):
         """Return a random user agent from the list"""
         return random.choice(self.user_agents)
 
+    def robots_crawl_delay(self, host):
+        """Return the Crawl-delay robots.txt sets for a host, if any"""
+        return self.robots.crawl_delay(f"{self.domains.get(host, self.scheme)}://{host}/")
+
     def fetch_url(self, url):
-        """Fetch and parse a URL, respecting rate limits"""
-        # Add random delay to avoid overloading the server
-        time.sleep(random.uniform(self.delay_min, self.delay_max))
+        """Fetch a URL; politeness delays are applied by the scheduler before it is handed out.
 
+        Returns None on failure, {'unchanged': True, ...} when the page is the same as
+        in the last crawl, or {'html': ..., 'validators': ...} for a page to parse.
+        """
+        entry = self.recrawl.get(url) if self.recrawl is not None else None
         headers = {'User-Agent': self.get_random_user_agent()}
+        headers.update(RecrawlCache.request_headers(entry))
 
         try:
+            started = time.monotonic()
             response = requests.get(url, headers=headers, timeout=30)
+            if response.status_code == 304 and entry is not None:
+                return self.not_modified(url, entry, time.monotonic() - started)
             if response.status_code == 200:
-                return response.text
+                return self.fetched(url, entry, response.text, len(response.content), response.headers,
+                                    time.monotonic() - started)
             else:
                 logger.warning(f"Failed to fetch {url}: Status code {response.status_code}")
                 return None
@@ -73,41 +173,47 @@ class WebCrawler:
             logger.error(f"Error fetching {url}: {str(e)}")
             return None
 
+    def not_modified(self, url, entry, seconds):
+        """A 304: nothing was downloaded, the page is as the last crawl stored it"""
+        self.recrawl.note('not_modified', saved=entry['size'], seconds=seconds,
+                          seconds_saved=entry['seconds'] - seconds)
+        return {'unchanged': True, 'url': url, 'links': entry['links']}
+
+    def fetched(self, url, entry, html_content, size, response_headers, seconds):
+        """A full download; unchanged if its content hash matches the last crawl's"""
+        validators = {
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'content_hash': content_hash(html_content),
+            'size': size,
+            'seconds': seconds
+        }
+        if self.recrawl is not None:
+            if entry is not None and entry['content_hash'] == validators['content_hash']:
+                self.recrawl.note('unchanged', downloaded=size, seconds=seconds)
+                # the server may have sent new validators even though the body is the same
+                self.recrawl.record(url, validators, entry['links'])
+                return {'unchanged': True, 'url': url, 'links': entry['links']}
+            self.recrawl.note('new' if entry is None else 'changed', downloaded=size, seconds=seconds)
+        return {'html': html_content, 'validators': validators}
+
     def parse_page(self, url, html_content):
         """Parse the HTML content to extract title, content, and links"""
-        try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Extract title
-            title = soup.title.string.strip() if soup.title else "No Title"
-
-            # Extract content (text from paragraphs, removing scripts, styles, etc.)
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-
-            # Get text from main content elements
-            content_tags = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'article', 'section', 'div.content'])
-            content = " ".join([tag.get_text().strip() for tag in content_tags])
-            content = " ".join(content.split())  # Normalize whitespace
-
-            # Extract links for further crawling
-            links = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                # Convert relative URLs to absolute
-                absolute_url = urljoin(url, href)
-                # Only include URLs from the same domain
-                if urlparse(absolute_url).netloc == self.domain:
-                    links.append(absolute_url)
+        return self.parsed_page(url, self.extract(url, html_content))
 
-            return {
-                "title": title,
-                "url": url,
-                "content": content,
-                "links": links
-            }
+    def extract(self, url, html_content):
+        """extract_for_crawl in this process; None if parsing failed"""
+        try:
+            # One streaming pass for title, content text (skipping scripts, styles, nav, etc.)
+            # and links already resolved against the page URL
+            return extract_for_crawl(html_content, url)
         except Exception as e:
             logger.error(f"Error parsing {url}: {str(e)}")
+            return None
+
+    def parsed_page(self, url, page):
+        """Page record and links to crawl from an extract_page result (None if parsing failed)"""
+        if page is None:
             return {
                 "title": "Error",
                 "url": url,
@@ -115,121 +221,319 @@ class WebCrawler:
                 "links": []
             }
 
-    def process_url(self, url):
-        """Process a single URL: fetch, parse, and extract data"""
-        html_content = self.fetch_url(url)
-        if html_content:
-            parsed_data = self.parse_page(url, html_content)
-
-            # Save the parsed data without links
-            page_data = {
-                "title": parsed_data["title"],
-                "url": url,
-                "content": parsed_data["content"]
-            }
-
-            # Return both the data to save and links to crawl
-            return page_data, parsed_data["links"]
-        return None, []
-
-    def save_data(self):
-        """Save the crawled data to a JSON file"""
+        return {
+            "title": page["title"] or "No Title",
+            "url": url,
+            "content": page["content"],
+            "links": self.crawlable_links(page["links"])
+        }
+
+    def crawlable_links(self, links):
+        """Canonical URLs of the links, only from the crawled domains and allowed by robots.txt"""
+        links = [canonicalize_url(link) for link in links]
+        return [link for link in links if urlparse(link).netloc in self.domains and self.robots.can_fetch(link)]
+
+    def open_parse_pool(self):
+        """Process pool for the parse stage, or None to parse in the coordinating thread"""
+        if not self.parse_workers:
+            return None
+        # spawn rather than fork: the fetch threads are already running when workers start
+        return ProcessPoolExecutor(max_workers=self.parse_workers,
+                                   mp_context=multiprocessing.get_context('spawn'))
+
+    def accept_page(self, url, page, validators=None):
+        """Save a page from its extract_page result (None if parsing failed) and queue its links"""
+        if self.page_count >= self.max_pages:
+            return
+        parsed_data = self.parsed_page(url, page)
+        if page is not None and self.near_duplicates is not None \
+                and self.near_duplicates.is_duplicate(page["simhash"]):
+            # the same content is already saved under another URL; its links are still followed
+            self.duplicates += 1
+            for link in parsed_data["links"]:
+                self.url_queue.add(link)
+            return
+        # a page that failed to parse is downloaded in full again on the next crawl
+        if self.recrawl is not None and validators is not None and page is not None:
+            self.recrawl.record(url, validators, parsed_data["links"])
+        self.save_page({
+            "title": parsed_data["title"],
+            "url": url,
+            "content": parsed_data["content"]
+        })
+        self.page_saved(parsed_data["links"])
+
+    def accept_unchanged(self, result):
+        """Record a page that has not changed since the last crawl and follow its stored links.
+
+        Only the URL is written, marked unchanged, so an incremental index run
+        keeps the indexed copy instead of deleting the page.
+        """
+        if self.page_count >= self.max_pages:
+            return
+        self.save_page({"url": result["url"], "unchanged": True})
+        self.page_saved(self.crawlable_links(result["links"]))
+
+    def page_saved(self, links):
+        """Queue a saved page's links and checkpoint periodically"""
+        # Add new links to the queue; the frontier drops URLs it has already seen
+        for link in links:
+            self.url_queue.add(link)
+
+        if self.page_count % self.checkpoint_every == 0:
+            self.save_checkpoint()
+
+    def save_page(self, page_data):
+        """Append a crawled page to the output"""
+        self.writer.write(page_data)
+        self.page_count += 1
+
+    def save_checkpoint(self):
+        """Sync the output, then save the frontier, seen URLs and output position it matches.
+
+        Only what changed since the last checkpoint is appended, unless the
+        checkpoint log is due for compaction.
+        """
         try:
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                json.dump(self.crawled_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Saved {len(self.crawled_data)} pages to {self.output_file}")
+            self.writer.sync()
+            self.checkpoint.save({
+                'start_url': self.start_url,
+                'pages': self.page_count,
+                'output': self.writer.position(),
+                # in-flight URLs are already marked seen and handed out, so they have to go back in the queue
+                'in_flight': list(self.in_flight),
+                'duplicates': self.duplicates,
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            }, self.checkpoint_changes, self.checkpoint_state)
+            # validators of pages up to this checkpoint; later ones would skip pages a resume refetches
+            if self.recrawl is not None:
+                self.recrawl.flush()
         except Exception as e:
-            logger.error(f"Error saving data: {str(e)}")
+            logger.error(f"Error saving checkpoint: {str(e)}")
+
+    def checkpoint_state(self):
+        """The whole frontier, seen set and near-duplicate index, for a full checkpoint"""
+        return {
+            'frontier': self.url_queue.snapshot(),
+            'seen': self.visited_urls.snapshot(),
+            'near_duplicates': self.near_duplicates.snapshot() if self.near_duplicates is not None else None
+        }
+
+    def checkpoint_changes(self):
+        """What was added to or removed from checkpoint_state() since the last checkpoint"""
+        return {
+            'frontier': self.url_queue.changes(),
+            'seen': self.visited_urls.changes(),
+            'near_duplicates': self.near_duplicates.changes() if self.near_duplicates is not None else None
+        }
+
+    def resume_from_checkpoint(self):
+        """Restore crawl state from the last checkpoint; return False if there is none"""
+        checkpoint = self.checkpoint.load()
+        if checkpoint is None:
+            logger.warning(f"No checkpoint at {self.checkpoint_file}, starting a new crawl")
+            return False
+        base, changes = checkpoint
+        state = changes[-1] if changes else base
+
+        self.visited_urls.close()
+        self.visited_urls = restore_seen_store(base['seen'], [change['seen'] for change in changes])
+        self.url_queue.seen = self.visited_urls
+        for url in state['in_flight'] + replay_frontier(base['frontier'], [change['frontier'] for change in changes]):
+            self.url_queue.requeue(url)
+
+        self.page_count = state['pages']
+        self.output_position = state['output']
+        if self.near_duplicates is not None and base['near_duplicates']:
+            self.near_duplicates = NearDuplicateIndex.restore(
+                base['near_duplicates'], [change['near_duplicates'] for change in changes])
+            self.duplicates = state['duplicates']
+
+        logger.info(f"Resumed from checkpoint of {state['timestamp']}: {self.page_count} pages, "
+                    f"{len(self.url_queue)} URLs in queue")
+        return True
 
     def crawl(self):
-        """Start the crawling process"""
-        logger.info(f"Starting crawl from {self.start_url}, targeting {self.max_pages} pages")
-
-        pbar = tqdm(total=self.max_pages, desc="Pages crawled")
+        """Start the crawling process.
+
+        Fetch threads feed a bounded queue of downloaded pages that a pool of
+        parse processes drains, so HTML parsing is not serialized by the GIL.
+        When the queue is full no new fetches start until parsers catch up.
+        """
+        logger.info(f"Starting crawl from {self.start_url}, targeting {self.max_pages} pages "
+                    f"({self.max_workers} fetch threads, {self.parse_workers} parse processes)")
+
+        progress = CrawlProgress(self, self.report_interval)
+        fetching = {}     # future -> url
+        fetched = deque()  # (url, html, validators) waiting for a parser
+        parsing = {}      # future -> (url, validators)
+        # keep every parse process busy with one page queued behind the current one
+        parse_slots = 2 * self.parse_workers
+        parse_pool = self.open_parse_pool()
 
         try:
-            while self.url_queue and len(self.crawled_data) < self.max_pages:
-                # Take a batch of URLs to process in parallel
-                batch_size = min(self.max_workers, self.max_pages - len(self.crawled_data), len(self.url_queue))
-                if batch_size <= 0:
-                    break
-
-                current_batch = []
-                for _ in range(batch_size):
-                    if not self.url_queue:
-                        break
-                    url = self.url_queue.pop(0)
-                    if url not in self.visited_urls:
-                        current_batch.append(url)
-                        self.visited_urls.add(url)
-
-                if not current_batch:
-                    continue
-
-                # Process the batch in parallel
-                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    results = list(executor.map(self.process_url, current_batch))
-
-                # Process results and update the queue
-                for page_data, links in results:
-                    if page_data:
-                        self.crawled_data.append(page_data)
-                        pbar.update(1)
-
-                        # Save periodically
-                        if len(self.crawled_data) % 100 == 0:
-                            self.save_data()
-
-                        # Add new links to the queue
-                        for link in links:
-                            if link not in self.visited_urls and link not in self.url_queue:
-                                self.url_queue.append(link)
-
-                # Log progress
-                logger.info(f"Crawled {len(self.crawled_data)} pages, {len(self.url_queue)} URLs in queue")
-
-                # Check if we have reached the target
-                if len(self.crawled_data) >= self.max_pages:
-                    break
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while (self.url_queue or self.in_flight) and self.page_count < self.max_pages:
+                    # Fetch stage: start fetches from ready hosts while the parse queue has room
+                    wait_timeout = None
+                    while (len(fetching) < self.max_workers
+                           and len(fetching) + len(fetched) < self.parse_queue_size
+                           and self.page_count + len(self.in_flight) < self.max_pages):
+                        url, wait_time = self.url_queue.pop()
+                        if url is None:
+                            wait_timeout = wait_time
+                            break
+                        self.in_flight.add(url)
+                        fetching[executor.submit(self.fetch_url, url)] = url
+
+                    progress.report(len(fetching), len(fetched), len(parsing))
+                    if not fetching and not parsing:
+                        if wait_timeout is None:
+                            break
+                        # Every queued host is still cooling down
+                        time.sleep(min(wait_timeout, self.report_interval))
+                        continue
+
+                    done, _ = wait(list(fetching) + list(parsing), return_when=FIRST_COMPLETED,
+                                   timeout=min(wait_timeout or self.report_interval, self.report_interval))
+
+                    for future in done:
+                        if future in fetching:
+                            url = fetching.pop(future)
+                            progress.fetched += 1
+                            result = future.result()
+                            if result is None or result.get('unchanged'):
+                                # failed, or unchanged since the last crawl: nothing to parse
+                                self.in_flight.discard(url)
+                                if result is not None:
+                                    self.accept_unchanged(result)
+                            else:
+                                fetched.append((url, result['html'], result['validators']))
+                            continue
+
+                        url, validators = parsing.pop(future)
+                        self.in_flight.discard(url)
+                        progress.parsed += 1
+                        try:
+                            page = future.result()
+                        except Exception as e:
+                            logger.error(f"Error parsing {url}: {str(e)}")
+                            page = None
+                        self.accept_page(url, page, validators)
+
+                    # Parse stage: hand queued pages to idle parse processes
+                    while fetched and (parse_pool is None or len(parsing) < parse_slots):
+                        url, html_content, validators = fetched.popleft()
+                        if parse_pool is None:
+                            self.in_flight.discard(url)
+                            progress.parsed += 1
+                            self.accept_page(url, self.extract(url, html_content), validators)
+                        else:
+                            parsing[parse_pool.submit(extract_for_crawl, html_content, url)] = (url, validators)
+
+                for future in fetching:
+                    future.cancel()
 
             # Final save
-            self.save_data()
-            pbar.close()
-            logger.info(f"Crawling completed. Saved {len(self.crawled_data)} pages to {self.output_file}")
+            self.save_checkpoint()
+            progress.report(0, 0, 0, force=True)
+            logger.info(f"Crawling completed. Saved {self.page_count} pages to {self.output_file} segments "
+                        f"({progress.summary()}), dropped {self.duplicates} near-duplicate pages")
+            if self.recrawl is not None:
+                logger.info(self.recrawl.summary())
 
         except KeyboardInterrupt:
             logger.warning("Crawling interrupted by user")
-            self.save_data()
-            pbar.close()
+            self.save_checkpoint()
         except Exception as e:
             logger.error(f"Error during crawling: {str(e)}")
-            self.save_data()
-            pbar.close()
+            self.save_checkpoint()
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown(cancel_futures=True)
+            self.writer.close()
 
 
 def main():
     parser = argparse.ArgumentParser(description='Web Crawler')
     parser.add_argument('start_url', help='The URL to start crawling from')
     parser.add_argument('--max-pages', type=int, default=4000, help='Maximum number of pages to crawl (default: 4000)')
-    parser.add_argument('--output', default='crawled_data.json', help='Output JSON file (default: crawled_data.json)')
+    parser.add_argument('--output', default='crawled_data.jsonl',
+                        help='Base path of the JSONL output segments (default: crawled_data.jsonl)')
+    parser.add_argument('--compress', choices=list(COMPRESSIONS), default='none',
+                        help='Compress output segments (default: none)')
+    parser.add_argument('--segment-size-mb', type=int, default=128,
+                        help='Start a new output segment after this many MB of JSON (default: 128)')
+    parser.add_argument('--fsync-every', type=int, default=100,
+                        help='fsync the output every N pages (default: 100)')
     parser.add_argument('--delay-min', type=float, default=1.0,
-                        help='Minimum delay between requests in seconds (default: 1.0)')
+                        help='Minimum delay between requests to the same host in seconds (default: 1.0)')
     parser.add_argument('--delay-max', type=float, default=3.0,
-                        help='Maximum delay between requests in seconds (default: 3.0)')
-    parser.add_argument('--max-workers', type=int, default=10, help='Maximum number of worker threads (default: 10)')
+                        help='Maximum delay between requests to the same host in seconds (default: 3.0)')
+    parser.add_argument('--max-workers', type=int, default=10,
+                        help='Maximum number of concurrent fetches (default: 10)')
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help='Processes parsing fetched pages; 0 parses in the main process (default: CPU count)')
+    parser.add_argument('--parse-queue-size', type=int, default=64,
+                        help='Fetched pages that may wait for a parser before fetching pauses (default: 64)')
+    parser.add_argument('--report-interval', type=float, default=2.0,
+                        help='Seconds between progress reports (default: 2)')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                        help='Crawl engine: thread pool or asyncio with pooled connections (default: threads)')
+    parser.add_argument('--seed', action='append', default=[],
+                        help='Additional start URL on another host; may be repeated')
+    parser.add_argument('--seen-store', choices=SEEN_STORES, default='memory',
+                        help='Where seen URLs are kept: exact set, Bloom filter or SQLite file (default: memory)')
+    parser.add_argument('--seen-path', default='seen_urls.sqlite',
+                        help='SQLite file for --seen-store sqlite (default: seen_urls.sqlite)')
+    parser.add_argument('--bloom-error-rate', type=float, default=0.001,
+                        help='False-positive rate for --seen-store bloom (default: 0.001)')
+    parser.add_argument('--checkpoint-every', type=int, default=100,
+                        help='Save output and crawl state every N pages (default: 100)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue from the checkpoint next to the output file')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Save pages whose content is a near-duplicate of a page already saved')
+    parser.add_argument('--recrawl-cache', default=None,
+                        help='SQLite file of ETag/Last-Modified/content hash per URL; pages unchanged since '
+                             'the last crawl are skipped and written as {"url", "unchanged": true} records')
 
     args = parser.parse_args()
 
-    crawler = WebCrawler(
+    crawler_class = WebCrawler
+    if args.engine == 'asyncio':
+        from async_crawler import AsyncWebCrawler
+        crawler_class = AsyncWebCrawler
+
+    crawler = crawler_class(
         start_url=args.start_url,
         max_pages=args.max_pages,
         output_file=args.output,
         delay_min=args.delay_min,
         delay_max=args.delay_max,
-        max_workers=args.max_workers
+        max_workers=args.max_workers,
+        seed_urls=args.seed,
+        # an on-disk seen store keeps its URLs only when there is a checkpoint to resume from
+        seen_store=open_seen_store(args.seen_store, path=args.seen_path, error_rate=args.bloom_error_rate,
+                                   resume=args.resume and os.path.exists(f"{args.output}.checkpoint")),
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        compression=args.compress,
+        segment_bytes=args.segment_size_mb << 20,
+        fsync_every=args.fsync_every,
+        parse_workers=args.parse_workers,
+        parse_queue_size=args.parse_queue_size,
+        report_interval=args.report_interval,
+        recrawl_cache=RecrawlCache(args.recrawl_cache) if args.recrawl_cache else None,
+        dedupe=not args.keep_duplicates
     )
 
-    crawler.crawl()
+    try:
+        crawler.crawl()
+    finally:
+        crawler.visited_urls.close()
+        if crawler.recrawl is not None:
+            crawler.recrawl.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,280 @@
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# codec byte stored with every record
+CODECS = {'none': 0, 'zlib': 1, 'zstd': 2}
+CODEC_NAMES = {value: name for name, value in CODECS.items()}
+
+# record header: magic, codec, compressed length, content hash, URL length; then the URL and the body
+RECORD_HEADER = struct.Struct('<4sBI16sH')
+RECORD_MAGIC = b'PGR1'
+SEGMENT_PATTERN = re.compile(r'pages-(\d{5})\.seg$')
+INDEX_NAME = 'index.sqlite'
+
+
+def is_page_store(path):
+    return os.path.isfile(os.path.join(path, INDEX_NAME))
+
+
+class PageStore:
+    """Raw HTML pages in a few large compressed segment files instead of one file per page.
+
+    Every page body is compressed on its own (zstd when installed, zlib
+    otherwise) and appended to the current segment, pages-NNNNN.seg, which
+    is closed once it holds max_segment_bytes. Bodies are content-addressed:
+    a page whose HTML is byte-for-byte the same as a stored one only gets an
+    index row. The SQLite index maps page id and URL to (segment, offset,
+    length), and get() reads that one record through an mmap of the segment,
+    so a single page is fetched without reading anything else.
+
+    Each record in a segment also carries a header with the URL and content
+    hash, in the spirit of WARC, so segments stay readable without the index.
+    """
+
+    def __init__(self, directory, max_segment_bytes=256 << 20, compression=None, level=None,
+                 commit_every=1000):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        if compression is None:
+            compression = 'zstd' if zstandard is not None else 'zlib'
+        if compression not in CODECS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd page store compression requires the 'zstandard' package")
+        self.codec = CODECS[compression]
+        if compression == 'zstd':
+            self.compressor = zstandard.ZstdCompressor(level=level or 3)
+        self.level = level or 6
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS blobs (hash BLOB PRIMARY KEY, segment INTEGER, "
+                          "offset INTEGER, length INTEGER, codec INTEGER, size INTEGER) WITHOUT ROWID")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, url TEXT NOT NULL, "
+                          "hash BLOB NOT NULL, stored_at REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url)")
+
+        self.maps = {}  # segment -> mmap, for reads
+        self.file = None
+        self.segment, self.segment_bytes = self.last_segment()
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"pages-{segment:05d}.seg")
+
+    def last_segment(self):
+        segments = [int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(self.directory))
+                    if match]
+        if not segments:
+            return 0, 0
+        segment = max(segments)
+        return segment, os.path.getsize(self.segment_path(segment))
+
+    def compress(self, data):
+        if self.codec == CODECS['zstd']:
+            return self.compressor.compress(data)
+        if self.codec == CODECS['zlib']:
+            return zlib.compress(data, self.level)
+        return data
+
+    @staticmethod
+    def decompress(codec, data):
+        if codec == CODECS['zstd']:
+            if zstandard is None:
+                raise RuntimeError("Reading zstd pages requires the 'zstandard' package")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == CODECS['zlib']:
+            return zlib.decompress(data)
+        return data
+
+    def put(self, page_id, url, html):
+        """Store a page under page_id; return False if an identical body was already stored"""
+        data = html.encode('utf-8')
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        with self.lock:
+            stored = self.conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is not None
+            if not stored:
+                self.append(digest, url, data)
+            self.conn.execute("INSERT OR REPLACE INTO pages (id, url, hash, stored_at) VALUES (?, ?, ?, ?)",
+                              (page_id, url, digest, time.time()))
+            self.pending += 1
+            if self.pending >= self.commit_every:
+                self.flush_locked()
+        return not stored
+
+    def append(self, digest, url, data):
+        blob = self.compress(data)
+        url_bytes = url.encode('utf-8')[:0xFFFF]
+        if self.file is None or self.segment_bytes >= self.max_segment_bytes:
+            if self.file is not None:
+                self.file.close()
+                self.segment += 1
+                self.segment_bytes = 0
+            self.file = open(self.segment_path(self.segment), 'ab')
+        header = RECORD_HEADER.pack(RECORD_MAGIC, self.codec, len(blob), digest, len(url_bytes))
+        offset = self.segment_bytes + len(header) + len(url_bytes)
+        self.file.write(header + url_bytes + blob)
+        self.segment_bytes = offset + len(blob)
+        self.conn.execute("INSERT INTO blobs (hash, segment, offset, length, codec, size) VALUES (?, ?, ?, ?, ?, ?)",
+                          (digest, self.segment, offset, len(blob), self.codec, len(data)))
+
+    def read(self, segment, offset, length, codec):
+        """One record's body through an mmap of its segment"""
+        return self.decompress(codec, self.read_raw(segment, offset, length)).decode('utf-8')
+
+    def read_raw(self, segment, offset, length):
+        """One record's compressed bytes; call with self.lock held"""
+        segment_map = self.maps.get(segment)
+        if segment_map is None or offset + length > len(segment_map):
+            # not mapped yet, or the segment has grown since it was mapped
+            if segment == self.segment and self.file is not None:
+                self.file.flush()
+            if segment_map is not None:
+                segment_map.close()
+            with open(self.segment_path(segment), 'rb') as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = segment_map
+        return segment_map[offset:offset + length]
+
+    def lookup(self, where, value):
+        with self.lock:
+            row = self.conn.execute("SELECT blobs.segment, blobs.offset, blobs.length, blobs.codec FROM pages "
+                                    f"JOIN blobs ON blobs.hash = pages.hash WHERE {where} = ? "
+                                    "ORDER BY pages.id LIMIT 1", (value,)).fetchone()
+            if row is None:
+                return None
+            return self.read(*row)
+
+    def get(self, page_id):
+        """HTML of a page by id, or None"""
+        return self.lookup('pages.id', page_id)
+
+    def get_url(self, url):
+        """HTML of the first page stored for url, or None"""
+        return self.lookup('pages.url', url)
+
+    def iter_pages(self, batch_size=1000):
+        """(id, url, html) of every page, in segment order so reads are sequential.
+
+        The lock is held only while a batch of rows and its compressed bodies
+        are read, never while the caller processes a page, so other threads
+        can keep storing and reading pages.
+        """
+        with self.lock:
+            self.flush_locked()
+        last = (-1, -1, -1)
+        while True:
+            with self.lock:
+                # keyset pagination: no cursor stays open between batches
+                rows = self.conn.execute("SELECT blobs.segment, blobs.offset, pages.id, pages.url, blobs.length, "
+                                         "blobs.codec FROM pages JOIN blobs ON blobs.hash = pages.hash "
+                                         "WHERE (blobs.segment, blobs.offset, pages.id) > (?, ?, ?) "
+                                         "ORDER BY blobs.segment, blobs.offset, pages.id LIMIT ?",
+                                         (*last, batch_size)).fetchall()
+                batch = [(page_id, url, codec, self.read_raw(segment, offset, length))
+                         for segment, offset, page_id, url, length, codec in rows]
+            if not rows:
+                return
+            last = rows[-1][:3]
+            for page_id, url, codec, data in batch:
+                yield page_id, url, self.decompress(codec, data).decode('utf-8')
+
+    def page_urls(self):
+        """(id, url) of every page in id order, without reading any bodies"""
+        with self.lock:
+            return self.conn.execute("SELECT id, url FROM pages ORDER BY id").fetchall()
+
+    def discard_from(self, page_id):
+        """Forget pages with id >= page_id, e.g. those stored after the checkpoint a crawl resumes from.
+
+        Bodies that only those pages used are deleted in the same transaction,
+        and the segments are cut back to the end of the last body still in use,
+        so no row points at bytes a crash may have lost and new pages are
+        appended right after the kept ones.
+        """
+        with self.lock:
+            self.conn.execute("DELETE FROM pages WHERE id >= ?", (page_id,))
+            self.conn.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM pages)")
+            self.conn.commit()
+            self.pending = 0
+            end = self.conn.execute("SELECT segment, offset + length FROM blobs "
+                                    "ORDER BY segment DESC, offset DESC LIMIT 1").fetchone()
+            segment, segment_bytes = end if end is not None else (0, 0)
+            self.close_segments()
+            for name in os.listdir(self.directory):
+                match = SEGMENT_PATTERN.match(name)
+                if match and int(match.group(1)) > segment:
+                    os.remove(os.path.join(self.directory, name))
+            if os.path.exists(self.segment_path(segment)):
+                os.truncate(self.segment_path(segment), segment_bytes)
+            self.segment, self.segment_bytes = segment, segment_bytes
+
+    def close_segments(self):
+        """Close the segment being appended to and every mmap; call with self.lock held"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for segment_map in self.maps.values():
+            segment_map.close()
+        self.maps = {}
+
+    def clear(self):
+        """Remove every page, body and segment, e.g. before a fresh crawl into the same directory"""
+        with self.lock:
+            self.close_segments()
+            self.conn.execute("DELETE FROM pages")
+            self.conn.execute("DELETE FROM blobs")
+            self.conn.commit()
+            self.pending = 0
+            for name in os.listdir(self.directory):
+                if SEGMENT_PATTERN.match(name):
+                    os.remove(os.path.join(self.directory, name))
+            self.segment, self.segment_bytes = 0, 0
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def stats(self):
+        """Page, body and byte counts: raw HTML size vs bytes on disk"""
+        with self.lock:
+            pages = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            bodies, raw, stored = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length), 0) FROM blobs").fetchone()
+        return {'pages': pages, 'bodies': bodies, 'raw_bytes': raw, 'stored_bytes': stored}
+
+    def flush_locked(self):
+        if self.file is not None:
+            self.file.flush()
+        self.conn.commit()
+        self.pending = 0
+
+    def flush(self):
+        """Make everything stored so far durable: segment data first, then the index"""
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.close_segments()
+            self.conn.close()
@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from seen_store import MemorySeenStore
+
+
+class HostScheduler:
+    """URL frontier that only hands out URLs whose host may be fetched now.
+
+    Every URL ever added is recorded in a seen store (an exact set by default,
+    or any store from seen_store), so enqueueing, de-duplication and popping
+    are all O(1) and a URL is handed out at most once. URLs are queued per
+    host. A heap keyed by each host's next-allowed time
+    decides which host is served next, so workers always get whichever host is
+    ready first instead of sleeping. The gap between two requests to the same
+    host is a random value between delay_min and delay_max, or the host's
+    robots.txt Crawl-delay when that is longer.
+    """
+
+    def __init__(self, delay_min=1.0, delay_max=3.0, crawl_delay=None, seen=None):
+        self.delay_min = delay_min
+        self.delay_max = delay_max
+        # callable(host) -> Crawl-delay in seconds or None, looked up once per host
+        self.crawl_delay = crawl_delay
+        self.queues = {}
+        self.seen = seen if seen is not None else MemorySeenStore()
+        self.host_delays = {}
+        self.next_allowed = {}
+        self.ready = []
+        self.counter = itertools.count()
+        self.size = 0
+        self.lock = threading.Lock()
+        # URLs queued and handed out since the last snapshot() or changes(); recorded once
+        # snapshot() has been called
+        self.queued = None
+        self.popped = None
+
+    def _host_delay(self, host):
+        if host not in self.host_delays:
+            # looked up outside the lock because it may fetch robots.txt
+            delay = self.crawl_delay(host) if self.crawl_delay else None
+            with self.lock:
+                self.host_delays[host] = delay or 0
+        return self.host_delays[host]
+
+    def add(self, url):
+        """Queue a URL unless it was added before; return whether it was queued"""
+        if url in self.seen:
+            return False
+        host = urlparse(url).netloc
+        self._host_delay(host)
+        with self.lock:
+            if not self.seen.add(url):
+                return False
+            queue = self.queues.setdefault(host, deque())
+            if not queue:
+                # the host becomes schedulable again once it has work
+                heapq.heappush(self.ready, (self.next_allowed.get(host, 0.0), next(self.counter), host))
+            queue.append(url)
+            self.size += 1
+            if self.queued is not None:
+                self.queued.append(url)
+            return True
+
+    def requeue(self, url):
+        """Queue a URL that is already in the seen store, e.g. when resuming from a checkpoint"""
+        host = urlparse(url).netloc
+        self._host_delay(host)
+        with self.lock:
+            queue = self.queues.setdefault(host, deque())
+            if not queue:
+                heapq.heappush(self.ready, (self.next_allowed.get(host, 0.0), next(self.counter), host))
+            queue.append(url)
+            self.size += 1
+            if self.queued is not None:
+                self.queued.append(url)
+
+    def snapshot(self):
+        """All queued URLs, for a full checkpoint"""
+        with self.lock:
+            self.queued, self.popped = [], []
+            return [url for queue in self.queues.values() for url in queue]
+
+    def changes(self):
+        """URLs queued and handed out since the last snapshot() or changes(), for an incremental checkpoint"""
+        with self.lock:
+            changes = {'queued': self.queued, 'popped': self.popped}
+            self.queued, self.popped = [], []
+            return changes
+
+    def pop(self):
+        """Return (url, 0) for a URL that may be fetched now.
+
+        When no host is ready yet, return (None, seconds until the next one is),
+        or (None, None) when the frontier is empty.
+        """
+        with self.lock:
+            if not self.ready:
+                return None, None
+            allowed_at, _, host = self.ready[0]
+            now = time.monotonic()
+            if allowed_at > now:
+                return None, allowed_at - now
+
+            heapq.heappop(self.ready)
+            queue = self.queues[host]
+            url = queue.popleft()
+            self.size -= 1
+            if self.popped is not None:
+                self.popped.append(url)
+
+            delay = max(random.uniform(self.delay_min, self.delay_max), self.host_delays.get(host, 0))
+            self.next_allowed[host] = now + delay
+            if queue:
+                heapq.heappush(self.ready, (now + delay, next(self.counter), host))
+            else:
+                del self.queues[host]
+            return url, 0
+
+    def __contains__(self, url):
+        """True for any URL that was ever added, whether still queued or already handed out"""
+        return url in self.seen
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+
+def replay_frontier(urls, changes):
+    """Queued URLs after applying the changes() saved after a snapshot() of urls"""
+    queued = dict.fromkeys(urls)
+    for change in changes:
+        queued.update(dict.fromkeys(change['queued']))
+        for url in change['popped']:
+            queued.pop(url, None)
+    return list(queued)
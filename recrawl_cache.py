@@ -0,0 +1,102 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def content_hash(text):
+    """Fingerprint of a page body, to spot unchanged pages the server sends in full"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RecrawlCache:
+    """ETag, Last-Modified, content hash and outlinks of every URL from earlier crawls.
+
+    On a recrawl the stored validators are sent as If-None-Match and
+    If-Modified-Since. A 304, or a 200 whose body hashes the same as last
+    time, means the page is unchanged: it is not parsed or stored again, and
+    its stored outlinks are queued so the crawl still reaches the pages behind
+    it. New entries are buffered and written by flush(), which the crawler
+    calls right after a checkpoint, so a resumed crawl never skips a page
+    whose content was lost with the output written after that checkpoint.
+    """
+
+    def __init__(self, path='recrawl_cache.sqlite'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.stats = {'new': 0, 'changed': 0, 'not_modified': 0, 'unchanged': 0,
+                      'bytes_downloaded': 0, 'bytes_saved': 0, 'seconds_fetching': 0.0, 'seconds_saved': 0.0}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            links TEXT,
+            size INTEGER,
+            seconds REAL,
+            fetched_at REAL
+        )""")
+
+    def get(self, url):
+        """What the last crawl stored for url, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT etag, last_modified, content_hash, links, size, seconds "
+                                    "FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'content_hash': row[2],
+                'links': json.loads(row[3]), 'size': row[4], 'seconds': row[5]}
+
+    @staticmethod
+    def request_headers(entry):
+        """Conditional request headers for a stored entry"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def note(self, outcome, downloaded=0, saved=0, seconds=0.0, seconds_saved=0.0):
+        """Count a fetch: new, changed, not_modified (304) or unchanged (same hash)"""
+        with self.lock:
+            self.stats[outcome] += 1
+            self.stats['bytes_downloaded'] += downloaded
+            self.stats['bytes_saved'] += saved
+            self.stats['seconds_fetching'] += seconds
+            self.stats['seconds_saved'] += max(0.0, seconds_saved)
+
+    def record(self, url, validators, links):
+        """Remember a fetched page; written on the next flush()"""
+        row = (url, validators['etag'], validators['last_modified'], validators['content_hash'],
+               json.dumps(links, ensure_ascii=False), validators['size'], validators['seconds'], time.time())
+        with self.lock:
+            self.pending[url] = row
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            rows = list(self.pending.values())
+            self.pending = {}
+            self.conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def summary(self):
+        stats = self.stats
+        return (f"recrawl: {stats['new']} new, {stats['changed']} changed, "
+                f"{stats['not_modified']} not modified (304), {stats['unchanged']} unchanged (same content); "
+                f"{stats['bytes_downloaded'] / 2 ** 20:.1f} MB downloaded, "
+                f"{stats['bytes_saved'] / 2 ** 20:.1f} MB saved, "
+                f"{stats['seconds_saved']:.1f}s of fetch time saved")
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+
+class RobotsCache:
+    """Per-host robots.txt rules with a TTL, shared by all workers of a crawl.
+
+    Each host's robots.txt is downloaded once per ttl seconds. Concurrent
+    workers asking about the same host wait for a single download rather than
+    each fetching it. Status handling follows RobotFileParser.read: 401/403
+    disallow everything, other 4xx allow everything. Network errors and 5xx
+    also allow everything but are cached for error_ttl only, so the host is
+    asked again soon.
+    """
+
+    def __init__(self, user_agent='*', ttl=3600, error_ttl=300, timeout=10,
+                 http_user_agent='PythonWebCrawler/1.0'):
+        # user_agent selects the robots.txt rules, http_user_agent is sent when downloading it
+        self.user_agent = user_agent
+        self.http_user_agent = http_user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.entries = {}  # origin -> (parser, expires_at)
+        self.host_locks = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def origin(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme or 'https'}://{parsed.netloc}"
+
+    def parse(self, origin, status, text):
+        """Parse a robots.txt response; return (parser, seconds to cache it), or an error parser for status None"""
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        if status is None:
+            parser.allow_all = True
+            return parser, self.error_ttl
+
+        if status in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= status < 500:
+            parser.allow_all = True
+        elif status >= 500:
+            parser.allow_all = True
+            return parser, self.error_ttl
+        else:
+            parser.parse(text.splitlines())
+        return parser, self.ttl
+
+    def fetch(self, origin):
+        """Download and parse robots.txt; return (parser, seconds to cache it)"""
+        try:
+            response = requests.get(f"{origin}/robots.txt", timeout=self.timeout,
+                                    headers={'User-Agent': self.http_user_agent})
+        except requests.RequestException:
+            return self.parse(origin, None, None)
+        return self.parse(origin, response.status_code, response.text)
+
+    async def fetch_async(self, session, origin):
+        """fetch() with an aiohttp session, without blocking the event loop"""
+        import aiohttp
+        try:
+            async with session.get(f"{origin}/robots.txt", timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                   headers={'User-Agent': self.http_user_agent}) as response:
+                return self.parse(origin, response.status, await response.text(errors='replace'))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return self.parse(origin, None, None)
+
+    def cached(self, origin):
+        """The unexpired parser for an origin, or None"""
+        entry = self.entries.get(origin)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def store(self, origin, parser, ttl):
+        parser.modified()
+        self.entries[origin] = (parser, time.monotonic() + ttl)
+
+    def get(self, url):
+        """The RobotFileParser for url's host, fetched if missing or expired"""
+        origin = self.origin(url)
+        parser = self.cached(origin)
+        if parser is not None:
+            return parser
+
+        with self.lock:
+            host_lock = self.host_locks.setdefault(origin, threading.Lock())
+        with host_lock:
+            # another worker may have fetched it while this one waited
+            parser = self.cached(origin)
+            if parser is not None:
+                return parser
+            parser, ttl = self.fetch(origin)
+            self.store(origin, parser, ttl)
+            return parser
+
+    async def prefetch(self, session, urls):
+        """Download the missing or expired robots.txt of the hosts of urls with an aiohttp session.
+
+        can_fetch and crawl_delay for those URLs then answer from the cache,
+        so an asyncio crawler never makes a blocking request from the event loop.
+        """
+        origins = {self.origin(url) for url in urls}
+        missing = [origin for origin in origins if self.cached(origin) is None]
+        results = await asyncio.gather(*(self.fetch_async(session, origin) for origin in missing))
+        for origin, (parser, ttl) in zip(missing, results):
+            self.store(origin, parser, ttl)
+
+    def can_fetch(self, url, user_agent=None):
+        return self.get(url).can_fetch(user_agent or self.user_agent, url)
+
+    def crawl_delay(self, url, user_agent=None):
+        """Crawl-delay for url's host in seconds, or None"""
+        return self.get(url).crawl_delay(user_agent or self.user_agent)
@@ -0,0 +1,149 @@
+# کش نتایج جستجو برای app.py
+# نتایج پرس‌وجوهای پرتکرار تا زمان انقضا (TTL) یا تا تغییر نسل نمایه از کش پاسخ داده می‌شوند
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class IndexGenerationWatcher:
+    """پایش فایل indexing_stats.json برای تشخیص ساخته شدن نسل جدید نمایه"""
+
+    def __init__(self, stats_path="indexing_stats.json", check_interval=1.0):
+        self.stats_path = stats_path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.last_check = 0.0
+        self.mtime = None
+        self.stats = {}
+        self.generation = ""
+
+    def current(self):
+        """برگرداندن (شناسه نسل، آمار نمایه‌سازی)؛ فایل حداکثر هر check_interval ثانیه بررسی می‌شود"""
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return self.generation, self.stats
+
+        with self.lock:
+            if now - self.last_check >= self.check_interval:
+                self.last_check = now
+                self._reload()
+        return self.generation, self.stats
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.stats_path).st_mtime
+        except OSError:
+            return
+        if mtime == self.mtime:
+            return
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            # فایل در حال بازنویسی است؛ در بررسی بعدی دوباره تلاش می‌کنیم
+            return
+        self.mtime = mtime
+        self.stats = stats
+        self.generation = f"{stats.get('index_generation', '')}@{stats.get('timestamp', mtime)}"
+
+
+class SearchCache:
+    """کش LRU با زمان انقضا؛ در صورت تنظیم redis_url از Redis به عنوان کش مشترک استفاده می‌شود
+
+    خطا یا کندی Redis جستجو را از کار نمی‌اندازد: خواندن ناموفق یک miss و نوشتن ناموفق نادیده گرفته
+    می‌شود و هر فرمان حداکثر redis_timeout ثانیه منتظر می‌ماند.
+    """
+
+    def __init__(self, max_entries=2048, ttl=60, redis_url=None, key_prefix="search", redis_timeout=0.1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = None
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "errors": 0}
+
+        self.redis = None
+        if redis_url:
+            import redis
+            self.redis = redis.Redis.from_url(redis_url, socket_connect_timeout=redis_timeout,
+                                              socket_timeout=redis_timeout)
+            self.redis_errors = (redis.RedisError, socket.timeout)
+
+    @staticmethod
+    def make_key(query, **params):
+        """کلید کش از پرس‌وجوی نرمال‌شده و پارامترهای صفحه‌بندی"""
+        normalized = " ".join(query.split())
+        paging = "&".join(f"{name}={params[name]}" for name in sorted(params))
+        return f"{normalized}|{paging}"
+
+    def _check_generation(self, generation):
+        # با تغییر نسل نمایه همه مدخل‌های محلی نامعتبر می‌شوند
+        if generation != self.generation:
+            if self.entries:
+                self.counters["invalidations"] += 1
+            self.entries.clear()
+            self.generation = generation
+
+    def _redis_failed(self, operation, error):
+        logger.warning(f"Search cache {operation} failed, Redis unavailable: {error}")
+        with self.lock:
+            self.counters["errors"] += 1
+
+    def get(self, key, generation):
+        if self.redis is not None:
+            try:
+                value = self.redis.get(f"{self.key_prefix}:{generation}:{key}")
+            except self.redis_errors as e:
+                # مانند miss: پاسخ از Elasticsearch گرفته می‌شود
+                self._redis_failed("get", e)
+                value = None
+            with self.lock:
+                self.counters["hits" if value is not None else "misses"] += 1
+            return json.loads(value) if value is not None else None
+
+        with self.lock:
+            self._check_generation(generation)
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def set(self, key, generation, value):
+        if self.redis is not None:
+            # نسل نمایه بخشی از کلید است؛ مدخل‌های نسل قبلی با TTL منقضی می‌شوند
+            try:
+                self.redis.set(f"{self.key_prefix}:{generation}:{key}",
+                               json.dumps(value, ensure_ascii=False), ex=self.ttl)
+            except self.redis_errors as e:
+                self._redis_failed("set", e)
+            return
+
+        with self.lock:
+            self._check_generation(generation)
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["backend"] = "redis" if self.redis is not None else "memory"
+        return stats
@@ -0,0 +1,264 @@
+import base64
+import hashlib
+import math
+import sqlite3
+import threading
+
+SEEN_STORES = ('memory', 'bloom', 'sqlite')
+
+
+def url_hashes(url):
+    """Two independent 64-bit hashes of a URL, for double hashing"""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+
+class MemorySeenStore:
+    """Exact seen-set of full URL strings; memory grows with the crawl"""
+
+    def __init__(self):
+        self.urls = set()
+        # URLs added since the last snapshot() or changes(); recorded once snapshot() has been called
+        self.added = None
+
+    def add(self, url):
+        """Record a URL; return False if it was already seen"""
+        if url in self.urls:
+            return False
+        self.urls.add(url)
+        if self.added is not None:
+            self.added.append(url)
+        return True
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def snapshot(self):
+        """Every URL, for a full checkpoint"""
+        self.added = []
+        return {'kind': 'memory', 'urls': list(self.urls)}
+
+    def changes(self):
+        """URLs added since the last snapshot() or changes(), for an incremental checkpoint"""
+        added, self.added = self.added, []
+        return {'kind': 'memory', 'urls': added}
+
+    def close(self):
+        pass
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for capacity items at error_rate"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def positions(self, hashes):
+        h1, h2 = hashes
+        return [(h1 + i * h2) % self.bit_count for i in range(self.hash_count)]
+
+    def contains(self, hashes):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self.positions(hashes))
+
+    def add(self, hashes):
+        bits = self.bits
+        for p in self.positions(hashes):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def snapshot(self):
+        return {'capacity': self.capacity, 'error_rate': self.error_rate, 'count': self.count,
+                'bits': base64.b64encode(self.bits).decode('ascii')}
+
+    @classmethod
+    def restore(cls, snapshot):
+        bloom = cls(snapshot['capacity'], snapshot['error_rate'])
+        bloom.bits = bytearray(base64.b64decode(snapshot['bits']))
+        bloom.count = snapshot['count']
+        return bloom
+
+
+class BloomSeenStore:
+    """Scalable Bloom filter: a chain of filters that each double in size.
+
+    Every new filter gets half the error rate of the previous one, so the
+    overall false-positive rate stays below error_rate however many URLs are
+    added. A false positive means a new URL is skipped as already seen.
+    Memory is about 1.44 * log2(1 / error_rate) bits per URL.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.error_rate = error_rate
+        self.filters = [BloomFilter(capacity, error_rate / 2)]
+        self.lock = threading.Lock()
+        # hashes added since the last snapshot() or changes(); recorded once snapshot() has been called
+        self.added = None
+
+    def add(self, url):
+        """Record a URL; return False if it was (probably) already seen"""
+        return self.add_hashes(url_hashes(url))
+
+    def add_hashes(self, hashes):
+        with self.lock:
+            if any(bloom.contains(hashes) for bloom in self.filters):
+                return False
+            current = self.filters[-1]
+            if current.count >= current.capacity:
+                current = BloomFilter(current.capacity * 2, self.error_rate / 2 ** (len(self.filters) + 1))
+                self.filters.append(current)
+            current.add(hashes)
+            if self.added is not None:
+                self.added.append(hashes)
+            return True
+
+    def __contains__(self, url):
+        hashes = url_hashes(url)
+        return any(bloom.contains(hashes) for bloom in self.filters)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def size_bytes(self):
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+    def snapshot(self):
+        """Every filter's bits, for a full checkpoint"""
+        with self.lock:
+            self.added = []
+            return {'kind': 'bloom', 'error_rate': self.error_rate,
+                    'filters': [bloom.snapshot() for bloom in self.filters]}
+
+    def changes(self):
+        """Hashes added since the last snapshot() or changes(); replayed in order they rebuild the same filters"""
+        with self.lock:
+            added, self.added = self.added, []
+        return {'kind': 'bloom', 'hashes': added}
+
+    @classmethod
+    def restore(cls, snapshot):
+        store = cls(error_rate=snapshot['error_rate'])
+        store.filters = [BloomFilter.restore(bloom) for bloom in snapshot['filters']]
+        return store
+
+    def close(self):
+        pass
+
+
+class SqliteSeenStore:
+    """On-disk seen-set keyed by a 64-bit URL hash.
+
+    RAM use is bounded by SQLite's page cache (cache_mb), whatever the crawl
+    size. Inserts are committed in batches of commit_every. URLs left in the
+    file by an earlier crawl are kept only when resume is true.
+
+    Rows are numbered in insertion order, so a checkpoint only commits and
+    records the last row number instead of copying the database, and a
+    resume deletes the rows added after it.
+    """
+
+    def __init__(self, path, cache_mb=16, commit_every=10000, resume=False):
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(f"PRAGMA cache_size=-{cache_mb * 1024}")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen_urls (key BLOB PRIMARY KEY)")
+        if not resume:
+            self.conn.execute("DELETE FROM seen_urls")
+        self.conn.commit()
+        self.count = self.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+
+    @staticmethod
+    def key(url):
+        return hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+
+    def add(self, url):
+        """Record a URL; return False if it was already seen"""
+        with self.lock:
+            cursor = self.conn.execute("INSERT OR IGNORE INTO seen_urls (key) VALUES (?)", (self.key(url),))
+            if cursor.rowcount != 1:
+                return False
+            self.count += 1
+            self.pending += 1
+            if self.pending >= self.commit_every:
+                self.conn.commit()
+                self.pending = 0
+            return True
+
+    def __contains__(self, url):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM seen_urls WHERE key = ?",
+                                     (self.key(url),)).fetchone() is not None
+
+    def __len__(self):
+        return self.count
+
+    def snapshot(self):
+        """Commit in place and record the last row; the cost does not grow with the crawl"""
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+            last = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM seen_urls").fetchone()[0]
+        return {'kind': 'sqlite', 'path': self.path, 'last': last}
+
+    def changes(self):
+        """The URLs are already in the file, so an incremental checkpoint is the same high-water mark"""
+        return self.snapshot()
+
+    @classmethod
+    def restore(cls, snapshot):
+        store = cls(snapshot['path'], resume=True)
+        # URLs added after the checkpoint are dropped along with the rest of that work
+        with store.lock:
+            store.conn.execute("DELETE FROM seen_urls WHERE rowid > ?", (snapshot['last'],))
+            store.conn.commit()
+            store.count = store.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+        return store
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+def open_seen_store(kind='memory', path='seen_urls.sqlite', error_rate=0.001, capacity=1000000, resume=False):
+    """Create the seen-URL store selected by kind (one of SEEN_STORES); an on-disk store starts empty unless resuming"""
+    if kind == 'memory':
+        return MemorySeenStore()
+    if kind == 'bloom':
+        return BloomSeenStore(capacity=capacity, error_rate=error_rate)
+    if kind == 'sqlite':
+        return SqliteSeenStore(path, resume=resume)
+    raise ValueError(f"Unknown seen store: {kind}")
+
+
+def restore_seen_store(snapshot, changes=()):
+    """Rebuild a store from the snapshot() it saved in a crawl checkpoint and the changes() saved after it"""
+    if snapshot['kind'] == 'memory':
+        store = MemorySeenStore()
+        store.urls.update(snapshot['urls'])
+        for change in changes:
+            store.urls.update(change['urls'])
+        return store
+    if snapshot['kind'] == 'bloom':
+        store = BloomSeenStore.restore(snapshot)
+        for change in changes:
+            for hashes in change['hashes']:
+                store.add_hashes(tuple(hashes))
+        return store
+    if snapshot['kind'] == 'sqlite':
+        # only the latest high-water mark counts
+        return SqliteSeenStore.restore(changes[-1] if changes else snapshot)
+    raise ValueError(f"Unknown seen store: {snapshot['kind']}")
@@ -0,0 +1,18 @@
+import re
+
+
+def normalize_text(text):
+    """نرمال‌سازی متن فارسی"""
+    if not text:
+        return ""
+
+    # تبدیل ی و ک عربی به فارسی
+    text = text.replace('ي', 'ی').replace('ك', 'ک')
+
+    # حذف کاراکترهای اضافی
+    text = re.sub(r'[^\w\s\u0600-\u06FF]', ' ', text)
+
+    # حذف فاصله‌های اضافی
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    return text